@@ -0,0 +1,2469 @@
+#define _CFFI_
+
+/* We try to define Py_LIMITED_API before including Python.h.
+
+   Mess: we can only define it if Py_DEBUG, Py_TRACE_REFS and
+   Py_REF_DEBUG are not defined.  This is a best-effort approximation:
+   we can learn about Py_DEBUG from pyconfig.h, but it is unclear if
+   the same works for the other two macros.  Py_DEBUG implies them,
+   but not the other way around.
+
+   The implementation is messy (issue #350): on Windows, with _MSC_VER,
+   we have to define Py_LIMITED_API even before including pyconfig.h.
+   In that case, we guess what pyconfig.h will do to the macros above,
+   and check our guess after the #include.
+
+   Note that on Windows, with CPython 3.x, you need >= 3.5 and virtualenv
+   version >= 16.0.0.  With older versions of either, you don't get a
+   copy of PYTHON3.DLL in the virtualenv.  We can't check the version of
+   CPython *before* we even include pyconfig.h.  ffi.set_source() puts
+   a ``#define _CFFI_NO_LIMITED_API'' at the start of this file if it is
+   running on Windows < 3.5, as an attempt at fixing it, but that's
+   arguably wrong because it may not be the target version of Python.
+   Still better than nothing I guess.  As another workaround, you can
+   remove the definition of Py_LIMITED_API here.
+
+   See also 'py_limited_api' in cffi/setuptools_ext.py.
+*/
+#if !defined(_CFFI_USE_EMBEDDING) && !defined(Py_LIMITED_API)
+#  ifdef _MSC_VER
+#    if !defined(_DEBUG) && !defined(Py_DEBUG) && !defined(Py_TRACE_REFS) && !defined(Py_REF_DEBUG) && !defined(_CFFI_NO_LIMITED_API)
+#      if !defined(Py_GIL_DISABLED)
+#        define Py_LIMITED_API
+#      else
+#        define Py_LIMITED_API 0x030f0000
+#      endif
+#    endif
+
+#    include <pyconfig.h>
+     /* sanity-check: Py_LIMITED_API will cause crashes if any of these
+        are also defined.  Normally, the Python file PC/pyconfig.h does not
+        cause any of these to be defined, with the exception that _DEBUG
+        causes Py_DEBUG.  Double-check that. */
+#    ifdef Py_LIMITED_API
+#      if defined(Py_DEBUG)
+#        error "pyconfig.h unexpectedly defines Py_DEBUG, but Py_LIMITED_API is set"
+#      endif
+#      if defined(Py_TRACE_REFS)
+#        error "pyconfig.h unexpectedly defines Py_TRACE_REFS, but Py_LIMITED_API is set"
+#      endif
+#      if defined(Py_REF_DEBUG)
+#        error "pyconfig.h unexpectedly defines Py_REF_DEBUG, but Py_LIMITED_API is set"
+#      endif
+#    endif
+#  else
+#    include <pyconfig.h>
+#    if !defined(Py_DEBUG) && !defined(Py_TRACE_REFS) && !defined(Py_REF_DEBUG) && !defined(_CFFI_NO_LIMITED_API)
+#      if !defined(Py_GIL_DISABLED)
+#        define Py_LIMITED_API
+#      else
+#        define Py_LIMITED_API 0x030f0000
+#      endif
+#    endif
+#  endif
+#endif
+
+#include <Python.h>
+#ifdef __cplusplus
+extern "C" {
+#endif
+#include <stddef.h>
+#include <stdlib.h>
+#include <string.h>
+
+
+/* This part is from file 'cffi/parse_c_type.h'.  It is copied at the
+   beginning of C sources generated by CFFI's ffi.set_source(). */
+
+typedef void *_cffi_opcode_t;
+
+#define _CFFI_OP(opcode, arg)   (_cffi_opcode_t)(opcode | (((uintptr_t)(arg)) << 8))
+#define _CFFI_GETOP(cffi_opcode)    ((unsigned char)(uintptr_t)cffi_opcode)
+#define _CFFI_GETARG(cffi_opcode)   (((intptr_t)cffi_opcode) >> 8)
+
+#define _CFFI_OP_PRIMITIVE       1
+#define _CFFI_OP_POINTER         3
+#define _CFFI_OP_ARRAY           5
+#define _CFFI_OP_OPEN_ARRAY      7
+#define _CFFI_OP_STRUCT_UNION    9
+#define _CFFI_OP_ENUM           11
+#define _CFFI_OP_FUNCTION       13
+#define _CFFI_OP_FUNCTION_END   15
+#define _CFFI_OP_NOOP           17
+#define _CFFI_OP_BITFIELD       19
+#define _CFFI_OP_TYPENAME       21
+#define _CFFI_OP_CPYTHON_BLTN_V 23   // varargs
+#define _CFFI_OP_CPYTHON_BLTN_N 25   // noargs
+#define _CFFI_OP_CPYTHON_BLTN_O 27   // O  (i.e. a single arg)
+#define _CFFI_OP_CONSTANT       29
+#define _CFFI_OP_CONSTANT_INT   31
+#define _CFFI_OP_GLOBAL_VAR     33
+#define _CFFI_OP_DLOPEN_FUNC    35
+#define _CFFI_OP_DLOPEN_CONST   37
+#define _CFFI_OP_GLOBAL_VAR_F   39
+#define _CFFI_OP_EXTERN_PYTHON  41
+
+#define _CFFI_PRIM_VOID          0
+#define _CFFI_PRIM_BOOL          1
+#define _CFFI_PRIM_CHAR          2
+#define _CFFI_PRIM_SCHAR         3
+#define _CFFI_PRIM_UCHAR         4
+#define _CFFI_PRIM_SHORT         5
+#define _CFFI_PRIM_USHORT        6
+#define _CFFI_PRIM_INT           7
+#define _CFFI_PRIM_UINT          8
+#define _CFFI_PRIM_LONG          9
+#define _CFFI_PRIM_ULONG        10
+#define _CFFI_PRIM_LONGLONG     11
+#define _CFFI_PRIM_ULONGLONG    12
+#define _CFFI_PRIM_FLOAT        13
+#define _CFFI_PRIM_DOUBLE       14
+#define _CFFI_PRIM_LONGDOUBLE   15
+
+#define _CFFI_PRIM_WCHAR        16
+#define _CFFI_PRIM_INT8         17
+#define _CFFI_PRIM_UINT8        18
+#define _CFFI_PRIM_INT16        19
+#define _CFFI_PRIM_UINT16       20
+#define _CFFI_PRIM_INT32        21
+#define _CFFI_PRIM_UINT32       22
+#define _CFFI_PRIM_INT64        23
+#define _CFFI_PRIM_UINT64       24
+#define _CFFI_PRIM_INTPTR       25
+#define _CFFI_PRIM_UINTPTR      26
+#define _CFFI_PRIM_PTRDIFF      27
+#define _CFFI_PRIM_SIZE         28
+#define _CFFI_PRIM_SSIZE        29
+#define _CFFI_PRIM_INT_LEAST8   30
+#define _CFFI_PRIM_UINT_LEAST8  31
+#define _CFFI_PRIM_INT_LEAST16  32
+#define _CFFI_PRIM_UINT_LEAST16 33
+#define _CFFI_PRIM_INT_LEAST32  34
+#define _CFFI_PRIM_UINT_LEAST32 35
+#define _CFFI_PRIM_INT_LEAST64  36
+#define _CFFI_PRIM_UINT_LEAST64 37
+#define _CFFI_PRIM_INT_FAST8    38
+#define _CFFI_PRIM_UINT_FAST8   39
+#define _CFFI_PRIM_INT_FAST16   40
+#define _CFFI_PRIM_UINT_FAST16  41
+#define _CFFI_PRIM_INT_FAST32   42
+#define _CFFI_PRIM_UINT_FAST32  43
+#define _CFFI_PRIM_INT_FAST64   44
+#define _CFFI_PRIM_UINT_FAST64  45
+#define _CFFI_PRIM_INTMAX       46
+#define _CFFI_PRIM_UINTMAX      47
+#define _CFFI_PRIM_FLOATCOMPLEX 48
+#define _CFFI_PRIM_DOUBLECOMPLEX 49
+#define _CFFI_PRIM_CHAR16       50
+#define _CFFI_PRIM_CHAR32       51
+
+#define _CFFI__NUM_PRIM         52
+#define _CFFI__UNKNOWN_PRIM           (-1)
+#define _CFFI__UNKNOWN_FLOAT_PRIM     (-2)
+#define _CFFI__UNKNOWN_LONG_DOUBLE    (-3)
+
+#define _CFFI__IO_FILE_STRUCT         (-1)
+
+
+struct _cffi_global_s {
+    const char *name;
+    void *address;
+    _cffi_opcode_t type_op;
+    void *size_or_direct_fn;  // OP_GLOBAL_VAR: size, or 0 if unknown
+                              // OP_CPYTHON_BLTN_*: addr of direct function
+};
+
+struct _cffi_getconst_s {
+    unsigned long long value;
+    const struct _cffi_type_context_s *ctx;
+    int gindex;
+};
+
+struct _cffi_struct_union_s {
+    const char *name;
+    int type_index;          // -> _cffi_types, on a OP_STRUCT_UNION
+    int flags;               // _CFFI_F_* flags below
+    size_t size;
+    int alignment;
+    int first_field_index;   // -> _cffi_fields array
+    int num_fields;
+};
+#define _CFFI_F_UNION         0x01   // is a union, not a struct
+#define _CFFI_F_CHECK_FIELDS  0x02   // complain if fields are not in the
+                                     // "standard layout" or if some are missing
+#define _CFFI_F_PACKED        0x04   // for CHECK_FIELDS, assume a packed struct
+#define _CFFI_F_EXTERNAL      0x08   // in some other ffi.include()
+#define _CFFI_F_OPAQUE        0x10   // opaque
+
+struct _cffi_field_s {
+    const char *name;
+    size_t field_offset;
+    size_t field_size;
+    _cffi_opcode_t field_type_op;
+};
+
+struct _cffi_enum_s {
+    const char *name;
+    int type_index;          // -> _cffi_types, on a OP_ENUM
+    int type_prim;           // _CFFI_PRIM_xxx
+    const char *enumerators; // comma-delimited string
+};
+
+struct _cffi_typename_s {
+    const char *name;
+    int type_index;   /* if opaque, points to a possibly artificial
+                         OP_STRUCT which is itself opaque */
+};
+
+struct _cffi_type_context_s {
+    _cffi_opcode_t *types;
+    const struct _cffi_global_s *globals;
+    const struct _cffi_field_s *fields;
+    const struct _cffi_struct_union_s *struct_unions;
+    const struct _cffi_enum_s *enums;
+    const struct _cffi_typename_s *typenames;
+    int num_globals;
+    int num_struct_unions;
+    int num_enums;
+    int num_typenames;
+    const char *const *includes;
+    int num_types;
+    int flags;      /* future extension */
+};
+
+struct _cffi_parse_info_s {
+    const struct _cffi_type_context_s *ctx;
+    _cffi_opcode_t *output;
+    unsigned int output_size;
+    size_t error_location;
+    const char *error_message;
+};
+
+struct _cffi_externpy_s {
+    const char *name;
+    size_t size_of_result;
+    void *reserved1, *reserved2;
+};
+
+#ifdef _CFFI_INTERNAL
+static int parse_c_type(struct _cffi_parse_info_s *info, const char *input);
+static int search_in_globals(const struct _cffi_type_context_s *ctx,
+                             const char *search, size_t search_len);
+static int search_in_struct_unions(const struct _cffi_type_context_s *ctx,
+                                   const char *search, size_t search_len);
+#endif
+
+/* this block of #ifs should be kept exactly identical between
+   c/_cffi_backend.c, cffi/vengine_cpy.py, cffi/vengine_gen.py
+   and cffi/_cffi_include.h */
+#if defined(_MSC_VER)
+# include <malloc.h>   /* for alloca() */
+# if _MSC_VER < 1600   /* MSVC < 2010 */
+   typedef __int8 int8_t;
+   typedef __int16 int16_t;
+   typedef __int32 int32_t;
+   typedef __int64 int64_t;
+   typedef unsigned __int8 uint8_t;
+   typedef unsigned __int16 uint16_t;
+   typedef unsigned __int32 uint32_t;
+   typedef unsigned __int64 uint64_t;
+   typedef __int8 int_least8_t;
+   typedef __int16 int_least16_t;
+   typedef __int32 int_least32_t;
+   typedef __int64 int_least64_t;
+   typedef unsigned __int8 uint_least8_t;
+   typedef unsigned __int16 uint_least16_t;
+   typedef unsigned __int32 uint_least32_t;
+   typedef unsigned __int64 uint_least64_t;
+   typedef __int8 int_fast8_t;
+   typedef __int16 int_fast16_t;
+   typedef __int32 int_fast32_t;
+   typedef __int64 int_fast64_t;
+   typedef unsigned __int8 uint_fast8_t;
+   typedef unsigned __int16 uint_fast16_t;
+   typedef unsigned __int32 uint_fast32_t;
+   typedef unsigned __int64 uint_fast64_t;
+   typedef __int64 intmax_t;
+   typedef unsigned __int64 uintmax_t;
+# else
+#  include <stdint.h>
+# endif
+# if _MSC_VER < 1800   /* MSVC < 2013 */
+#  ifndef __cplusplus
+    typedef unsigned char _Bool;
+#  endif
+# endif
+# define _cffi_float_complex_t   _Fcomplex    /* include <complex.h> for it */
+# define _cffi_double_complex_t  _Dcomplex    /* include <complex.h> for it */
+#else
+# include <stdint.h>
+# if (defined (__SVR4) && defined (__sun)) || defined(_AIX) || defined(__hpux)
+#  include <alloca.h>
+# endif
+# define _cffi_float_complex_t   float _Complex
+# define _cffi_double_complex_t  double _Complex
+#endif
+
+#ifdef __GNUC__
+# define _CFFI_UNUSED_FN  __attribute__((unused))
+#else
+# define _CFFI_UNUSED_FN  /* nothing */
+#endif
+
+#ifdef __cplusplus
+# ifndef _Bool
+   typedef bool _Bool;   /* semi-hackish: C++ has no _Bool; bool is builtin */
+# endif
+#endif
+
+/**********  CPython-specific section  **********/
+#ifndef PYPY_VERSION
+
+
+#define _cffi_from_c_double PyFloat_FromDouble
+#define _cffi_from_c_float PyFloat_FromDouble
+#define _cffi_from_c_long PyLong_FromLong
+#define _cffi_from_c_ulong PyLong_FromUnsignedLong
+#define _cffi_from_c_longlong PyLong_FromLongLong
+#define _cffi_from_c_ulonglong PyLong_FromUnsignedLongLong
+#define _cffi_from_c__Bool PyBool_FromLong
+
+#define _cffi_to_c_double PyFloat_AsDouble
+#define _cffi_to_c_float PyFloat_AsDouble
+
+#define _cffi_from_c_int(x, type)                                        \
+    (((type)-1) > 0 ? /* unsigned */                                     \
+        (sizeof(type) < sizeof(long) ?                                   \
+            PyLong_FromLong((long)x) :                                   \
+         sizeof(type) == sizeof(long) ?                                  \
+            PyLong_FromUnsignedLong((unsigned long)x) :                  \
+            PyLong_FromUnsignedLongLong((unsigned long long)x)) :        \
+        (sizeof(type) <= sizeof(long) ?                                  \
+            PyLong_FromLong((long)x) :                                   \
+            PyLong_FromLongLong((long long)x)))
+
+#define _cffi_to_c_int(o, type)                                          \
+    ((type)(                                                             \
+     sizeof(type) == 1 ? (((type)-1) > 0 ? (type)_cffi_to_c_u8(o)        \
+                                         : (type)_cffi_to_c_i8(o)) :     \
+     sizeof(type) == 2 ? (((type)-1) > 0 ? (type)_cffi_to_c_u16(o)       \
+                                         : (type)_cffi_to_c_i16(o)) :    \
+     sizeof(type) == 4 ? (((type)-1) > 0 ? (type)_cffi_to_c_u32(o)       \
+                                         : (type)_cffi_to_c_i32(o)) :    \
+     sizeof(type) == 8 ? (((type)-1) > 0 ? (type)_cffi_to_c_u64(o)       \
+                                         : (type)_cffi_to_c_i64(o)) :    \
+     (Py_FatalError("unsupported size for type " #type), (type)0)))
+
+#define _cffi_to_c_i8                                                    \
+                 ((int(*)(PyObject *))_cffi_exports[1])
+#define _cffi_to_c_u8                                                    \
+                 ((int(*)(PyObject *))_cffi_exports[2])
+#define _cffi_to_c_i16                                                   \
+                 ((int(*)(PyObject *))_cffi_exports[3])
+#define _cffi_to_c_u16                                                   \
+                 ((int(*)(PyObject *))_cffi_exports[4])
+#define _cffi_to_c_i32                                                   \
+                 ((int(*)(PyObject *))_cffi_exports[5])
+#define _cffi_to_c_u32                                                   \
+                 ((unsigned int(*)(PyObject *))_cffi_exports[6])
+#define _cffi_to_c_i64                                                   \
+                 ((long long(*)(PyObject *))_cffi_exports[7])
+#define _cffi_to_c_u64                                                   \
+                 ((unsigned long long(*)(PyObject *))_cffi_exports[8])
+#define _cffi_to_c_char                                                  \
+                 ((int(*)(PyObject *))_cffi_exports[9])
+#define _cffi_from_c_pointer                                             \
+    ((PyObject *(*)(char *, struct _cffi_ctypedescr *))_cffi_exports[10])
+#define _cffi_to_c_pointer                                               \
+    ((char *(*)(PyObject *, struct _cffi_ctypedescr *))_cffi_exports[11])
+#define _cffi_get_struct_layout                                          \
+    not used any more
+#define _cffi_restore_errno                                              \
+    ((void(*)(void))_cffi_exports[13])
+#define _cffi_save_errno                                                 \
+    ((void(*)(void))_cffi_exports[14])
+#define _cffi_from_c_char                                                \
+    ((PyObject *(*)(char))_cffi_exports[15])
+#define _cffi_from_c_deref                                               \
+    ((PyObject *(*)(char *, struct _cffi_ctypedescr *))_cffi_exports[16])
+#define _cffi_to_c                                                       \
+    ((int(*)(char *, struct _cffi_ctypedescr *, PyObject *))_cffi_exports[17])
+#define _cffi_from_c_struct                                              \
+    ((PyObject *(*)(char *, struct _cffi_ctypedescr *))_cffi_exports[18])
+#define _cffi_to_c_wchar_t                                               \
+    ((_cffi_wchar_t(*)(PyObject *))_cffi_exports[19])
+#define _cffi_from_c_wchar_t                                             \
+    ((PyObject *(*)(_cffi_wchar_t))_cffi_exports[20])
+#define _cffi_to_c_long_double                                           \
+    ((long double(*)(PyObject *))_cffi_exports[21])
+#define _cffi_to_c__Bool                                                 \
+    ((_Bool(*)(PyObject *))_cffi_exports[22])
+#define _cffi_prepare_pointer_call_argument                              \
+    ((Py_ssize_t(*)(struct _cffi_ctypedescr *,                           \
+                    PyObject *, char **))_cffi_exports[23])
+#define _cffi_convert_array_from_object                                  \
+    ((int(*)(char *, struct _cffi_ctypedescr *, PyObject *))_cffi_exports[24])
+#define _CFFI_CPIDX  25
+#define _cffi_call_python                                                \
+    ((void(*)(struct _cffi_externpy_s *, char *))_cffi_exports[_CFFI_CPIDX])
+#define _cffi_to_c_wchar3216_t                                           \
+    ((int(*)(PyObject *))_cffi_exports[26])
+#define _cffi_from_c_wchar3216_t                                         \
+    ((PyObject *(*)(int))_cffi_exports[27])
+#define _CFFI_NUM_EXPORTS 28
+
+struct _cffi_ctypedescr;
+
+static void *_cffi_exports[_CFFI_NUM_EXPORTS];
+
+#define _cffi_type(index)   (                           \
+    assert((((uintptr_t)_cffi_types[index]) & 1) == 0), \
+    (struct _cffi_ctypedescr *)_cffi_types[index])
+
+static PyObject *_cffi_init(const char *module_name, Py_ssize_t version,
+                            const struct _cffi_type_context_s *ctx)
+{
+    PyObject *module, *o_arg, *new_module;
+    void *raw[] = {
+        (void *)module_name,
+        (void *)version,
+        (void *)_cffi_exports,
+        (void *)ctx,
+    };
+
+    module = PyImport_ImportModule("_cffi_backend");
+    if (module == NULL)
+        goto failure;
+
+    o_arg = PyLong_FromVoidPtr((void *)raw);
+    if (o_arg == NULL)
+        goto failure;
+
+    new_module = PyObject_CallMethod(
+        module, (char *)"_init_cffi_1_0_external_module", (char *)"O", o_arg);
+
+    Py_DECREF(o_arg);
+    Py_DECREF(module);
+    return new_module;
+
+  failure:
+    Py_XDECREF(module);
+    return NULL;
+}
+
+
+#ifdef HAVE_WCHAR_H
+typedef wchar_t _cffi_wchar_t;
+#else
+typedef uint16_t _cffi_wchar_t;   /* same random pick as _cffi_backend.c */
+#endif
+
+_CFFI_UNUSED_FN static uint16_t _cffi_to_c_char16_t(PyObject *o)
+{
+    if (sizeof(_cffi_wchar_t) == 2)
+        return (uint16_t)_cffi_to_c_wchar_t(o);
+    else
+        return (uint16_t)_cffi_to_c_wchar3216_t(o);
+}
+
+_CFFI_UNUSED_FN static PyObject *_cffi_from_c_char16_t(uint16_t x)
+{
+    if (sizeof(_cffi_wchar_t) == 2)
+        return _cffi_from_c_wchar_t((_cffi_wchar_t)x);
+    else
+        return _cffi_from_c_wchar3216_t((int)x);
+}
+
+_CFFI_UNUSED_FN static int _cffi_to_c_char32_t(PyObject *o)
+{
+    if (sizeof(_cffi_wchar_t) == 4)
+        return (int)_cffi_to_c_wchar_t(o);
+    else
+        return (int)_cffi_to_c_wchar3216_t(o);
+}
+
+_CFFI_UNUSED_FN static PyObject *_cffi_from_c_char32_t(unsigned int x)
+{
+    if (sizeof(_cffi_wchar_t) == 4)
+        return _cffi_from_c_wchar_t((_cffi_wchar_t)x);
+    else
+        return _cffi_from_c_wchar3216_t((int)x);
+}
+
+union _cffi_union_alignment_u {
+    unsigned char m_char;
+    unsigned short m_short;
+    unsigned int m_int;
+    unsigned long m_long;
+    unsigned long long m_longlong;
+    float m_float;
+    double m_double;
+    long double m_longdouble;
+};
+
+struct _cffi_freeme_s {
+    struct _cffi_freeme_s *next;
+    union _cffi_union_alignment_u alignment;
+};
+
+_CFFI_UNUSED_FN static int
+_cffi_convert_array_argument(struct _cffi_ctypedescr *ctptr, PyObject *arg,
+                             char **output_data, Py_ssize_t datasize,
+                             struct _cffi_freeme_s **freeme)
+{
+    char *p;
+    if (datasize < 0)
+        return -1;
+
+    p = *output_data;
+    if (p == NULL) {
+        struct _cffi_freeme_s *fp = (struct _cffi_freeme_s *)PyObject_Malloc(
+            offsetof(struct _cffi_freeme_s, alignment) + (size_t)datasize);
+        if (fp == NULL)
+            return -1;
+        fp->next = *freeme;
+        *freeme = fp;
+        p = *output_data = (char *)&fp->alignment;
+    }
+    memset((void *)p, 0, (size_t)datasize);
+    return _cffi_convert_array_from_object(p, ctptr, arg);
+}
+
+_CFFI_UNUSED_FN static void
+_cffi_free_array_arguments(struct _cffi_freeme_s *freeme)
+{
+    do {
+        void *p = (void *)freeme;
+        freeme = freeme->next;
+        PyObject_Free(p);
+    } while (freeme != NULL);
+}
+
+/**********  end CPython-specific section  **********/
+#else
+_CFFI_UNUSED_FN
+static void (*_cffi_call_python_org)(struct _cffi_externpy_s *, char *);
+# define _cffi_call_python  _cffi_call_python_org
+#endif
+
+
+#define _cffi_array_len(array)   (sizeof(array) / sizeof((array)[0]))
+
+#define _cffi_prim_int(size, sign)                                      \
+    ((size) == 1 ? ((sign) ? _CFFI_PRIM_INT8  : _CFFI_PRIM_UINT8)  :    \
+     (size) == 2 ? ((sign) ? _CFFI_PRIM_INT16 : _CFFI_PRIM_UINT16) :    \
+     (size) == 4 ? ((sign) ? _CFFI_PRIM_INT32 : _CFFI_PRIM_UINT32) :    \
+     (size) == 8 ? ((sign) ? _CFFI_PRIM_INT64 : _CFFI_PRIM_UINT64) :    \
+     _CFFI__UNKNOWN_PRIM)
+
+#define _cffi_prim_float(size)                                          \
+    ((size) == sizeof(float) ? _CFFI_PRIM_FLOAT :                       \
+     (size) == sizeof(double) ? _CFFI_PRIM_DOUBLE :                     \
+     (size) == sizeof(long double) ? _CFFI__UNKNOWN_LONG_DOUBLE :       \
+     _CFFI__UNKNOWN_FLOAT_PRIM)
+
+#define _cffi_check_int(got, got_nonpos, expected)      \
+    ((got_nonpos) == (expected <= 0) &&                 \
+     (got) == (unsigned long long)expected)
+
+#ifdef MS_WIN32
+# define _cffi_stdcall  __stdcall
+#else
+# define _cffi_stdcall  /* nothing */
+#endif
+
+#ifdef __cplusplus
+}
+#endif
+
+/************************************************************/
+
+#include <stdio.h>
+#include <string.h>
+#include <stdlib.h>
+#include <math.h>
+#include "slit_func_2d_xi_zeta_bd.h"
+
+#define min(a, b) (((a) < (b)) ? (a) : (b))
+#define max(a, b) (((a) > (b)) ? (a) : (b))
+#define signum(a) (((a) > 0) ? 1 : ((a) < 0) ? -1 : 0)
+#define DEBUG 0
+
+// Store important sizes in global variables to make access easier
+// When calculating the proper indices
+// When not checking the indices just the variables directly
+#if DEBUG
+int _ncols = 0;
+int _nrows = 0;
+int _ny = 0;
+int _nx = 0;
+int _osample = 0;
+int _n = 0;
+int _nd = 0;
+#else
+#define _ncols ncols
+#define _nrows nrows
+#define _ny ny
+#define _nx nx
+#define _osample osample
+#define _n n
+#define _nd nd
+#endif
+
+// Define the sizes of each array
+#define MAX_ZETA_X (_ncols)
+#define MAX_ZETA_Y (_nrows)
+#define MAX_ZETA_Z (3 * ((_osample) + 1))
+#define MAX_ZETA (MAX_ZETA_X * MAX_ZETA_Y * MAX_ZETA_Z)
+#define MAX_MZETA ((_ncols) * (_nrows))
+#define MAX_XI ((_ncols) * (_ny)*4)
+#define MAX_PSF_X (_ncols)
+#define MAX_PSF_Y (3)
+#define MAX_PSF (MAX_PSF_X * MAX_PSF_Y)
+#define MAX_A ((_n) * (_nd))
+#define MAX_R (_n)
+#define MAX_SP (_ncols)
+#define MAX_SL (_ny)
+#define MAX_LAIJ_X (_ny)
+#define MAX_LAIJ_Y (4 * (_osample) + 1)
+#define MAX_LAIJ (MAX_LAIJ_X * MAX_LAIJ_Y)
+#define MAX_PAIJ_X (_ncols)
+#define MAX_PAIJ_Y (_nx)
+#define MAX_PAIJ (MAX_PAIJ_X * MAX_PAIJ_Y)
+#define MAX_LBJ (_ny)
+#define MAX_PBJ (_ncols)
+#define MAX_IM ((_ncols) * (_nrows))
+
+// If we want to check the index use functions to represent the index
+// Otherwise a simpler define will do, which should be faster ?
+#if DEBUG
+static long zeta_index(long x, long y, long z)
+{
+    long i = z + y * MAX_ZETA_Z + x * MAX_ZETA_Z * _nrows;
+    if ((i < 0) | (i >= MAX_ZETA))
+    {
+        printf("INDEX OUT OF BOUNDS. Zeta[%li, %li, %li]\n", x, y, z);
+        return 0;
+    }
+    return i;
+}
+
+static long mzeta_index(long x, long y)
+{
+    long i = y + x * _nrows;
+    if ((i < 0) | (i >= MAX_MZETA))
+    {
+        printf("INDEX OUT OF BOUNDS. Mzeta[%li, %li]\n", x, y);
+        return 0;
+    }
+    return i;
+}
+
+static long xi_index(long x, long y, long z)
+{
+    long i = z + 4 * y + _ny * 4 * x;
+    if ((i < 0) | (i >= MAX_XI))
+    {
+        printf("INDEX OUT OF BOUNDS. Xi[%li, %li, %li]\n", x, y, z);
+        return 0;
+    }
+    return i;
+}
+
+static long psf_index(long x, long y)
+{
+    long i = ((x)*3 + (y));
+    if ((i < 0) | (i >= MAX_PSF))
+    {
+        printf("INDEX OUT OF BOUNDS. PSF[%li, %li]\n", x, y);
+        return 0;
+    }
+    return i;
+}
+
+static long a_index(long x, long y)
+{
+    long i = _n * y + x;
+    if ((i < 0) | (i >= MAX_A))
+    {
+        printf("INDEX OUT OF BOUNDS. a[%li, %li]\n", x, y);
+        return 0;
+    }
+    return i;
+}
+
+static long r_index(long i)
+{
+    if ((i < 0) | (i >= MAX_R))
+    {
+        printf("INDEX OUT OF BOUNDS. r[%li]\n", i);
+        return 0;
+    }
+    return i;
+}
+
+static long sp_index(long i)
+{
+    if ((i < 0) | (i >= MAX_SP))
+    {
+        printf("INDEX OUT OF BOUNDS. sP[%li]\n", i);
+        return 0;
+    }
+    return i;
+}
+
+static long laij_index(long x, long y)
+{
+    long i = ((y)*_ny) + (x);
+    if ((i < 0) | (i >= MAX_LAIJ))
+    {
+        printf("INDEX OUT OF BOUNDS. l_Aij[%li, %li]\n", x, y);
+        return 0;
+    }
+    return i;
+}
+
+static long paij_index(long x, long y)
+{
+    long i = ((y)*_ncols) + (x);
+    if ((i < 0) | (i >= MAX_PAIJ))
+    {
+        printf("INDEX OUT OF BOUNDS. p_Aij[%li, %li]\n", x, y);
+        return 0;
+    }
+    return i;
+}
+
+static long lbj_index(long i)
+{
+    if ((i < 0) | (i >= MAX_LBJ))
+    {
+        printf("INDEX OUT OF BOUNDS. l_bj[%li]\n", i);
+        return 0;
+    }
+    return i;
+}
+
+static long pbj_index(long i)
+{
+    if ((i < 0) | (i >= MAX_PBJ))
+    {
+        printf("INDEX OUT OF BOUNDS. p_bj[%li]\n", i);
+        return 0;
+    }
+    return i;
+}
+
+static long im_index(long x, long y)
+{
+    long i = ((y)*_ncols) + (x);
+    if ((i < 0) | (i >= MAX_IM))
+    {
+        printf("INDEX OUT OF BOUNDS. im[%li, %li]\n", x, y);
+        return 0;
+    }
+    return i;
+}
+
+static long sl_index(long i)
+{
+    if ((i < 0) | (i >= MAX_SL))
+    {
+        printf("INDEX OUT OF BOUNDS. sL[%li]\n", i);
+        return 0;
+    }
+    return i;
+}
+#else
+#define zeta_index(x, y, z) ((z) + (y)*MAX_ZETA_Z + (x)*MAX_ZETA_Z * _nrows)
+#define mzeta_index(x, y) ((y) + (x)*_nrows)
+#define xi_index(x, y, z) ((z) + 4 * (y) + _ny * 4 * (x))
+#define psf_index(x, y) ((x)*3 + (y))
+#define a_index(x, y) ((y)*n + (x))
+#define r_index(i) (i)
+#define sp_index(i) (i)
+#define laij_index(x, y) ((y)*ny) + (x)
+#define paij_index(x, y) ((y)*ncols) + (x)
+#define lbj_index(i) (i)
+#define pbj_index(i) (i)
+#define im_index(x, y) ((y)*ncols) + (x)
+#define sl_index(i) (i)
+#endif
+
+int bandsol(double *a, double *r, int n, int nd)
+{
+    /*
+    bandsol solves a sparse system of linear equations with band-diagonal matrix.
+    Band is assumed to be symmetric relative to the main diaginal.
+
+    ..math:
+
+        A * x = r
+
+    Parameters
+    ----------
+    a : double array of shape [n,nd]
+        The left-hand-side of the equation system
+        The main diagonal should be in a(*,nd/2),
+        the first lower subdiagonal should be in a(1:n-1,nd/2-1),
+        the first upper subdiagonal is in a(0:n-2,nd/2+1) etc.
+        For example:
+                / 0 0 X X X \
+                | 0 X X X X |
+                | X X X X X |
+                | X X X X X |
+            A = | X X X X X |
+                | X X X X X |
+                | X X X X X |
+                | X X X X 0 |
+                \ X X X 0 0 /
+    r : double array of shape [n]
+        the right-hand-side of the equation system
+    n : int
+        The number of equations
+    nd : int
+        The width of the band (3 for tri-diagonal system). Must be an odd number.
+
+    Returns
+    -------
+    code : int
+        0 on success, -1 on incorrect size of "a" and -4 on degenerate matrix.
+    */
+    double aa;
+    int i, j, k;
+
+#if DEBUG
+    _n = n;
+    _nd = nd;
+#endif
+
+    /* Forward sweep */
+    for (i = 0; i < n - 1; i++)
+    {
+        aa = a[a_index(i, nd / 2)];
+#if DEBUG
+        if (aa == 0)
+        {
+            printf("1, index: %i, %i\n", i, nd / 2);
+            aa = 1;
+        }
+#endif
+        r[r_index(i)] /= aa;
+        for (j = 0; j < nd; j++)
+            a[a_index(i, j)] /= aa;
+        for (j = 1; j < min(nd / 2 + 1, n - i); j++)
+        {
+            aa = a[a_index(i + j, nd / 2 - j)];
+            r[r_index(i + j)] -= r[r_index(i)] * aa;
+            for (k = 0; k < nd - j; k++)
+                a[a_index(i + j, k)] -= a[a_index(i, k + j)] * aa;
+        }
+    }
+
+    /* Backward sweep */
+    aa = a[a_index(n - 1, nd / 2)];
+#if DEBUG
+    if (aa == 0)
+    {
+        printf("3, index: %i, %i\n", 0, nd / 2);
+        aa = 1;
+    }
+#endif
+    r[r_index(n - 1)] /= aa;
+    for (i = n - 1; i > 0; i--)
+    {
+        for (j = 1; j <= min(nd / 2, i); j++)
+            r[r_index(i - j)] -= r[r_index(i)] * a[a_index(i - j, nd / 2 + j)];
+        r[r_index(i - 1)] /= a[a_index(i - 1, nd / 2)];
+    }
+
+    aa = a[a_index(0, nd / 2)];
+#if DEBUG
+    if (aa == 0)
+    {
+        printf("4, index: %i, %i\n", 0, nd / 2);
+        aa = 1;
+    }
+#endif
+    r[r_index(0)] /= aa;
+    return 0;
+}
+
+// This is the faster median determination method.
+// Algorithm from Numerical recipes in C of 1992
+// see http://ndevilla.free.fr/median/median/
+
+#define ELEM_SWAP(a, b)          \
+    {                            \
+        register double t = (a); \
+        (a) = (b);               \
+        (b) = t;                 \
+    }
+
+double quick_select_median(double arr[], unsigned int n)
+{
+    int low, high;
+    int median;
+    int middle, ll, hh;
+
+    low = 0;
+    high = n - 1;
+    median = (low + high) / 2;
+    for (;;)
+    {
+        if (high <= low) /* One element only */
+            return arr[median];
+        if (high == low + 1)
+        { /* Two elements only */
+            if (arr[low] > arr[high])
+                ELEM_SWAP(arr[low], arr[high]);
+            return arr[median];
+        }
+        /* Find median of low, middle and high items; swap into position low */
+        middle = (low + high) / 2;
+        if (arr[middle] > arr[high])
+            ELEM_SWAP(arr[middle], arr[high]);
+        if (arr[low] > arr[high])
+            ELEM_SWAP(arr[low], arr[high]);
+        if (arr[middle] > arr[low])
+            ELEM_SWAP(arr[middle], arr[low]);
+        /* Swap low item (now in position middle) into position (low+1) */
+        ELEM_SWAP(arr[middle], arr[low + 1]);
+        /* Nibble from each end towards middle, swapping items when stuck */
+        ll = low + 1;
+        hh = high;
+        for (;;)
+        {
+            do
+                ll++;
+            while (arr[low] > arr[ll]);
+            do
+                hh--;
+            while (arr[hh] > arr[low]);
+            if (hh < ll)
+                break;
+            ELEM_SWAP(arr[ll], arr[hh]);
+        }
+        /* Swap middle item (in position low) back into correct position */
+        ELEM_SWAP(arr[low], arr[hh]);
+        /* Re-set active partition */
+        if (hh <= median)
+            low = ll;
+        if (hh >= median)
+            high = hh - 1;
+    }
+}
+
+double median_absolute_deviation(double arr[], unsigned int n)
+{
+    double median = quick_select_median(arr, n);
+    for (size_t i = 0; i < n; i++)
+    {
+        arr[i] = fabs(arr[i] - median);
+    }
+    double mad = quick_select_median(arr, n);
+    return mad;
+}
+
+int xi_zeta_tensors(
+    int ncols,
+    int nrows,
+    int ny,
+    double *ycen,
+    int *ycen_offset,
+    int y_lower_lim,
+    int osample,
+    double *PSF_curve,
+    xi_ref *xi,
+    zeta_ref *zeta,
+    int *m_zeta)
+{
+    /*
+    Create the Xi and Zeta tensors, that describe the contribution of each pixel to the subpixels of the image,
+    Considering the curvature of the slit.
+
+    Parameters
+    ----------
+    ncols : int
+        Swath width in pixels
+    nrows : int
+        Extraction slit height in pixels
+    ny : int
+        Size of the slit function array: ny = osample * (nrows + 1) + 1
+    ycen : double array of shape (ncols,)
+        Order centre line offset from pixel row boundary
+    ycen_offsets : int array of shape (ncols,)
+        Order image column shift
+    y_lower_lim : int
+        Number of detector pixels below the pixel containing the central line ycen
+    osample : int
+        Subpixel ovsersampling factor
+    PSF_curve : double array of shape (ncols, 3)
+        Parabolic fit to the slit image curvature.
+        For column d_x = PSF_curve[ncols][0] +  PSF_curve[ncols][1] *d_y + PSF_curve[ncols][2] *d_y^2,
+        where d_y is the offset from the central line ycen.
+        Thus central subpixel of omega[x][y'][delta_x][iy'] does not stick out of column x.
+    xi : (out) xi_ref array of shape (ncols, ny, 4)
+        Convolution tensor telling the coordinates of detector
+        pixels on which {x, iy} element falls and the corresponding projections.
+    zeta : (out) zeta_ref array of shape (ncols, nrows, 3 * (osample + 1))
+        Convolution tensor telling the coordinates of subpixels {x, iy} contributing
+        to detector pixel {x, y}.
+    m_zeta : (out) int array of shape (ncols, nrows)
+        The actual number of contributing elements in zeta for each pixel
+
+    Returns
+    -------
+    code : int
+        0 on success, -1 on failure
+    */
+    int x, xx, y, yy, ix, ix1, ix2, iy, iy1, iy2, m;
+    double step, delta, dy, w, d1, d2;
+
+    step = 1.e0 / osample;
+
+    /* Clean xi */
+    for (x = 0; x < ncols; x++)
+    {
+        for (iy = 0; iy < ny; iy++)
+        {
+            for (m = 0; m < 4; m++)
+            {
+                xi[xi_index(x, iy, m)].x = -1;
+                xi[xi_index(x, iy, m)].y = -1;
+                xi[xi_index(x, iy, m)].w = 0.;
+            }
+        }
+    }
+
+    /* Clean zeta */
+    for (x = 0; x < ncols; x++)
+    {
+        for (y = 0; y < nrows; y++)
+        {
+            m_zeta[mzeta_index(x, y)] = 0;
+            for (ix = 0; ix < MAX_ZETA_Z; ix++)
+            {
+                zeta[zeta_index(x, y, ix)].x = -1;
+                zeta[zeta_index(x, y, ix)].iy = -1;
+                zeta[zeta_index(x, y, ix)].w = 0.;
+            }
+        }
+    }
+
+    /*
+    Construct the xi and zeta tensors. They contain pixel references and contribution.
+    values going from a given subpixel to other pixels (xi) and coming from other subpixels
+    to a given detector pixel (zeta).
+    Note, that xi and zeta are used in the equations for sL, sP and for the model but they
+    do not involve the data, only the geometry. Thus it can be pre-computed once.
+    */
+    for (x = 0; x < ncols; x++)
+    {
+        /*
+        I promised to reconsider the initial offset. Here it is. For the original layout
+        (no column shifts and discontinuities in ycen) there is pixel y that contains the
+        central line yc. There are two options here (by construction of ycen that can be 0
+        but cannot be 1): (1) yc is inside pixel y and (2) yc falls at the boundary between
+        pixels y and y-1. yc cannot be at the boundary of pixels y+1 and y because we would
+        select y+1 to be pixel y in that case.
+
+        Next we need to define starting and ending indices iy for sL subpixels that contribute
+        to pixel y. I call them iy1 and iy2. For both cases we assume osample+1 subpixels covering
+        pixel y (wierd). So for case 1 iy1 will be (y-1)*osample and iy2 == y*osample. Special
+        treatment of the boundary subpixels will compensate for introducing extra subpixel in
+        case 1. In case 2 things are more logical: iy1=(yc-y)*osample+(y-1)*osample;
+        iy2=(y+1-yc)*osample)+(y-1)*osample. ycen is yc-y making things simpler. Note also that
+        the same pattern repeates for all rows: we only need to initialize iy1 and iy2 and keep
+        incrementing them by osample.
+        */
+
+        iy2 = osample - floor(ycen[x] * osample);
+        iy1 = iy2 - osample;
+
+        /*
+        Handling partial subpixels cut by detector pixel rows is again tricky. Here we have three
+        cases (mostly because of the decision to assume that we always have osample+1 subpixels
+        per one detector pixel). Here d1 is the fraction of the subpixel iy1 inside detector pixel y.
+        d2 is then the fraction of subpixel iy2 inside detector pixel y. By definition d1+d2==step.
+        Case 1: ycen falls on the top boundary of each detector pixel (ycen == 1). Here we conclude
+                that the first subpixel is fully contained inside pixel y and d1 is set to step.
+        Case 2: ycen falls on the bottom boundary of each detector pixel (ycen == 0). Here we conclude
+                that the first subpixel is totally outside of pixel y and d1 is set to 0.
+        Case 3: ycen falls inside of each pixel (0>ycen>1). In this case d1 is set to the fraction of
+                the first step contained inside of each pixel.
+        And BTW, this also means that central line coinsides with the upper boundary of subpixel iy2
+        when the y loop reaches pixel y_lower_lim. In other words:
+
+        dy=(iy-(y_lower_lim+ycen[x])*osample)*step-0.5*step
+        */
+
+        d1 = fmod(ycen[x], step);
+        if (d1 == 0)
+            d1 = step;
+        d2 = step - d1;
+
+        /*
+        The final hurdle for 2D slit decomposition is to construct two 3D reference tensors. We proceed
+        similar to 1D case except that now each iy subpixel can be shifted left or right following
+        the curvature of the slit image on the detector. We assume for now that each subpixel is
+        exactly 1 detector pixel wide. This may not be exactly true if the curvature changes accross
+        the focal plane but will deal with it when the necessity will become apparent. For now we
+        just assume that a shift delta the weight w assigned to subpixel iy is divided between
+        ix1=int(delta) and ix2=int(delta)+signum(delta) as (1-|delta-ix1|)*w and |delta-ix1|*w.
+
+        The curvature is given by a quadratic polynomial evaluated from an approximation for column
+        x: delta = PSF_curve[x][0] + PSF_curve[x][1] * (y-yc[x]) + PSF_curve[x][2] * (y-yc[x])^2.
+        It looks easy except that y and yc are set in the global detector coordinate system rather than
+        in the shifted and cropped swath passed to slit_func_2d. One possible solution I will try here
+        is to modify PSF_curve before the call such as:
+        delta = PSF_curve'[x][0] + PSF_curve'[x][1] * (y'-ycen[x]) + PSF_curve'[x][2] * (y'-ycen[x])^2
+        where y' = y - floor(yc).
+        */
+
+        /* Define initial distance from ycen       */
+        /* It is given by the center of the first  */
+        /* subpixel falling into pixel y_lower_lim */
+        dy = ycen[x] - floor((y_lower_lim + ycen[x]) / step) * step - step;
+
+        /*
+        Now we go detector pixels x and y incrementing subpixels looking for their controibutions
+        to the current and adjacent pixels. Note that the curvature/tilt of the projected slit
+        image could be so large that subpixel iy may no contribute to column x at all. On the
+        other hand, subpixels around ycen by definition must contribute to pixel x,y.
+        3rd index in xi refers corners of pixel xx,y: 0:LL, 1:LR, 2:UL, 3:UR.
+        */
+
+        for (y = 0; y < nrows; y++)
+        {
+            iy1 += osample; // Bottom subpixel falling in row y
+            iy2 += osample; // Top subpixel falling in row y
+            dy -= step;
+            for (iy = iy1; iy <= iy2; iy++)
+            {
+                if (iy == iy1)
+                    w = d1;
+                else if (iy == iy2)
+                    w = d2;
+                else
+                    w = step;
+                dy += step;
+                delta = (PSF_curve[psf_index(x, 1)] + PSF_curve[psf_index(x, 2)] * (dy - ycen[x])) * (dy - ycen[x]);
+                ix1 = delta;
+                ix2 = ix1 + signum(delta);
+
+                /* Three cases: subpixel on the bottom boundary of row y, intermediate subpixels and top boundary */
+
+                if (iy == iy1) /* Case A: Subpixel iy is entering detector row y */
+                {
+                    if (ix1 < ix2) /* Subpixel iy shifts to the right from column x  */
+                    {
+                        if (x + ix1 >= 0 && x + ix2 < ncols)
+                        {
+                            xx = x + ix1; /* Upper right corner of subpixel iy */
+                            yy = y + ycen_offset[x] - ycen_offset[xx];
+                            xi[xi_index(x, iy, 3)].x = xx;
+                            xi[xi_index(x, iy, 3)].y = yy;
+                            xi[xi_index(x, iy, 3)].w = w - fabs(delta - ix1) * w;
+                            if (xx >= 0 && xx < ncols && yy >= 0 && yy < nrows && xi[xi_index(x, iy, 3)].w > 0)
+                            {
+                                m = m_zeta[mzeta_index(xx, yy)];
+                                zeta[zeta_index(xx, yy, m)].x = x;
+                                zeta[zeta_index(xx, yy, m)].iy = iy;
+                                zeta[zeta_index(xx, yy, m)].w = xi[xi_index(x, iy, 3)].w;
+                                m_zeta[mzeta_index(xx, yy)]++;
+                            }
+                            xx = x + ix2; /* Upper left corner of subpixel iy */
+                            // This offset is required because the iy subpixel
+                            // is going to contribute to the yy row in xx column
+                            // of detector pixels where yy and y are in the same
+                            // row. In the packed array this is not necessarily true.
+                            // Instead, what we know is that:
+                            // y+ycen_offset[x] == yy+ycen_offset[xx]
+                            yy = y + ycen_offset[x] - ycen_offset[xx];
+
+                            xi[xi_index(x, iy, 2)].x = xx;
+                            xi[xi_index(x, iy, 2)].y = yy;
+                            xi[xi_index(x, iy, 2)].w = fabs(delta - ix1) * w;
+                            if (xx >= 0 && xx < ncols && yy >= 0 && yy < nrows && xi[xi_index(x, iy, 2)].w > 0)
+                            {
+                                m = m_zeta[mzeta_index(xx, yy)];
+                                zeta[zeta_index(xx, yy, m)].x = x;
+                                zeta[zeta_index(xx, yy, m)].iy = iy;
+                                zeta[zeta_index(xx, yy, m)].w = xi[xi_index(x, iy, 2)].w;
+                                m_zeta[mzeta_index(xx, yy)]++;
+                            }
+                        }
+                    }
+                    else if (ix1 > ix2) /* Subpixel iy shifts to the left from column x */
+                    {
+                        if (x + ix2 >= 0 && x + ix1 < ncols)
+                        {
+                            xx = x + ix2; /* Upper left corner of subpixel iy */
+                            yy = y + ycen_offset[x] - ycen_offset[xx];
+                            xi[xi_index(x, iy, 2)].x = xx;
+                            xi[xi_index(x, iy, 2)].y = yy;
+                            xi[xi_index(x, iy, 2)].w = fabs(delta - ix1) * w;
+                            if (xx >= 0 && xx < ncols && yy >= 0 && yy < nrows && xi[xi_index(x, iy, 2)].w > 0)
+                            {
+                                m = m_zeta[mzeta_index(xx, yy)];
+                                zeta[zeta_index(xx, yy, m)].x = x;
+                                zeta[zeta_index(xx, yy, m)].iy = iy;
+                                zeta[zeta_index(xx, yy, m)].w = xi[xi_index(x, iy, 2)].w;
+                                m_zeta[mzeta_index(xx, yy)]++;
+                            }
+                            xx = x + ix1; /* Upper right corner of subpixel iy */
+                            yy = y + ycen_offset[x] - ycen_offset[xx];
+                            xi[xi_index(x, iy, 3)].x = xx;
+                            xi[xi_index(x, iy, 3)].y = yy;
+                            xi[xi_index(x, iy, 3)].w = w - fabs(delta - ix1) * w;
+                            if (xx >= 0 && xx < ncols && yy >= 0 && yy < nrows && xi[xi_index(x, iy, 3)].w > 0)
+                            {
+                                m = m_zeta[mzeta_index(xx, yy)];
+                                zeta[zeta_index(xx, yy, m)].x = x;
+                                zeta[zeta_index(xx, yy, m)].iy = iy;
+                                zeta[zeta_index(xx, yy, m)].w = xi[xi_index(x, iy, 3)].w;
+                                m_zeta[mzeta_index(xx, yy)]++;
+                            }
+                        }
+                    }
+                    else
+                    {
+                        xx = x + ix1; /* Subpixel iy stays inside column x */
+                        yy = y + ycen_offset[x] - ycen_offset[xx];
+                        xi[xi_index(x, iy, 2)].x = xx;
+                        xi[xi_index(x, iy, 2)].y = yy;
+                        xi[xi_index(x, iy, 2)].w = w;
+                        if (xx >= 0 && xx < ncols && yy >= 0 && yy < nrows && w > 0)
+                        {
+                            m = m_zeta[mzeta_index(xx, yy)];
+                            zeta[zeta_index(xx, yy, m)].x = x;
+                            zeta[zeta_index(xx, yy, m)].iy = iy;
+                            zeta[zeta_index(xx, yy, m)].w = w;
+                            m_zeta[mzeta_index(xx, yy)]++;
+                        }
+                    }
+                }
+                else if (iy == iy2) /* Case C: Subpixel iy is leaving detector row y */
+                {
+                    if (ix1 < ix2) /* Subpixel iy shifts to the right from column x */
+                    {
+                        if (x + ix1 >= 0 && x + ix2 < ncols)
+                        {
+                            xx = x + ix1; /* Bottom right corner of subpixel iy */
+                            yy = y + ycen_offset[x] - ycen_offset[xx];
+                            xi[xi_index(x, iy, 1)].x = xx;
+                            xi[xi_index(x, iy, 1)].y = yy;
+                            xi[xi_index(x, iy, 1)].w = w - fabs(delta - ix1) * w;
+                            if (xx >= 0 && xx < ncols && yy >= 0 && yy < nrows && xi[xi_index(x, iy, 1)].w > 0)
+                            {
+                                m = m_zeta[mzeta_index(xx, yy)];
+                                zeta[zeta_index(xx, yy, m)].x = x;
+                                zeta[zeta_index(xx, yy, m)].iy = iy;
+                                zeta[zeta_index(xx, yy, m)].w = xi[xi_index(x, iy, 1)].w;
+                                m_zeta[mzeta_index(xx, yy)]++;
+                            }
+                            xx = x + ix2; /* Bottom left corner of subpixel iy */
+                            yy = y + ycen_offset[x] - ycen_offset[xx];
+                            xi[xi_index(x, iy, 0)].x = xx;
+                            xi[xi_index(x, iy, 0)].y = yy;
+                            xi[xi_index(x, iy, 0)].w = fabs(delta - ix1) * w;
+                            if (xx >= 0 && xx < ncols && yy >= 0 && yy < nrows && xi[xi_index(x, iy, 0)].w > 0)
+                            {
+                                m = m_zeta[mzeta_index(xx, yy)];
+                                zeta[zeta_index(xx, yy, m)].x = x;
+                                zeta[zeta_index(xx, yy, m)].iy = iy;
+                                zeta[zeta_index(xx, yy, m)].w = xi[xi_index(x, iy, 0)].w;
+                                m_zeta[mzeta_index(xx, yy)]++;
+                            }
+                        }
+                    }
+                    else if (ix1 > ix2) /* Subpixel iy shifts to the left from column x */
+                    {
+                        if (x + ix2 >= 0 && x + ix1 < ncols)
+                        {
+                            xx = x + ix2; /* Bottom left corner of subpixel iy */
+                            yy = y + ycen_offset[x] - ycen_offset[xx];
+                            xi[xi_index(x, iy, 0)].x = xx;
+                            xi[xi_index(x, iy, 0)].y = yy;
+                            xi[xi_index(x, iy, 0)].w = fabs(delta - ix1) * w;
+                            if (xx >= 0 && xx < ncols && yy >= 0 && yy < nrows && xi[xi_index(x, iy, 0)].w > 0)
+                            {
+                                m = m_zeta[mzeta_index(xx, yy)];
+                                zeta[zeta_index(xx, yy, m)].x = x;
+                                zeta[zeta_index(xx, yy, m)].iy = iy;
+                                zeta[zeta_index(xx, yy, m)].w = xi[xi_index(x, iy, 0)].w;
+                                m_zeta[mzeta_index(xx, yy)]++;
+                            }
+                            xx = x + ix1; /* Bottom right corner of subpixel iy */
+                            yy = y + ycen_offset[x] - ycen_offset[xx];
+                            xi[xi_index(x, iy, 1)].x = xx;
+                            xi[xi_index(x, iy, 1)].y = yy;
+                            xi[xi_index(x, iy, 1)].w = w - fabs(delta - ix1) * w;
+                            if (xx >= 0 && xx < ncols && yy >= 0 && yy < nrows && xi[xi_index(x, iy, 1)].w > 0)
+                            {
+                                m = m_zeta[mzeta_index(xx, yy)];
+                                zeta[zeta_index(xx, yy, m)].x = x;
+                                zeta[zeta_index(xx, yy, m)].iy = iy;
+                                zeta[zeta_index(xx, yy, m)].w = xi[xi_index(x, iy, 1)].w;
+                                m_zeta[mzeta_index(xx, yy)]++;
+                            }
+                        }
+                    }
+                    else /* Subpixel iy stays inside column x        */
+                    {
+                        xx = x + ix1;
+                        yy = y + ycen_offset[x] - ycen_offset[xx];
+                        xi[xi_index(x, iy, 0)].x = xx;
+                        xi[xi_index(x, iy, 0)].y = yy;
+                        xi[xi_index(x, iy, 0)].w = w;
+                        if (xx >= 0 && xx < ncols && yy >= 0 && yy < nrows && w > 0)
+                        {
+                            m = m_zeta[mzeta_index(xx, yy)];
+                            zeta[zeta_index(xx, yy, m)].x = x;
+                            zeta[zeta_index(xx, yy, m)].iy = iy;
+                            zeta[zeta_index(xx, yy, m)].w = w;
+                            m_zeta[mzeta_index(xx, yy)]++;
+                        }
+                    }
+                }
+                else /* CASE B: Subpixel iy is fully inside detector row y */
+                {
+                    if (ix1 < ix2) /* Subpixel iy shifts to the right from column x      */
+                    {
+                        if (x + ix1 >= 0 && x + ix2 < ncols)
+                        {
+                            xx = x + ix1; /* Bottom right corner of subpixel iy */
+                            yy = y + ycen_offset[x] - ycen_offset[xx];
+                            xi[xi_index(x, iy, 1)].x = xx;
+                            xi[xi_index(x, iy, 1)].y = yy;
+                            xi[xi_index(x, iy, 1)].w = w - fabs(delta - ix1) * w;
+                            if (xx >= 0 && xx < ncols && yy >= 0 && yy < nrows && xi[xi_index(x, iy, 1)].w > 0)
+                            {
+                                m = m_zeta[mzeta_index(xx, yy)];
+                                zeta[zeta_index(xx, yy, m)].x = x;
+                                zeta[zeta_index(xx, yy, m)].iy = iy;
+                                zeta[zeta_index(xx, yy, m)].w = xi[xi_index(x, iy, 1)].w;
+                                m_zeta[mzeta_index(xx, yy)]++;
+                            }
+                            xx = x + ix2; /* Bottom left corner of subpixel iy */
+                            yy = y + ycen_offset[x] - ycen_offset[xx];
+                            xi[xi_index(x, iy, 0)].x = xx;
+                            xi[xi_index(x, iy, 0)].y = yy;
+                            xi[xi_index(x, iy, 0)].w = fabs(delta - ix1) * w;
+                            if (xx >= 0 && xx < ncols && yy >= 0 && yy < nrows && xi[xi_index(x, iy, 0)].w > 0)
+                            {
+                                m = m_zeta[mzeta_index(xx, yy)];
+                                zeta[zeta_index(xx, yy, m)].x = x;
+                                zeta[zeta_index(xx, yy, m)].iy = iy;
+                                zeta[zeta_index(xx, yy, m)].w = xi[xi_index(x, iy, 0)].w;
+                                m_zeta[mzeta_index(xx, yy)]++;
+                            }
+                        }
+                    }
+                    else if (ix1 > ix2) /* Subpixel iy shifts to the left from column x */
+                    {
+                        if (x + ix2 >= 0 && x + ix1 < ncols)
+                        {
+                            xx = x + ix2; /* Bottom right corner of subpixel iy */
+                            yy = y + ycen_offset[x] - ycen_offset[xx];
+                            xi[xi_index(x, iy, 1)].x = xx;
+                            xi[xi_index(x, iy, 1)].y = yy;
+                            xi[xi_index(x, iy, 1)].w = fabs(delta - ix1) * w;
+                            if (xx >= 0 && xx < ncols && yy >= 0 && yy < nrows && xi[xi_index(x, iy, 1)].w > 0)
+                            {
+                                m = m_zeta[mzeta_index(xx, yy)];
+                                zeta[zeta_index(xx, yy, m)].x = x;
+                                zeta[zeta_index(xx, yy, m)].iy = iy;
+                                zeta[zeta_index(xx, yy, m)].w = xi[xi_index(x, iy, 1)].w;
+                                m_zeta[mzeta_index(xx, yy)]++;
+                            }
+                            xx = x + ix1; /* Bottom left corner of subpixel iy */
+                            yy = y + ycen_offset[x] - ycen_offset[xx];
+                            xi[xi_index(x, iy, 0)].x = xx;
+                            xi[xi_index(x, iy, 0)].y = yy;
+                            xi[xi_index(x, iy, 0)].w = w - fabs(delta - ix1) * w;
+                            if (xx >= 0 && xx < ncols && yy >= 0 && yy < nrows && xi[xi_index(x, iy, 0)].w > 0)
+                            {
+                                m = m_zeta[mzeta_index(xx, yy)];
+                                zeta[zeta_index(xx, yy, m)].x = x;
+                                zeta[zeta_index(xx, yy, m)].iy = iy;
+                                zeta[zeta_index(xx, yy, m)].w = xi[xi_index(x, iy, 0)].w;
+                                m_zeta[mzeta_index(xx, yy)]++;
+                            }
+                        }
+                    }
+                    else /* Subpixel iy stays inside column x */
+                    {
+                        xx = x + ix2;
+                        yy = y + ycen_offset[x] - ycen_offset[xx];
+                        xi[xi_index(x, iy, 0)].x = xx;
+                        xi[xi_index(x, iy, 0)].y = yy;
+                        xi[xi_index(x, iy, 0)].w = w;
+                        if (xx >= 0 && xx < ncols && yy >= 0 && yy < nrows && w > 0)
+                        {
+                            m = m_zeta[mzeta_index(xx, yy)];
+                            zeta[zeta_index(xx, yy, m)].x = x;
+                            zeta[zeta_index(xx, yy, m)].iy = iy;
+                            zeta[zeta_index(xx, yy, m)].w = w;
+                            m_zeta[mzeta_index(xx, yy)]++;
+                        }
+                    }
+                }
+            }
+        }
+    }
+    return 0;
+}
+
+int slit_func_curved(int ncols,
+                     int nrows,
+                     int ny,
+                     double *im,
+                     double *pix_unc,
+                     unsigned char *mask,
+                     double *ycen,
+                     int *ycen_offset,
+                     int y_lower_lim,
+                     int osample,
+                     double lambda_sP,
+                     double lambda_sL,
+                     int maxiter,
+                     double *PSF_curve,
+                     double *sP,
+                     double *sL,
+                     double *model,
+                     double *unc,
+                     double *info)
+{
+    /*
+    Extract the spectrum and slit illumination function for a curved slit
+
+    This function does not assign or free any memory,
+    therefore all working arrays are passed as parameters.
+    The contents of which will be overriden however
+
+    Parameters
+    ----------
+    ncols : int
+        Swath width in pixels
+    nrows : int
+        Extraction slit height in pixels
+    nx : int
+        Range of columns affected by PSF tilt: nx = 2 * delta_x + 1
+    ny : int
+        Size of the slit function array: ny = osample * (nrows + 1) + 1
+    im : double array of shape (nrows, ncols)
+        Image to be decomposed
+    pix_unc : double array of shape (nrows, ncols)
+        Individual pixel uncertainties. Set to zero if unknown.
+    mask : byte array of shape (nrows, ncols)
+        Initial and final mask for the swath, both in and output
+    ycen : double array of shape (ncols,)
+        Order centre line offset from pixel row boundary.
+        Should only contain values between 0 and 1.
+    ycen_offset : int array of shape (ncols,)
+        Order image column shift
+    y_lower_lim : int
+        Number of detector pixels below the pixel containing
+        the central line yc.
+    osample : int
+        Subpixel ovsersampling factor
+    lambda_sP : double
+        Smoothing parameter for the spectrum, could be zero
+    lambda_sL : double
+        Smoothing parameter for the slit function, usually > 0
+    PSF_curve : double array of shape (ncols, 3)
+        Slit curvature parameters for each point along the spectrum
+    sP : (out) double array of shape (ncols,)
+        Spectrum resulting from decomposition
+    sL : (out) double array of shape (ny,)
+        Slit function resulting from decomposition
+    model : (out) double array of shape (ncols, nrows)
+        Model constructed from sp and sf
+    unc : (out) double array of shape (ncols,)
+        Spectrum uncertainties based on data - model and pix_unc
+    info : (out) double array of shape (5,)
+        Returns information about the fit results
+    Returns
+    -------
+    code : int
+        0 on success, -1 on failure (see also bandsol)
+    */
+    int x, xx, xxx, y, yy, iy, jy, n, m, nx;
+    double norm, dev, lambda, diag_tot, ww, www;
+    double cost_old, ftol, tmp;
+    int iter, delta_x;
+    unsigned int isum;
+
+    // For the solving of the equation system
+    double *l_Aij, *l_bj, *p_Aij, *p_bj;
+    double *diff;
+
+    // For the geometry
+    xi_ref *xi;
+    zeta_ref *zeta;
+    int *m_zeta;
+
+    // The Optimization results
+    double success, status, cost;
+
+    // maxiter = 20; // Maximum number of iterations
+    ftol = 1e-7;  // Maximum cost difference between two iterations to stop convergence
+    success = 1;
+    status = 0;
+
+    cost = INFINITY;
+    ny = osample * (nrows + 1) + 1; /* The size of the sL array. Extra osample is because ycen can be between 0 and 1. */
+
+#if DEBUG
+    _ncols = ncols;
+    _nrows = nrows;
+    _ny = ny;
+    _osample = osample;
+#endif
+
+    // If we want to smooth the spectrum we need at least delta_x = 1
+    // Otherwise delta_x = 0 works if there is no curvature
+    delta_x = lambda_sP == 0 ? 0 : 1;
+    for (x = 0; x < ncols; x++)
+    {
+        for (y = -y_lower_lim; y < nrows - y_lower_lim + 1; y++)
+        {
+            tmp = ceil(fabs(y * PSF_curve[psf_index(x, 1)] + y * y * PSF_curve[psf_index(x, 2)]));
+            delta_x = max(delta_x, tmp);
+        }
+    }
+    nx = 4 * delta_x + 1; /* Maximum horizontal shift in detector pixels due to slit image curvature         */
+
+#if DEBUG
+    _nx = nx;
+#endif
+
+    // The curvature is larger than the number of columns
+    // Usually that means that the curvature is messed up
+    if (nx > ncols)
+    {
+        info[0] = 0;    //failed
+        info[1] = cost; //INFINITY
+        info[2] = -2;   // curvature to large
+        info[3] = 0;
+        info[4] = delta_x;
+        return -1;
+    }
+
+    l_Aij = malloc(MAX_LAIJ * sizeof(double));
+    p_Aij = malloc(MAX_PAIJ * sizeof(double));
+    l_bj = malloc(MAX_LBJ * sizeof(double));
+    p_bj = malloc(MAX_PBJ * sizeof(double));
+    xi = malloc(MAX_XI * sizeof(xi_ref));
+    zeta = malloc(MAX_ZETA * sizeof(zeta_ref));
+    m_zeta = malloc(MAX_MZETA * sizeof(int));
+    diff = malloc(MAX_IM * sizeof(double));
+
+    xi_zeta_tensors(ncols, nrows, ny, ycen, ycen_offset, y_lower_lim, osample, PSF_curve, xi, zeta, m_zeta);
+
+    /* Loop through sL , sP reconstruction until convergence is reached */
+    iter = 0;
+    do
+    {
+        // Save the total cost (chi-square) from the previous iteration
+        cost_old = cost;
+
+        /* Compute slit function sL */
+
+        /* Prepare the RHS and the matrix */
+        for (iy = 0; iy < MAX_LBJ; iy++)
+            l_bj[lbj_index(iy)] = 0.e0; /* Clean RHS */
+        for (iy = 0; iy < MAX_LAIJ; iy++)
+            l_Aij[iy] = 0;
+
+        /* Fill in SLE arrays for slit function */
+        diag_tot = 0.e0;
+        for (iy = 0; iy < ny; iy++)
+        {
+            for (x = 0; x < ncols; x++)
+            {
+                for (n = 0; n < 4; n++)
+                {
+                    ww = xi[xi_index(x, iy, n)].w;
+                    if (ww > 0)
+                    {
+                        xx = xi[xi_index(x, iy, n)].x;
+                        yy = xi[xi_index(x, iy, n)].y;
+                        if (xx >= 0 && xx < ncols && yy >= 0 && yy < nrows)
+                        {
+                            if (m_zeta[mzeta_index(xx, yy)] > 0)
+                            {
+                                for (m = 0; m < m_zeta[mzeta_index(xx, yy)]; m++)
+                                {
+                                    xxx = zeta[zeta_index(xx, yy, m)].x;
+                                    jy = zeta[zeta_index(xx, yy, m)].iy;
+                                    www = zeta[zeta_index(xx, yy, m)].w;
+                                    l_Aij[laij_index(iy, jy - iy + 2 * osample)] += sP[sp_index(xxx)] * sP[sp_index(x)] * www * ww * mask[im_index(xx, yy)];
+                                }
+                                l_bj[lbj_index(iy)] += im[im_index(xx, yy)] * mask[im_index(xx, yy)] * sP[sp_index(x)] * ww;
+                            }
+                        }
+                    }
+                }
+            }
+            diag_tot += l_Aij[laij_index(iy, 2 * osample)];
+        }
+
+        /* Scale regularization parameters */
+        lambda = lambda_sL * diag_tot / ny;
+
+        /* Add regularization parts for the SLE matrix */
+
+        l_Aij[laij_index(0, 2 * osample)] += lambda;     /* Main diagonal  */
+        l_Aij[laij_index(0, 2 * osample + 1)] -= lambda; /* Upper diagonal */
+        for (iy = 1; iy < ny - 1; iy++)
+        {
+            l_Aij[laij_index(iy, 2 * osample - 1)] -= lambda;    /* Lower diagonal */
+            l_Aij[laij_index(iy, 2 * osample)] += lambda * 2.e0; /* Main diagonal  */
+            l_Aij[laij_index(iy, 2 * osample + 1)] -= lambda;    /* Upper diagonal */
+        }
+        l_Aij[laij_index(ny - 1, 2 * osample - 1)] -= lambda; /* Lower diagonal */
+        l_Aij[laij_index(ny - 1, 2 * osample)] += lambda;     /* Main diagonal  */
+
+        /* Solve the system of equations */
+        bandsol(l_Aij, l_bj, MAX_LAIJ_X, MAX_LAIJ_Y);
+
+        /* Normalize the slit function */
+
+        norm = 0.e0;
+        for (iy = 0; iy < ny; iy++)
+        {
+            sL[sl_index(iy)] = l_bj[lbj_index(iy)];
+            norm += sL[sl_index(iy)];
+        }
+        norm /= osample;
+        for (iy = 0; iy < ny; iy++)
+            sL[sl_index(iy)] /= norm;
+
+        /* Compute spectrum sP */
+        for (x = 0; x < MAX_PBJ; x++)
+            p_bj[pbj_index(x)] = 0;
+        for (x = 0; x < MAX_PAIJ; x++)
+            p_Aij[x] = 0;
+
+        for (x = 0; x < ncols; x++)
+        {
+            for (iy = 0; iy < ny; iy++)
+            {
+                for (n = 0; n < 4; n++)
+                {
+                    ww = xi[xi_index(x, iy, n)].w;
+                    if (ww > 0)
+                    {
+                        xx = xi[xi_index(x, iy, n)].x;
+                        yy = xi[xi_index(x, iy, n)].y;
+                        if (xx >= 0 && xx < ncols && yy >= 0 && yy < nrows)
+                        {
+                            if (m_zeta[mzeta_index(xx, yy)] > 0)
+                            {
+                                for (m = 0; m < m_zeta[mzeta_index(xx, yy)]; m++)
+                                {
+                                    xxx = zeta[zeta_index(xx, yy, m)].x;
+                                    jy = zeta[zeta_index(xx, yy, m)].iy;
+                                    www = zeta[zeta_index(xx, yy, m)].w;
+                                    p_Aij[paij_index(x, xxx - x + 2 * delta_x)] += sL[sl_index(jy)] * sL[sl_index(iy)] * www * ww * mask[im_index(xx, yy)];
+                                }
+                                p_bj[pbj_index(x)] += im[im_index(xx, yy)] * mask[im_index(xx, yy)] * sL[sl_index(iy)] * ww;
+                            }
+                        }
+                    }
+                }
+            }
+        }
+
+        if (lambda_sP > 0.e0)
+        {
+            norm = 0.e0;
+            for (x = 0; x < ncols; x++)
+            {
+                norm += sP[sp_index(x)];
+            }
+            norm /= ncols;
+            lambda = lambda_sP * norm; /* Scale regularization parameter */
+
+            p_Aij[paij_index(0, 2 * delta_x)] += lambda;     /* Main diagonal  */
+            p_Aij[paij_index(0, 2 * delta_x + 1)] -= lambda; /* Upper diagonal */
+            for (x = 1; x < ncols - 1; x++)
+            {
+                p_Aij[paij_index(x, 2 * delta_x - 1)] -= lambda;    /* Lower diagonal */
+                p_Aij[paij_index(x, 2 * delta_x)] += lambda * 2.e0; /* Main diagonal  */
+                p_Aij[paij_index(x, 2 * delta_x + 1)] -= lambda;    /* Upper diagonal */
+            }
+            p_Aij[paij_index(ncols - 1, 2 * delta_x - 1)] -= lambda; /* Lower diagonal */
+            p_Aij[paij_index(ncols - 1, 2 * delta_x)] += lambda;     /* Main diagonal  */
+        }
+
+        /* Solve the system of equations */
+        bandsol(p_Aij, p_bj, MAX_PAIJ_X, MAX_PAIJ_Y);
+
+        for (x = 0; x < ncols; x++)
+            sP[sp_index(x)] = p_bj[pbj_index(x)];
+
+        /* Compute the model */
+        for (x = 0; x < MAX_IM; x++)
+        {
+            model[x] = 0.;
+        }
+
+        for (y = 0; y < nrows; y++)
+        {
+            for (x = 0; x < ncols; x++)
+            {
+                for (m = 0; m < m_zeta[mzeta_index(x, y)]; m++)
+                {
+                    xx = zeta[zeta_index(x, y, m)].x;
+                    iy = zeta[zeta_index(x, y, m)].iy;
+                    ww = zeta[zeta_index(x, y, m)].w;
+                    model[im_index(x, y)] += sP[xx] * sL[iy] * ww;
+                }
+            }
+        }
+
+        /* Compare model and data */
+        // We use the Median absolute derivation to estimate the distribution
+        // The MAD is more robust than the usual STD as it uses the median
+        // However the MAD << STD, since we are not dealing with a Gaussian
+        // at all, but a distribution with heavy wings.
+        // Therefore we use the factor 40, instead of 6 to estimate a reasonable range
+        // of values. The cutoff is roughly the same.
+        // Technically the distribution might best be described by a Voigt profile
+        // which we then would have to fit to the distrubtion and then determine,
+        // the range that covers 99% of the data.
+        // Since that is much more complicated we just use the MAD.
+        cost = 0;
+        isum = 0;
+        for (y = 0; y < nrows; y++)
+        {
+            for (x = delta_x; x < ncols - delta_x; x++)
+            {
+                if (mask[im_index(x, y)])
+                {
+                    tmp = model[im_index(x, y)] - im[im_index(x, y)];
+                    diff[isum] = tmp;
+                    tmp /= max(pix_unc[im_index(x, y)], 1);
+                    cost += tmp * tmp;
+                    isum++;
+                }
+            }
+        }
+        cost /= (isum - (ncols + ny));
+        dev = median_absolute_deviation(diff, isum);
+        // This is the "conversion" factor betweem MAD and STD
+        // i.e. a perfect normal distribution has MAD = sqrt(2/pi) * STD
+        dev *= 1.4826;
+
+        /* Adjust the mask marking outlyers */
+        for (y = 0; y < nrows; y++)
+        {
+            for (x = delta_x; x < ncols - delta_x; x++)
+            {
+                // The MAD is significantly smaller than the STD was, since it describes
+                // only the central peak, not the distribution
+                // The factor 40 was chosen, since it is roughly equal to 6 * STD
+                if (fabs(model[im_index(x, y)] - im[im_index(x, y)]) < 40. * dev)
+                    mask[im_index(x, y)] = 1;
+                else
+                    mask[im_index(x, y)] = 0;
+            }
+        }
+
+#if DEBUG
+        if (cost == 0)
+        {
+            printf("Iteration: %i, Reduced chi-square: %f\n", iter, cost);
+            printf("dev: %f\n", dev);
+            printf("isum: %i\n", isum);
+            printf("iteration: %i\n", iter);
+            printf("-----------\n");
+        }
+#endif
+        /* Check for convergence */
+    } while (((iter++ < maxiter) && (cost_old - cost > ftol)) || ((isfinite(cost) == 0) || ((isfinite(cost_old) == 0))));
+
+    if (iter >= maxiter - 1)
+    {
+        status = -1; // ran out of iterations
+        success = 0;
+    }
+    else if (cost_old - cost <= ftol)
+        status = 1; // cost did not improve enough between iterations
+
+    /* Uncertainty estimate */
+
+    for (x = 0; x < ncols; x++)
+    {
+        unc[sp_index(x)] = 0.;
+        p_bj[pbj_index(x)] = 0.;
+        p_Aij[paij_index(x, 0)] = 0;
+    }
+
+    for (y = 0; y < nrows; y++)
+    {
+        for (x = 0; x < ncols; x++)
+        {
+            for (m = 0; m < m_zeta[mzeta_index(x, y)]; m++) // Loop through all pixels contributing to x,y
+            {
+                if (mask[im_index(x, y)])
+                {
+                    // Should pix_unc contribute here?
+                    xx = zeta[zeta_index(x, y, m)].x;
+                    iy = zeta[zeta_index(x, y, m)].iy;
+                    ww = zeta[zeta_index(x, y, m)].w;
+                    tmp = im[im_index(x, y)] - model[im_index(x, y)];
+                    unc[sp_index(xx)] += tmp * tmp * ww;
+                    p_bj[pbj_index(xx)] += ww;           // Norm
+                    p_Aij[paij_index(xx, 0)] += ww * ww; // Norm squared
+                }
+            }
+        }
+    }
+
+    for (x = 0; x < ncols; x++)
+    {
+        norm = p_bj[pbj_index(x)] - p_Aij[paij_index(x, 0)] / p_bj[pbj_index(x)];
+        unc[sp_index(x)] = sqrt(unc[sp_index(x)] / norm * nrows);
+    }
+
+    for (x = 0; x < delta_x; x++)
+    {
+        sP[sp_index(x)] = unc[sp_index(x)] = 0;
+    }
+    for (x = ncols - delta_x; x < ncols; x++)
+    {
+        sP[sp_index(x)] = unc[sp_index(x)] = 0;
+    }
+
+    free(diff);
+    free(l_Aij);
+    free(p_Aij);
+    free(p_bj);
+    free(l_bj);
+
+    free(xi);
+    free(zeta);
+    free(m_zeta);
+
+    info[0] = success;
+    info[1] = cost;
+    info[2] = status;
+    info[3] = iter;
+    info[4] = delta_x;
+
+    return 0;
+}
+
+int create_spectral_model(int ncols, int nrows, int osample, xi_ref* xi, double* spec, double* slitfunc, double* img){
+    int ny, pix_x, pix_y, x, iy, m;
+    double pix_w;
+
+    ny = (nrows + 1) * osample + 1;
+
+    for (x = 0; x < ncols; x++)
+    {
+        for (iy = 0; iy < nrows+1; iy++)
+        {
+            img[im_index(x, iy)] = 0;
+        }
+        
+    }
+
+    for (x = 0; x < ncols; x++)
+    {   
+        for (iy = 0; iy < ny; iy++)
+        {
+            for (m = 0; m < 4; m++)
+            {
+                pix_x = xi[xi_index(x, iy, m)].x;
+                pix_y = xi[xi_index(x, iy, m)].y;
+                pix_w = xi[xi_index(x, iy, m)].w;
+                if ((pix_x != -1) && (pix_y != -1) && (pix_w != 0)){
+                    img[im_index(pix_x, pix_y)] += pix_w * spec[x] * slitfunc[iy];
+                }
+            }
+        }            
+    }
+    return 0;
+}
+
+/************************************************************/
+
+static void *_cffi_types[] = {
+/*  0 */ _CFFI_OP(_CFFI_OP_FUNCTION, 1), // int()(int, int, int, double *, double *, unsigned char *, double *, int *, int, int, double, double, int, double *, double *, double *, double *, double *, double *)
+/*  1 */ _CFFI_OP(_CFFI_OP_PRIMITIVE, 7), // int
+/*  2 */ _CFFI_OP(_CFFI_OP_PRIMITIVE, 7),
+/*  3 */ _CFFI_OP(_CFFI_OP_PRIMITIVE, 7),
+/*  4 */ _CFFI_OP(_CFFI_OP_POINTER, 11), // double *
+/*  5 */ _CFFI_OP(_CFFI_OP_NOOP, 4),
+/*  6 */ _CFFI_OP(_CFFI_OP_POINTER, 43), // unsigned char *
+/*  7 */ _CFFI_OP(_CFFI_OP_NOOP, 4),
+/*  8 */ _CFFI_OP(_CFFI_OP_POINTER, 1), // int *
+/*  9 */ _CFFI_OP(_CFFI_OP_PRIMITIVE, 7),
+/* 10 */ _CFFI_OP(_CFFI_OP_PRIMITIVE, 7),
+/* 11 */ _CFFI_OP(_CFFI_OP_PRIMITIVE, 14), // double
+/* 12 */ _CFFI_OP(_CFFI_OP_PRIMITIVE, 14),
+/* 13 */ _CFFI_OP(_CFFI_OP_PRIMITIVE, 7),
+/* 14 */ _CFFI_OP(_CFFI_OP_NOOP, 4),
+/* 15 */ _CFFI_OP(_CFFI_OP_NOOP, 4),
+/* 16 */ _CFFI_OP(_CFFI_OP_NOOP, 4),
+/* 17 */ _CFFI_OP(_CFFI_OP_NOOP, 4),
+/* 18 */ _CFFI_OP(_CFFI_OP_NOOP, 4),
+/* 19 */ _CFFI_OP(_CFFI_OP_NOOP, 4),
+/* 20 */ _CFFI_OP(_CFFI_OP_FUNCTION_END, 0),
+/* 21 */ _CFFI_OP(_CFFI_OP_FUNCTION, 1), // int()(int, int, int, double *, int *, int, int, double *, xi_ref *, zeta_ref *, int *)
+/* 22 */ _CFFI_OP(_CFFI_OP_PRIMITIVE, 7),
+/* 23 */ _CFFI_OP(_CFFI_OP_PRIMITIVE, 7),
+/* 24 */ _CFFI_OP(_CFFI_OP_PRIMITIVE, 7),
+/* 25 */ _CFFI_OP(_CFFI_OP_NOOP, 4),
+/* 26 */ _CFFI_OP(_CFFI_OP_NOOP, 8),
+/* 27 */ _CFFI_OP(_CFFI_OP_PRIMITIVE, 7),
+/* 28 */ _CFFI_OP(_CFFI_OP_PRIMITIVE, 7),
+/* 29 */ _CFFI_OP(_CFFI_OP_NOOP, 4),
+/* 30 */ _CFFI_OP(_CFFI_OP_POINTER, 44), // xi_ref *
+/* 31 */ _CFFI_OP(_CFFI_OP_POINTER, 45), // zeta_ref *
+/* 32 */ _CFFI_OP(_CFFI_OP_NOOP, 8),
+/* 33 */ _CFFI_OP(_CFFI_OP_FUNCTION_END, 0),
+/* 34 */ _CFFI_OP(_CFFI_OP_FUNCTION, 1), // int()(int, int, int, xi_ref *, double *, double *, double *)
+/* 35 */ _CFFI_OP(_CFFI_OP_PRIMITIVE, 7),
+/* 36 */ _CFFI_OP(_CFFI_OP_PRIMITIVE, 7),
+/* 37 */ _CFFI_OP(_CFFI_OP_PRIMITIVE, 7),
+/* 38 */ _CFFI_OP(_CFFI_OP_NOOP, 30),
+/* 39 */ _CFFI_OP(_CFFI_OP_NOOP, 4),
+/* 40 */ _CFFI_OP(_CFFI_OP_NOOP, 4),
+/* 41 */ _CFFI_OP(_CFFI_OP_NOOP, 4),
+/* 42 */ _CFFI_OP(_CFFI_OP_FUNCTION_END, 0),
+/* 43 */ _CFFI_OP(_CFFI_OP_PRIMITIVE, 4), // unsigned char
+/* 44 */ _CFFI_OP(_CFFI_OP_STRUCT_UNION, 0), // xi_ref
+/* 45 */ _CFFI_OP(_CFFI_OP_STRUCT_UNION, 1), // zeta_ref
+};
+
+_CFFI_UNUSED_FN
+static void _cffi_checkfld_typedef_xi_ref(xi_ref *p)
+{
+  /* only to generate compile-time warnings or errors */
+  (void)p;
+  (void)((p->x) | 0);  /* check that 'xi_ref.x' is an integer */
+  (void)((p->y) | 0);  /* check that 'xi_ref.y' is an integer */
+  { double *tmp = &p->w; (void)tmp; }
+}
+struct _cffi_align_typedef_xi_ref { char x; xi_ref y; };
+
+_CFFI_UNUSED_FN
+static void _cffi_checkfld_typedef_zeta_ref(zeta_ref *p)
+{
+  /* only to generate compile-time warnings or errors */
+  (void)p;
+  (void)((p->x) | 0);  /* check that 'zeta_ref.x' is an integer */
+  (void)((p->iy) | 0);  /* check that 'zeta_ref.iy' is an integer */
+  { double *tmp = &p->w; (void)tmp; }
+}
+struct _cffi_align_typedef_zeta_ref { char x; zeta_ref y; };
+
+static int _cffi_d_create_spectral_model(int x0, int x1, int x2, xi_ref * x3, double * x4, double * x5, double * x6)
+{
+  return create_spectral_model(x0, x1, x2, x3, x4, x5, x6);
+}
+#ifndef PYPY_VERSION
+static PyObject *
+_cffi_f_create_spectral_model(PyObject *self, PyObject *args)
+{
+  int x0;
+  int x1;
+  int x2;
+  xi_ref * x3;
+  double * x4;
+  double * x5;
+  double * x6;
+  Py_ssize_t datasize;
+  struct _cffi_freeme_s *large_args_free = NULL;
+  int result;
+  PyObject *pyresult;
+  PyObject *arg0;
+  PyObject *arg1;
+  PyObject *arg2;
+  PyObject *arg3;
+  PyObject *arg4;
+  PyObject *arg5;
+  PyObject *arg6;
+
+  if (!PyArg_UnpackTuple(args, "create_spectral_model", 7, 7, &arg0, &arg1, &arg2, &arg3, &arg4, &arg5, &arg6))
+    return NULL;
+
+  x0 = _cffi_to_c_int(arg0, int);
+  if (x0 == (int)-1 && PyErr_Occurred())
+    return NULL;
+
+  x1 = _cffi_to_c_int(arg1, int);
+  if (x1 == (int)-1 && PyErr_Occurred())
+    return NULL;
+
+  x2 = _cffi_to_c_int(arg2, int);
+  if (x2 == (int)-1 && PyErr_Occurred())
+    return NULL;
+
+  datasize = _cffi_prepare_pointer_call_argument(
+      _cffi_type(30), arg3, (char **)&x3);
+  if (datasize != 0) {
+    x3 = ((size_t)datasize) <= 640 ? (xi_ref *)alloca((size_t)datasize) : NULL;
+    if (_cffi_convert_array_argument(_cffi_type(30), arg3, (char **)&x3,
+            datasize, &large_args_free) < 0)
+      return NULL;
+  }
+
+  datasize = _cffi_prepare_pointer_call_argument(
+      _cffi_type(4), arg4, (char **)&x4);
+  if (datasize != 0) {
+    x4 = ((size_t)datasize) <= 640 ? (double *)alloca((size_t)datasize) : NULL;
+    if (_cffi_convert_array_argument(_cffi_type(4), arg4, (char **)&x4,
+            datasize, &large_args_free) < 0)
+      return NULL;
+  }
+
+  datasize = _cffi_prepare_pointer_call_argument(
+      _cffi_type(4), arg5, (char **)&x5);
+  if (datasize != 0) {
+    x5 = ((size_t)datasize) <= 640 ? (double *)alloca((size_t)datasize) : NULL;
+    if (_cffi_convert_array_argument(_cffi_type(4), arg5, (char **)&x5,
+            datasize, &large_args_free) < 0)
+      return NULL;
+  }
+
+  datasize = _cffi_prepare_pointer_call_argument(
+      _cffi_type(4), arg6, (char **)&x6);
+  if (datasize != 0) {
+    x6 = ((size_t)datasize) <= 640 ? (double *)alloca((size_t)datasize) : NULL;
+    if (_cffi_convert_array_argument(_cffi_type(4), arg6, (char **)&x6,
+            datasize, &large_args_free) < 0)
+      return NULL;
+  }
+
+  Py_BEGIN_ALLOW_THREADS
+  _cffi_restore_errno();
+  { result = create_spectral_model(x0, x1, x2, x3, x4, x5, x6); }
+  _cffi_save_errno();
+  Py_END_ALLOW_THREADS
+
+  (void)self; /* unused */
+  pyresult = _cffi_from_c_int(result, int);
+  if (large_args_free != NULL) _cffi_free_array_arguments(large_args_free);
+  return pyresult;
+}
+#else
+#  define _cffi_f_create_spectral_model _cffi_d_create_spectral_model
+#endif
+
+static int _cffi_d_slit_func_curved(int x0, int x1, int x2, double * x3, double * x4, unsigned char * x5, double * x6, int * x7, int x8, int x9, double x10, double x11, int x12, double * x13, double * x14, double * x15, double * x16, double * x17, double * x18)
+{
+  return slit_func_curved(x0, x1, x2, x3, x4, x5, x6, x7, x8, x9, x10, x11, x12, x13, x14, x15, x16, x17, x18);
+}
+#ifndef PYPY_VERSION
+static PyObject *
+_cffi_f_slit_func_curved(PyObject *self, PyObject *args)
+{
+  int x0;
+  int x1;
+  int x2;
+  double * x3;
+  double * x4;
+  unsigned char * x5;
+  double * x6;
+  int * x7;
+  int x8;
+  int x9;
+  double x10;
+  double x11;
+  int x12;
+  double * x13;
+  double * x14;
+  double * x15;
+  double * x16;
+  double * x17;
+  double * x18;
+  Py_ssize_t datasize;
+  struct _cffi_freeme_s *large_args_free = NULL;
+  int result;
+  PyObject *pyresult;
+  PyObject *arg0;
+  PyObject *arg1;
+  PyObject *arg2;
+  PyObject *arg3;
+  PyObject *arg4;
+  PyObject *arg5;
+  PyObject *arg6;
+  PyObject *arg7;
+  PyObject *arg8;
+  PyObject *arg9;
+  PyObject *arg10;
+  PyObject *arg11;
+  PyObject *arg12;
+  PyObject *arg13;
+  PyObject *arg14;
+  PyObject *arg15;
+  PyObject *arg16;
+  PyObject *arg17;
+  PyObject *arg18;
+
+  if (!PyArg_UnpackTuple(args, "slit_func_curved", 19, 19, &arg0, &arg1, &arg2, &arg3, &arg4, &arg5, &arg6, &arg7, &arg8, &arg9, &arg10, &arg11, &arg12, &arg13, &arg14, &arg15, &arg16, &arg17, &arg18))
+    return NULL;
+
+  x0 = _cffi_to_c_int(arg0, int);
+  if (x0 == (int)-1 && PyErr_Occurred())
+    return NULL;
+
+  x1 = _cffi_to_c_int(arg1, int);
+  if (x1 == (int)-1 && PyErr_Occurred())
+    return NULL;
+
+  x2 = _cffi_to_c_int(arg2, int);
+  if (x2 == (int)-1 && PyErr_Occurred())
+    return NULL;
+
+  datasize = _cffi_prepare_pointer_call_argument(
+      _cffi_type(4), arg3, (char **)&x3);
+  if (datasize != 0) {
+    x3 = ((size_t)datasize) <= 640 ? (double *)alloca((size_t)datasize) : NULL;
+    if (_cffi_convert_array_argument(_cffi_type(4), arg3, (char **)&x3,
+            datasize, &large_args_free) < 0)
+      return NULL;
+  }
+
+  datasize = _cffi_prepare_pointer_call_argument(
+      _cffi_type(4), arg4, (char **)&x4);
+  if (datasize != 0) {
+    x4 = ((size_t)datasize) <= 640 ? (double *)alloca((size_t)datasize) : NULL;
+    if (_cffi_convert_array_argument(_cffi_type(4), arg4, (char **)&x4,
+            datasize, &large_args_free) < 0)
+      return NULL;
+  }
+
+  datasize = _cffi_prepare_pointer_call_argument(
+      _cffi_type(6), arg5, (char **)&x5);
+  if (datasize != 0) {
+    x5 = ((size_t)datasize) <= 640 ? (unsigned char *)alloca((size_t)datasize) : NULL;
+    if (_cffi_convert_array_argument(_cffi_type(6), arg5, (char **)&x5,
+            datasize, &large_args_free) < 0)
+      return NULL;
+  }
+
+  datasize = _cffi_prepare_pointer_call_argument(
+      _cffi_type(4), arg6, (char **)&x6);
+  if (datasize != 0) {
+    x6 = ((size_t)datasize) <= 640 ? (double *)alloca((size_t)datasize) : NULL;
+    if (_cffi_convert_array_argument(_cffi_type(4), arg6, (char **)&x6,
+            datasize, &large_args_free) < 0)
+      return NULL;
+  }
+
+  datasize = _cffi_prepare_pointer_call_argument(
+      _cffi_type(8), arg7, (char **)&x7);
+  if (datasize != 0) {
+    x7 = ((size_t)datasize) <= 640 ? (int *)alloca((size_t)datasize) : NULL;
+    if (_cffi_convert_array_argument(_cffi_type(8), arg7, (char **)&x7,
+            datasize, &large_args_free) < 0)
+      return NULL;
+  }
+
+  x8 = _cffi_to_c_int(arg8, int);
+  if (x8 == (int)-1 && PyErr_Occurred())
+    return NULL;
+
+  x9 = _cffi_to_c_int(arg9, int);
+  if (x9 == (int)-1 && PyErr_Occurred())
+    return NULL;
+
+  x10 = (double)_cffi_to_c_double(arg10);
+  if (x10 == (double)-1 && PyErr_Occurred())
+    return NULL;
+
+  x11 = (double)_cffi_to_c_double(arg11);
+  if (x11 == (double)-1 && PyErr_Occurred())
+    return NULL;
+
+  x12 = _cffi_to_c_int(arg12, int);
+  if (x12 == (int)-1 && PyErr_Occurred())
+    return NULL;
+
+  datasize = _cffi_prepare_pointer_call_argument(
+      _cffi_type(4), arg13, (char **)&x13);
+  if (datasize != 0) {
+    x13 = ((size_t)datasize) <= 640 ? (double *)alloca((size_t)datasize) : NULL;
+    if (_cffi_convert_array_argument(_cffi_type(4), arg13, (char **)&x13,
+            datasize, &large_args_free) < 0)
+      return NULL;
+  }
+
+  datasize = _cffi_prepare_pointer_call_argument(
+      _cffi_type(4), arg14, (char **)&x14);
+  if (datasize != 0) {
+    x14 = ((size_t)datasize) <= 640 ? (double *)alloca((size_t)datasize) : NULL;
+    if (_cffi_convert_array_argument(_cffi_type(4), arg14, (char **)&x14,
+            datasize, &large_args_free) < 0)
+      return NULL;
+  }
+
+  datasize = _cffi_prepare_pointer_call_argument(
+      _cffi_type(4), arg15, (char **)&x15);
+  if (datasize != 0) {
+    x15 = ((size_t)datasize) <= 640 ? (double *)alloca((size_t)datasize) : NULL;
+    if (_cffi_convert_array_argument(_cffi_type(4), arg15, (char **)&x15,
+            datasize, &large_args_free) < 0)
+      return NULL;
+  }
+
+  datasize = _cffi_prepare_pointer_call_argument(
+      _cffi_type(4), arg16, (char **)&x16);
+  if (datasize != 0) {
+    x16 = ((size_t)datasize) <= 640 ? (double *)alloca((size_t)datasize) : NULL;
+    if (_cffi_convert_array_argument(_cffi_type(4), arg16, (char **)&x16,
+            datasize, &large_args_free) < 0)
+      return NULL;
+  }
+
+  datasize = _cffi_prepare_pointer_call_argument(
+      _cffi_type(4), arg17, (char **)&x17);
+  if (datasize != 0) {
+    x17 = ((size_t)datasize) <= 640 ? (double *)alloca((size_t)datasize) : NULL;
+    if (_cffi_convert_array_argument(_cffi_type(4), arg17, (char **)&x17,
+            datasize, &large_args_free) < 0)
+      return NULL;
+  }
+
+  datasize = _cffi_prepare_pointer_call_argument(
+      _cffi_type(4), arg18, (char **)&x18);
+  if (datasize != 0) {
+    x18 = ((size_t)datasize) <= 640 ? (double *)alloca((size_t)datasize) : NULL;
+    if (_cffi_convert_array_argument(_cffi_type(4), arg18, (char **)&x18,
+            datasize, &large_args_free) < 0)
+      return NULL;
+  }
+
+  Py_BEGIN_ALLOW_THREADS
+  _cffi_restore_errno();
+  { result = slit_func_curved(x0, x1, x2, x3, x4, x5, x6, x7, x8, x9, x10, x11, x12, x13, x14, x15, x16, x17, x18); }
+  _cffi_save_errno();
+  Py_END_ALLOW_THREADS
+
+  (void)self; /* unused */
+  pyresult = _cffi_from_c_int(result, int);
+  if (large_args_free != NULL) _cffi_free_array_arguments(large_args_free);
+  return pyresult;
+}
+#else
+#  define _cffi_f_slit_func_curved _cffi_d_slit_func_curved
+#endif
+
+static int _cffi_d_xi_zeta_tensors(int x0, int x1, int x2, double * x3, int * x4, int x5, int x6, double * x7, xi_ref * x8, zeta_ref * x9, int * x10)
+{
+  return xi_zeta_tensors(x0, x1, x2, x3, x4, x5, x6, x7, x8, x9, x10);
+}
+#ifndef PYPY_VERSION
+static PyObject *
+_cffi_f_xi_zeta_tensors(PyObject *self, PyObject *args)
+{
+  int x0;
+  int x1;
+  int x2;
+  double * x3;
+  int * x4;
+  int x5;
+  int x6;
+  double * x7;
+  xi_ref * x8;
+  zeta_ref * x9;
+  int * x10;
+  Py_ssize_t datasize;
+  struct _cffi_freeme_s *large_args_free = NULL;
+  int result;
+  PyObject *pyresult;
+  PyObject *arg0;
+  PyObject *arg1;
+  PyObject *arg2;
+  PyObject *arg3;
+  PyObject *arg4;
+  PyObject *arg5;
+  PyObject *arg6;
+  PyObject *arg7;
+  PyObject *arg8;
+  PyObject *arg9;
+  PyObject *arg10;
+
+  if (!PyArg_UnpackTuple(args, "xi_zeta_tensors", 11, 11, &arg0, &arg1, &arg2, &arg3, &arg4, &arg5, &arg6, &arg7, &arg8, &arg9, &arg10))
+    return NULL;
+
+  x0 = _cffi_to_c_int(arg0, int);
+  if (x0 == (int)-1 && PyErr_Occurred())
+    return NULL;
+
+  x1 = _cffi_to_c_int(arg1, int);
+  if (x1 == (int)-1 && PyErr_Occurred())
+    return NULL;
+
+  x2 = _cffi_to_c_int(arg2, int);
+  if (x2 == (int)-1 && PyErr_Occurred())
+    return NULL;
+
+  datasize = _cffi_prepare_pointer_call_argument(
+      _cffi_type(4), arg3, (char **)&x3);
+  if (datasize != 0) {
+    x3 = ((size_t)datasize) <= 640 ? (double *)alloca((size_t)datasize) : NULL;
+    if (_cffi_convert_array_argument(_cffi_type(4), arg3, (char **)&x3,
+            datasize, &large_args_free) < 0)
+      return NULL;
+  }
+
+  datasize = _cffi_prepare_pointer_call_argument(
+      _cffi_type(8), arg4, (char **)&x4);
+  if (datasize != 0) {
+    x4 = ((size_t)datasize) <= 640 ? (int *)alloca((size_t)datasize) : NULL;
+    if (_cffi_convert_array_argument(_cffi_type(8), arg4, (char **)&x4,
+            datasize, &large_args_free) < 0)
+      return NULL;
+  }
+
+  x5 = _cffi_to_c_int(arg5, int);
+  if (x5 == (int)-1 && PyErr_Occurred())
+    return NULL;
+
+  x6 = _cffi_to_c_int(arg6, int);
+  if (x6 == (int)-1 && PyErr_Occurred())
+    return NULL;
+
+  datasize = _cffi_prepare_pointer_call_argument(
+      _cffi_type(4), arg7, (char **)&x7);
+  if (datasize != 0) {
+    x7 = ((size_t)datasize) <= 640 ? (double *)alloca((size_t)datasize) : NULL;
+    if (_cffi_convert_array_argument(_cffi_type(4), arg7, (char **)&x7,
+            datasize, &large_args_free) < 0)
+      return NULL;
+  }
+
+  datasize = _cffi_prepare_pointer_call_argument(
+      _cffi_type(30), arg8, (char **)&x8);
+  if (datasize != 0) {
+    x8 = ((size_t)datasize) <= 640 ? (xi_ref *)alloca((size_t)datasize) : NULL;
+    if (_cffi_convert_array_argument(_cffi_type(30), arg8, (char **)&x8,
+            datasize, &large_args_free) < 0)
+      return NULL;
+  }
+
+  datasize = _cffi_prepare_pointer_call_argument(
+      _cffi_type(31), arg9, (char **)&x9);
+  if (datasize != 0) {
+    x9 = ((size_t)datasize) <= 640 ? (zeta_ref *)alloca((size_t)datasize) : NULL;
+    if (_cffi_convert_array_argument(_cffi_type(31), arg9, (char **)&x9,
+            datasize, &large_args_free) < 0)
+      return NULL;
+  }
+
+  datasize = _cffi_prepare_pointer_call_argument(
+      _cffi_type(8), arg10, (char **)&x10);
+  if (datasize != 0) {
+    x10 = ((size_t)datasize) <= 640 ? (int *)alloca((size_t)datasize) : NULL;
+    if (_cffi_convert_array_argument(_cffi_type(8), arg10, (char **)&x10,
+            datasize, &large_args_free) < 0)
+      return NULL;
+  }
+
+  Py_BEGIN_ALLOW_THREADS
+  _cffi_restore_errno();
+  { result = xi_zeta_tensors(x0, x1, x2, x3, x4, x5, x6, x7, x8, x9, x10); }
+  _cffi_save_errno();
+  Py_END_ALLOW_THREADS
+
+  (void)self; /* unused */
+  pyresult = _cffi_from_c_int(result, int);
+  if (large_args_free != NULL) _cffi_free_array_arguments(large_args_free);
+  return pyresult;
+}
+#else
+#  define _cffi_f_xi_zeta_tensors _cffi_d_xi_zeta_tensors
+#endif
+
+static const struct _cffi_global_s _cffi_globals[] = {
+  { "create_spectral_model", (void *)_cffi_f_create_spectral_model, _CFFI_OP(_CFFI_OP_CPYTHON_BLTN_V, 34), (void *)_cffi_d_create_spectral_model },
+  { "slit_func_curved", (void *)_cffi_f_slit_func_curved, _CFFI_OP(_CFFI_OP_CPYTHON_BLTN_V, 0), (void *)_cffi_d_slit_func_curved },
+  { "xi_zeta_tensors", (void *)_cffi_f_xi_zeta_tensors, _CFFI_OP(_CFFI_OP_CPYTHON_BLTN_V, 21), (void *)_cffi_d_xi_zeta_tensors },
+};
+
+static const struct _cffi_field_s _cffi_fields[] = {
+  { "x", offsetof(xi_ref, x),
+         sizeof(((xi_ref *)0)->x),
+         _CFFI_OP(_CFFI_OP_NOOP, 1) },
+  { "y", offsetof(xi_ref, y),
+         sizeof(((xi_ref *)0)->y),
+         _CFFI_OP(_CFFI_OP_NOOP, 1) },
+  { "w", offsetof(xi_ref, w),
+         sizeof(((xi_ref *)0)->w),
+         _CFFI_OP(_CFFI_OP_NOOP, 11) },
+  { "x", offsetof(zeta_ref, x),
+         sizeof(((zeta_ref *)0)->x),
+         _CFFI_OP(_CFFI_OP_NOOP, 1) },
+  { "iy", offsetof(zeta_ref, iy),
+          sizeof(((zeta_ref *)0)->iy),
+          _CFFI_OP(_CFFI_OP_NOOP, 1) },
+  { "w", offsetof(zeta_ref, w),
+         sizeof(((zeta_ref *)0)->w),
+         _CFFI_OP(_CFFI_OP_NOOP, 11) },
+};
+
+static const struct _cffi_struct_union_s _cffi_struct_unions[] = {
+  { "$xi_ref", 44, _CFFI_F_CHECK_FIELDS,
+    sizeof(xi_ref), offsetof(struct _cffi_align_typedef_xi_ref, y), 0, 3 },
+  { "$zeta_ref", 45, _CFFI_F_CHECK_FIELDS,
+    sizeof(zeta_ref), offsetof(struct _cffi_align_typedef_zeta_ref, y), 3, 3 },
+};
+
+static const struct _cffi_typename_s _cffi_typenames[] = {
+  { "xi_ref", 44 },
+  { "zeta_ref", 45 },
+};
+
+static const struct _cffi_type_context_s _cffi_type_context = {
+  _cffi_types,
+  _cffi_globals,
+  _cffi_fields,
+  _cffi_struct_unions,
+  NULL,  /* no enums */
+  _cffi_typenames,
+  3,  /* num_globals */
+  2,  /* num_struct_unions */
+  0,  /* num_enums */
+  2,  /* num_typenames */
+  NULL,  /* no includes */
+  46,  /* num_types */
+  0,  /* flags */
+};
+
+#ifdef __GNUC__
+#  pragma GCC visibility push(default)  /* for -fvisibility= */
+#endif
+
+#ifdef PYPY_VERSION
+PyMODINIT_FUNC
+_cffi_pypyinit__slitfunc_2d(const void *p[])
+{
+    p[0] = (const void *)0x2601;
+    p[1] = &_cffi_type_context;
+    return NULL;
+}
+#  ifdef _MSC_VER
+     PyMODINIT_FUNC
+     PyInit__slitfunc_2d(void) { return NULL; }
+#  endif
+#else
+PyMODINIT_FUNC
+PyInit__slitfunc_2d(void)
+{
+  return _cffi_init("_slitfunc_2d", 0x2601, &_cffi_type_context);
+}
+#endif
+
+#ifdef __GNUC__
+#  pragma GCC visibility pop
+#endif
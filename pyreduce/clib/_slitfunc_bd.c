@@ -0,0 +1,1160 @@
+#define _CFFI_
+
+/* We try to define Py_LIMITED_API before including Python.h.
+
+   Mess: we can only define it if Py_DEBUG, Py_TRACE_REFS and
+   Py_REF_DEBUG are not defined.  This is a best-effort approximation:
+   we can learn about Py_DEBUG from pyconfig.h, but it is unclear if
+   the same works for the other two macros.  Py_DEBUG implies them,
+   but not the other way around.
+
+   The implementation is messy (issue #350): on Windows, with _MSC_VER,
+   we have to define Py_LIMITED_API even before including pyconfig.h.
+   In that case, we guess what pyconfig.h will do to the macros above,
+   and check our guess after the #include.
+
+   Note that on Windows, with CPython 3.x, you need >= 3.5 and virtualenv
+   version >= 16.0.0.  With older versions of either, you don't get a
+   copy of PYTHON3.DLL in the virtualenv.  We can't check the version of
+   CPython *before* we even include pyconfig.h.  ffi.set_source() puts
+   a ``#define _CFFI_NO_LIMITED_API'' at the start of this file if it is
+   running on Windows < 3.5, as an attempt at fixing it, but that's
+   arguably wrong because it may not be the target version of Python.
+   Still better than nothing I guess.  As another workaround, you can
+   remove the definition of Py_LIMITED_API here.
+
+   See also 'py_limited_api' in cffi/setuptools_ext.py.
+*/
+#if !defined(_CFFI_USE_EMBEDDING) && !defined(Py_LIMITED_API)
+#  ifdef _MSC_VER
+#    if !defined(_DEBUG) && !defined(Py_DEBUG) && !defined(Py_TRACE_REFS) && !defined(Py_REF_DEBUG) && !defined(_CFFI_NO_LIMITED_API)
+#      if !defined(Py_GIL_DISABLED)
+#        define Py_LIMITED_API
+#      else
+#        define Py_LIMITED_API 0x030f0000
+#      endif
+#    endif
+
+#    include <pyconfig.h>
+     /* sanity-check: Py_LIMITED_API will cause crashes if any of these
+        are also defined.  Normally, the Python file PC/pyconfig.h does not
+        cause any of these to be defined, with the exception that _DEBUG
+        causes Py_DEBUG.  Double-check that. */
+#    ifdef Py_LIMITED_API
+#      if defined(Py_DEBUG)
+#        error "pyconfig.h unexpectedly defines Py_DEBUG, but Py_LIMITED_API is set"
+#      endif
+#      if defined(Py_TRACE_REFS)
+#        error "pyconfig.h unexpectedly defines Py_TRACE_REFS, but Py_LIMITED_API is set"
+#      endif
+#      if defined(Py_REF_DEBUG)
+#        error "pyconfig.h unexpectedly defines Py_REF_DEBUG, but Py_LIMITED_API is set"
+#      endif
+#    endif
+#  else
+#    include <pyconfig.h>
+#    if !defined(Py_DEBUG) && !defined(Py_TRACE_REFS) && !defined(Py_REF_DEBUG) && !defined(_CFFI_NO_LIMITED_API)
+#      if !defined(Py_GIL_DISABLED)
+#        define Py_LIMITED_API
+#      else
+#        define Py_LIMITED_API 0x030f0000
+#      endif
+#    endif
+#  endif
+#endif
+
+#include <Python.h>
+#ifdef __cplusplus
+extern "C" {
+#endif
+#include <stddef.h>
+#include <stdlib.h>
+#include <string.h>
+
+
+/* This part is from file 'cffi/parse_c_type.h'.  It is copied at the
+   beginning of C sources generated by CFFI's ffi.set_source(). */
+
+typedef void *_cffi_opcode_t;
+
+#define _CFFI_OP(opcode, arg)   (_cffi_opcode_t)(opcode | (((uintptr_t)(arg)) << 8))
+#define _CFFI_GETOP(cffi_opcode)    ((unsigned char)(uintptr_t)cffi_opcode)
+#define _CFFI_GETARG(cffi_opcode)   (((intptr_t)cffi_opcode) >> 8)
+
+#define _CFFI_OP_PRIMITIVE       1
+#define _CFFI_OP_POINTER         3
+#define _CFFI_OP_ARRAY           5
+#define _CFFI_OP_OPEN_ARRAY      7
+#define _CFFI_OP_STRUCT_UNION    9
+#define _CFFI_OP_ENUM           11
+#define _CFFI_OP_FUNCTION       13
+#define _CFFI_OP_FUNCTION_END   15
+#define _CFFI_OP_NOOP           17
+#define _CFFI_OP_BITFIELD       19
+#define _CFFI_OP_TYPENAME       21
+#define _CFFI_OP_CPYTHON_BLTN_V 23   // varargs
+#define _CFFI_OP_CPYTHON_BLTN_N 25   // noargs
+#define _CFFI_OP_CPYTHON_BLTN_O 27   // O  (i.e. a single arg)
+#define _CFFI_OP_CONSTANT       29
+#define _CFFI_OP_CONSTANT_INT   31
+#define _CFFI_OP_GLOBAL_VAR     33
+#define _CFFI_OP_DLOPEN_FUNC    35
+#define _CFFI_OP_DLOPEN_CONST   37
+#define _CFFI_OP_GLOBAL_VAR_F   39
+#define _CFFI_OP_EXTERN_PYTHON  41
+
+#define _CFFI_PRIM_VOID          0
+#define _CFFI_PRIM_BOOL          1
+#define _CFFI_PRIM_CHAR          2
+#define _CFFI_PRIM_SCHAR         3
+#define _CFFI_PRIM_UCHAR         4
+#define _CFFI_PRIM_SHORT         5
+#define _CFFI_PRIM_USHORT        6
+#define _CFFI_PRIM_INT           7
+#define _CFFI_PRIM_UINT          8
+#define _CFFI_PRIM_LONG          9
+#define _CFFI_PRIM_ULONG        10
+#define _CFFI_PRIM_LONGLONG     11
+#define _CFFI_PRIM_ULONGLONG    12
+#define _CFFI_PRIM_FLOAT        13
+#define _CFFI_PRIM_DOUBLE       14
+#define _CFFI_PRIM_LONGDOUBLE   15
+
+#define _CFFI_PRIM_WCHAR        16
+#define _CFFI_PRIM_INT8         17
+#define _CFFI_PRIM_UINT8        18
+#define _CFFI_PRIM_INT16        19
+#define _CFFI_PRIM_UINT16       20
+#define _CFFI_PRIM_INT32        21
+#define _CFFI_PRIM_UINT32       22
+#define _CFFI_PRIM_INT64        23
+#define _CFFI_PRIM_UINT64       24
+#define _CFFI_PRIM_INTPTR       25
+#define _CFFI_PRIM_UINTPTR      26
+#define _CFFI_PRIM_PTRDIFF      27
+#define _CFFI_PRIM_SIZE         28
+#define _CFFI_PRIM_SSIZE        29
+#define _CFFI_PRIM_INT_LEAST8   30
+#define _CFFI_PRIM_UINT_LEAST8  31
+#define _CFFI_PRIM_INT_LEAST16  32
+#define _CFFI_PRIM_UINT_LEAST16 33
+#define _CFFI_PRIM_INT_LEAST32  34
+#define _CFFI_PRIM_UINT_LEAST32 35
+#define _CFFI_PRIM_INT_LEAST64  36
+#define _CFFI_PRIM_UINT_LEAST64 37
+#define _CFFI_PRIM_INT_FAST8    38
+#define _CFFI_PRIM_UINT_FAST8   39
+#define _CFFI_PRIM_INT_FAST16   40
+#define _CFFI_PRIM_UINT_FAST16  41
+#define _CFFI_PRIM_INT_FAST32   42
+#define _CFFI_PRIM_UINT_FAST32  43
+#define _CFFI_PRIM_INT_FAST64   44
+#define _CFFI_PRIM_UINT_FAST64  45
+#define _CFFI_PRIM_INTMAX       46
+#define _CFFI_PRIM_UINTMAX      47
+#define _CFFI_PRIM_FLOATCOMPLEX 48
+#define _CFFI_PRIM_DOUBLECOMPLEX 49
+#define _CFFI_PRIM_CHAR16       50
+#define _CFFI_PRIM_CHAR32       51
+
+#define _CFFI__NUM_PRIM         52
+#define _CFFI__UNKNOWN_PRIM           (-1)
+#define _CFFI__UNKNOWN_FLOAT_PRIM     (-2)
+#define _CFFI__UNKNOWN_LONG_DOUBLE    (-3)
+
+#define _CFFI__IO_FILE_STRUCT         (-1)
+
+
+struct _cffi_global_s {
+    const char *name;
+    void *address;
+    _cffi_opcode_t type_op;
+    void *size_or_direct_fn;  // OP_GLOBAL_VAR: size, or 0 if unknown
+                              // OP_CPYTHON_BLTN_*: addr of direct function
+};
+
+struct _cffi_getconst_s {
+    unsigned long long value;
+    const struct _cffi_type_context_s *ctx;
+    int gindex;
+};
+
+struct _cffi_struct_union_s {
+    const char *name;
+    int type_index;          // -> _cffi_types, on a OP_STRUCT_UNION
+    int flags;               // _CFFI_F_* flags below
+    size_t size;
+    int alignment;
+    int first_field_index;   // -> _cffi_fields array
+    int num_fields;
+};
+#define _CFFI_F_UNION         0x01   // is a union, not a struct
+#define _CFFI_F_CHECK_FIELDS  0x02   // complain if fields are not in the
+                                     // "standard layout" or if some are missing
+#define _CFFI_F_PACKED        0x04   // for CHECK_FIELDS, assume a packed struct
+#define _CFFI_F_EXTERNAL      0x08   // in some other ffi.include()
+#define _CFFI_F_OPAQUE        0x10   // opaque
+
+struct _cffi_field_s {
+    const char *name;
+    size_t field_offset;
+    size_t field_size;
+    _cffi_opcode_t field_type_op;
+};
+
+struct _cffi_enum_s {
+    const char *name;
+    int type_index;          // -> _cffi_types, on a OP_ENUM
+    int type_prim;           // _CFFI_PRIM_xxx
+    const char *enumerators; // comma-delimited string
+};
+
+struct _cffi_typename_s {
+    const char *name;
+    int type_index;   /* if opaque, points to a possibly artificial
+                         OP_STRUCT which is itself opaque */
+};
+
+struct _cffi_type_context_s {
+    _cffi_opcode_t *types;
+    const struct _cffi_global_s *globals;
+    const struct _cffi_field_s *fields;
+    const struct _cffi_struct_union_s *struct_unions;
+    const struct _cffi_enum_s *enums;
+    const struct _cffi_typename_s *typenames;
+    int num_globals;
+    int num_struct_unions;
+    int num_enums;
+    int num_typenames;
+    const char *const *includes;
+    int num_types;
+    int flags;      /* future extension */
+};
+
+struct _cffi_parse_info_s {
+    const struct _cffi_type_context_s *ctx;
+    _cffi_opcode_t *output;
+    unsigned int output_size;
+    size_t error_location;
+    const char *error_message;
+};
+
+struct _cffi_externpy_s {
+    const char *name;
+    size_t size_of_result;
+    void *reserved1, *reserved2;
+};
+
+#ifdef _CFFI_INTERNAL
+static int parse_c_type(struct _cffi_parse_info_s *info, const char *input);
+static int search_in_globals(const struct _cffi_type_context_s *ctx,
+                             const char *search, size_t search_len);
+static int search_in_struct_unions(const struct _cffi_type_context_s *ctx,
+                                   const char *search, size_t search_len);
+#endif
+
+/* this block of #ifs should be kept exactly identical between
+   c/_cffi_backend.c, cffi/vengine_cpy.py, cffi/vengine_gen.py
+   and cffi/_cffi_include.h */
+#if defined(_MSC_VER)
+# include <malloc.h>   /* for alloca() */
+# if _MSC_VER < 1600   /* MSVC < 2010 */
+   typedef __int8 int8_t;
+   typedef __int16 int16_t;
+   typedef __int32 int32_t;
+   typedef __int64 int64_t;
+   typedef unsigned __int8 uint8_t;
+   typedef unsigned __int16 uint16_t;
+   typedef unsigned __int32 uint32_t;
+   typedef unsigned __int64 uint64_t;
+   typedef __int8 int_least8_t;
+   typedef __int16 int_least16_t;
+   typedef __int32 int_least32_t;
+   typedef __int64 int_least64_t;
+   typedef unsigned __int8 uint_least8_t;
+   typedef unsigned __int16 uint_least16_t;
+   typedef unsigned __int32 uint_least32_t;
+   typedef unsigned __int64 uint_least64_t;
+   typedef __int8 int_fast8_t;
+   typedef __int16 int_fast16_t;
+   typedef __int32 int_fast32_t;
+   typedef __int64 int_fast64_t;
+   typedef unsigned __int8 uint_fast8_t;
+   typedef unsigned __int16 uint_fast16_t;
+   typedef unsigned __int32 uint_fast32_t;
+   typedef unsigned __int64 uint_fast64_t;
+   typedef __int64 intmax_t;
+   typedef unsigned __int64 uintmax_t;
+# else
+#  include <stdint.h>
+# endif
+# if _MSC_VER < 1800   /* MSVC < 2013 */
+#  ifndef __cplusplus
+    typedef unsigned char _Bool;
+#  endif
+# endif
+# define _cffi_float_complex_t   _Fcomplex    /* include <complex.h> for it */
+# define _cffi_double_complex_t  _Dcomplex    /* include <complex.h> for it */
+#else
+# include <stdint.h>
+# if (defined (__SVR4) && defined (__sun)) || defined(_AIX) || defined(__hpux)
+#  include <alloca.h>
+# endif
+# define _cffi_float_complex_t   float _Complex
+# define _cffi_double_complex_t  double _Complex
+#endif
+
+#ifdef __GNUC__
+# define _CFFI_UNUSED_FN  __attribute__((unused))
+#else
+# define _CFFI_UNUSED_FN  /* nothing */
+#endif
+
+#ifdef __cplusplus
+# ifndef _Bool
+   typedef bool _Bool;   /* semi-hackish: C++ has no _Bool; bool is builtin */
+# endif
+#endif
+
+/**********  CPython-specific section  **********/
+#ifndef PYPY_VERSION
+
+
+#define _cffi_from_c_double PyFloat_FromDouble
+#define _cffi_from_c_float PyFloat_FromDouble
+#define _cffi_from_c_long PyLong_FromLong
+#define _cffi_from_c_ulong PyLong_FromUnsignedLong
+#define _cffi_from_c_longlong PyLong_FromLongLong
+#define _cffi_from_c_ulonglong PyLong_FromUnsignedLongLong
+#define _cffi_from_c__Bool PyBool_FromLong
+
+#define _cffi_to_c_double PyFloat_AsDouble
+#define _cffi_to_c_float PyFloat_AsDouble
+
+#define _cffi_from_c_int(x, type)                                        \
+    (((type)-1) > 0 ? /* unsigned */                                     \
+        (sizeof(type) < sizeof(long) ?                                   \
+            PyLong_FromLong((long)x) :                                   \
+         sizeof(type) == sizeof(long) ?                                  \
+            PyLong_FromUnsignedLong((unsigned long)x) :                  \
+            PyLong_FromUnsignedLongLong((unsigned long long)x)) :        \
+        (sizeof(type) <= sizeof(long) ?                                  \
+            PyLong_FromLong((long)x) :                                   \
+            PyLong_FromLongLong((long long)x)))
+
+#define _cffi_to_c_int(o, type)                                          \
+    ((type)(                                                             \
+     sizeof(type) == 1 ? (((type)-1) > 0 ? (type)_cffi_to_c_u8(o)        \
+                                         : (type)_cffi_to_c_i8(o)) :     \
+     sizeof(type) == 2 ? (((type)-1) > 0 ? (type)_cffi_to_c_u16(o)       \
+                                         : (type)_cffi_to_c_i16(o)) :    \
+     sizeof(type) == 4 ? (((type)-1) > 0 ? (type)_cffi_to_c_u32(o)       \
+                                         : (type)_cffi_to_c_i32(o)) :    \
+     sizeof(type) == 8 ? (((type)-1) > 0 ? (type)_cffi_to_c_u64(o)       \
+                                         : (type)_cffi_to_c_i64(o)) :    \
+     (Py_FatalError("unsupported size for type " #type), (type)0)))
+
+#define _cffi_to_c_i8                                                    \
+                 ((int(*)(PyObject *))_cffi_exports[1])
+#define _cffi_to_c_u8                                                    \
+                 ((int(*)(PyObject *))_cffi_exports[2])
+#define _cffi_to_c_i16                                                   \
+                 ((int(*)(PyObject *))_cffi_exports[3])
+#define _cffi_to_c_u16                                                   \
+                 ((int(*)(PyObject *))_cffi_exports[4])
+#define _cffi_to_c_i32                                                   \
+                 ((int(*)(PyObject *))_cffi_exports[5])
+#define _cffi_to_c_u32                                                   \
+                 ((unsigned int(*)(PyObject *))_cffi_exports[6])
+#define _cffi_to_c_i64                                                   \
+                 ((long long(*)(PyObject *))_cffi_exports[7])
+#define _cffi_to_c_u64                                                   \
+                 ((unsigned long long(*)(PyObject *))_cffi_exports[8])
+#define _cffi_to_c_char                                                  \
+                 ((int(*)(PyObject *))_cffi_exports[9])
+#define _cffi_from_c_pointer                                             \
+    ((PyObject *(*)(char *, struct _cffi_ctypedescr *))_cffi_exports[10])
+#define _cffi_to_c_pointer                                               \
+    ((char *(*)(PyObject *, struct _cffi_ctypedescr *))_cffi_exports[11])
+#define _cffi_get_struct_layout                                          \
+    not used any more
+#define _cffi_restore_errno                                              \
+    ((void(*)(void))_cffi_exports[13])
+#define _cffi_save_errno                                                 \
+    ((void(*)(void))_cffi_exports[14])
+#define _cffi_from_c_char                                                \
+    ((PyObject *(*)(char))_cffi_exports[15])
+#define _cffi_from_c_deref                                               \
+    ((PyObject *(*)(char *, struct _cffi_ctypedescr *))_cffi_exports[16])
+#define _cffi_to_c                                                       \
+    ((int(*)(char *, struct _cffi_ctypedescr *, PyObject *))_cffi_exports[17])
+#define _cffi_from_c_struct                                              \
+    ((PyObject *(*)(char *, struct _cffi_ctypedescr *))_cffi_exports[18])
+#define _cffi_to_c_wchar_t                                               \
+    ((_cffi_wchar_t(*)(PyObject *))_cffi_exports[19])
+#define _cffi_from_c_wchar_t                                             \
+    ((PyObject *(*)(_cffi_wchar_t))_cffi_exports[20])
+#define _cffi_to_c_long_double                                           \
+    ((long double(*)(PyObject *))_cffi_exports[21])
+#define _cffi_to_c__Bool                                                 \
+    ((_Bool(*)(PyObject *))_cffi_exports[22])
+#define _cffi_prepare_pointer_call_argument                              \
+    ((Py_ssize_t(*)(struct _cffi_ctypedescr *,                           \
+                    PyObject *, char **))_cffi_exports[23])
+#define _cffi_convert_array_from_object                                  \
+    ((int(*)(char *, struct _cffi_ctypedescr *, PyObject *))_cffi_exports[24])
+#define _CFFI_CPIDX  25
+#define _cffi_call_python                                                \
+    ((void(*)(struct _cffi_externpy_s *, char *))_cffi_exports[_CFFI_CPIDX])
+#define _cffi_to_c_wchar3216_t                                           \
+    ((int(*)(PyObject *))_cffi_exports[26])
+#define _cffi_from_c_wchar3216_t                                         \
+    ((PyObject *(*)(int))_cffi_exports[27])
+#define _CFFI_NUM_EXPORTS 28
+
+struct _cffi_ctypedescr;
+
+static void *_cffi_exports[_CFFI_NUM_EXPORTS];
+
+#define _cffi_type(index)   (                           \
+    assert((((uintptr_t)_cffi_types[index]) & 1) == 0), \
+    (struct _cffi_ctypedescr *)_cffi_types[index])
+
+static PyObject *_cffi_init(const char *module_name, Py_ssize_t version,
+                            const struct _cffi_type_context_s *ctx)
+{
+    PyObject *module, *o_arg, *new_module;
+    void *raw[] = {
+        (void *)module_name,
+        (void *)version,
+        (void *)_cffi_exports,
+        (void *)ctx,
+    };
+
+    module = PyImport_ImportModule("_cffi_backend");
+    if (module == NULL)
+        goto failure;
+
+    o_arg = PyLong_FromVoidPtr((void *)raw);
+    if (o_arg == NULL)
+        goto failure;
+
+    new_module = PyObject_CallMethod(
+        module, (char *)"_init_cffi_1_0_external_module", (char *)"O", o_arg);
+
+    Py_DECREF(o_arg);
+    Py_DECREF(module);
+    return new_module;
+
+  failure:
+    Py_XDECREF(module);
+    return NULL;
+}
+
+
+#ifdef HAVE_WCHAR_H
+typedef wchar_t _cffi_wchar_t;
+#else
+typedef uint16_t _cffi_wchar_t;   /* same random pick as _cffi_backend.c */
+#endif
+
+_CFFI_UNUSED_FN static uint16_t _cffi_to_c_char16_t(PyObject *o)
+{
+    if (sizeof(_cffi_wchar_t) == 2)
+        return (uint16_t)_cffi_to_c_wchar_t(o);
+    else
+        return (uint16_t)_cffi_to_c_wchar3216_t(o);
+}
+
+_CFFI_UNUSED_FN static PyObject *_cffi_from_c_char16_t(uint16_t x)
+{
+    if (sizeof(_cffi_wchar_t) == 2)
+        return _cffi_from_c_wchar_t((_cffi_wchar_t)x);
+    else
+        return _cffi_from_c_wchar3216_t((int)x);
+}
+
+_CFFI_UNUSED_FN static int _cffi_to_c_char32_t(PyObject *o)
+{
+    if (sizeof(_cffi_wchar_t) == 4)
+        return (int)_cffi_to_c_wchar_t(o);
+    else
+        return (int)_cffi_to_c_wchar3216_t(o);
+}
+
+_CFFI_UNUSED_FN static PyObject *_cffi_from_c_char32_t(unsigned int x)
+{
+    if (sizeof(_cffi_wchar_t) == 4)
+        return _cffi_from_c_wchar_t((_cffi_wchar_t)x);
+    else
+        return _cffi_from_c_wchar3216_t((int)x);
+}
+
+union _cffi_union_alignment_u {
+    unsigned char m_char;
+    unsigned short m_short;
+    unsigned int m_int;
+    unsigned long m_long;
+    unsigned long long m_longlong;
+    float m_float;
+    double m_double;
+    long double m_longdouble;
+};
+
+struct _cffi_freeme_s {
+    struct _cffi_freeme_s *next;
+    union _cffi_union_alignment_u alignment;
+};
+
+_CFFI_UNUSED_FN static int
+_cffi_convert_array_argument(struct _cffi_ctypedescr *ctptr, PyObject *arg,
+                             char **output_data, Py_ssize_t datasize,
+                             struct _cffi_freeme_s **freeme)
+{
+    char *p;
+    if (datasize < 0)
+        return -1;
+
+    p = *output_data;
+    if (p == NULL) {
+        struct _cffi_freeme_s *fp = (struct _cffi_freeme_s *)PyObject_Malloc(
+            offsetof(struct _cffi_freeme_s, alignment) + (size_t)datasize);
+        if (fp == NULL)
+            return -1;
+        fp->next = *freeme;
+        *freeme = fp;
+        p = *output_data = (char *)&fp->alignment;
+    }
+    memset((void *)p, 0, (size_t)datasize);
+    return _cffi_convert_array_from_object(p, ctptr, arg);
+}
+
+_CFFI_UNUSED_FN static void
+_cffi_free_array_arguments(struct _cffi_freeme_s *freeme)
+{
+    do {
+        void *p = (void *)freeme;
+        freeme = freeme->next;
+        PyObject_Free(p);
+    } while (freeme != NULL);
+}
+
+/**********  end CPython-specific section  **********/
+#else
+_CFFI_UNUSED_FN
+static void (*_cffi_call_python_org)(struct _cffi_externpy_s *, char *);
+# define _cffi_call_python  _cffi_call_python_org
+#endif
+
+
+#define _cffi_array_len(array)   (sizeof(array) / sizeof((array)[0]))
+
+#define _cffi_prim_int(size, sign)                                      \
+    ((size) == 1 ? ((sign) ? _CFFI_PRIM_INT8  : _CFFI_PRIM_UINT8)  :    \
+     (size) == 2 ? ((sign) ? _CFFI_PRIM_INT16 : _CFFI_PRIM_UINT16) :    \
+     (size) == 4 ? ((sign) ? _CFFI_PRIM_INT32 : _CFFI_PRIM_UINT32) :    \
+     (size) == 8 ? ((sign) ? _CFFI_PRIM_INT64 : _CFFI_PRIM_UINT64) :    \
+     _CFFI__UNKNOWN_PRIM)
+
+#define _cffi_prim_float(size)                                          \
+    ((size) == sizeof(float) ? _CFFI_PRIM_FLOAT :                       \
+     (size) == sizeof(double) ? _CFFI_PRIM_DOUBLE :                     \
+     (size) == sizeof(long double) ? _CFFI__UNKNOWN_LONG_DOUBLE :       \
+     _CFFI__UNKNOWN_FLOAT_PRIM)
+
+#define _cffi_check_int(got, got_nonpos, expected)      \
+    ((got_nonpos) == (expected <= 0) &&                 \
+     (got) == (unsigned long long)expected)
+
+#ifdef MS_WIN32
+# define _cffi_stdcall  __stdcall
+#else
+# define _cffi_stdcall  /* nothing */
+#endif
+
+#ifdef __cplusplus
+}
+#endif
+
+/************************************************************/
+
+#include <stdio.h>
+#include <string.h>
+#include <stdlib.h>
+#include <math.h>
+
+#define min(a, b) (((a) < (b)) ? (a) : (b))
+#define max(a, b) (((a) > (b)) ? (a) : (b))
+
+#define omega_index(x, y, z) z + (y * ny) + (x * ny * nrows)
+/*----------------------------------------------------------------------------*/
+/**
+  @brief    Solve a sparse system of linear equations
+  @param    a   2D array [n,nd]i
+  @param    r   array of RHS of size n
+  @param    n   number of equations
+  @param    nd  width of the band (3 for tri-diagonal system)
+  @return   0 on success, -1 on incorrect size of "a" and -4 on
+            degenerate matrix
+
+  Solve a sparse system of linear equations with band-diagonal matrix.
+  Band is assumed to be symmetrix relative to the main diaginal.
+
+  nd must be an odd number. The main diagonal should be in a(*,nd/2)
+  The first lower subdiagonal should be in a(1:n-1,nd/2-1), the first
+  upper subdiagonal is in a(0:n-2,nd/2+1) etc. For example:
+                    / 0 0 X X X \
+                    | 0 X X X X |
+                    | X X X X X |
+                    | X X X X X |
+              A =   | X X X X X |
+                    | X X X X X |
+                    | X X X X X |
+                    | X X X X 0 |
+                    \ X X X 0 0 /
+ */
+/*----------------------------------------------------------------------------*/
+static int bandsol(
+    double *a,
+    double *r,
+    int n,
+    int nd)
+{
+  double aa;
+  int i, j, k;
+
+  //if(fmod(nd,2)==0) return -1;
+
+  /* Forward sweep */
+  for (i = 0; i < n - 1; i++)
+  {
+    aa = a[i + n * (nd / 2)];
+    //if(aa==0.e0) return -3;
+    r[i] /= aa;
+    for (j = 0; j < nd; j++)
+      a[i + j * n] /= aa;
+    for (j = 1; j < min(nd / 2 + 1, n - i); j++)
+    {
+      aa = a[i + j + n * (nd / 2 - j)];
+      //if(aa==0.e0) return -j;
+      r[i + j] -= r[i] * aa;
+      for (k = 0; k < n * (nd - j); k += n)
+        a[i + j + k] -= a[i + k + n * j] * aa;
+    }
+  }
+
+  /* Backward sweep */
+  r[n - 1] /= a[n - 1 + n * (nd / 2)];
+  for (i = n - 1; i > 0; i--)
+  {
+    for (j = 1; j <= min(nd / 2, i); j++)
+      r[i - j] -= r[i] * a[i - j + n * (nd / 2 + j)];
+    //if(a[i-1+n*(nd/2)]==0.e0) return -5;
+    r[i - 1] /= a[i - 1 + n * (nd / 2)];
+  }
+
+  //if(a[n*(nd/2)]==0.e0) return -6;
+  r[0] /= a[n * (nd / 2)];
+  return 0;
+}
+
+int slit_func_vert(int ncols,        /* Swath width in pixels                                 */
+                   int nrows,        /* Extraction slit height in pixels                      */
+                   double *im,       /* Image to be decomposed                                */
+                   double *pix_unc,  /* Image Uncertianty to be decomposed                                */
+                   int *mask,        /* Initial and final mask for the swath                  */
+                   double *ycen,     /* Order centre line offset from pixel row boundary      */
+                   int osample,      /* Subpixel ovsersampling factor                         */
+                   double lambda_sP, /* Smoothing parameter for the spectrum, coiuld be zero  */
+                   double lambda_sL, /* Smoothing parameter for the slit function, usually >0 */
+                   double *sP,       /* Spectrum resulting from decomposition                 */
+                   double *sL,       /* Slit function resulting from decomposition            */
+                   double *model,    /* Model constructed from sp and sf                      */
+                   double *unc       /* Spectrum uncertainties                                */
+)
+{
+  int x, y, iy, jy, iy1, iy2, ny, nd;
+  double step, d1, d2, sum, norm, dev, lambda, diag_tot, sP_change, sP_max;
+  int info, iter, isum;
+  /* Initialise */
+  nd = 2 * osample + 1;
+  ny = osample * (nrows + 1) + 1; /* The size of the sf array */
+  step = 1.e0 / osample;
+  double *E = malloc(ncols * sizeof(double));                    // double E[ncols];
+  double *sP_old = malloc(ncols * sizeof(double));               // double sP_old[ncols];
+  double *Aij = malloc(ny * (2 * osample + 1) * sizeof(double)); // double Aij[ny*ny];
+  double *bj = malloc(ny * sizeof(double));                      // double bj[ny];
+  double *Adiag = malloc(ncols * 3 * sizeof(double));            // double Adiag[ncols*3];
+  double *omega = malloc(ny * nrows * ncols * sizeof(double));   // double omega[ny][nrows][ncols];
+  double *p_bj = malloc(ncols * sizeof(double));                 // index as: [iy+(y*ny)+(x*ny*nrows)]
+
+  for (int k = 0; k < ncols * 3; k++)
+    Adiag[k] = 0; // Initialize to zero
+
+  /*
+  Construct the omega tensor. Normally it has the dimensionality of
+  ny*nrows*ncols.
+  The tensor is mostly empty and can be easily compressed to ny*nx, but
+  this will complicate matrix operations at later stages. I will keep
+  it as it is for now.
+  Note, that omega is used in in the equations for sL, sP and for the model
+  but it does not involve the data, only the geometry. Thus it can be
+  pre-computed once.
+  */
+  for (x = 0; x < ncols; x++)
+  {
+    iy2 = osample - floor(ycen[x] / step) - 1;
+    iy1 = iy2 - osample;
+
+    d1 = fmod(ycen[x], step);
+    if (d1 == 0)
+      d1 = step;
+    d2 = step - d1;
+
+    for (y = 0; y < nrows; y++)
+    {
+      iy1 += osample;
+      iy2 += osample;
+      for (iy = 0; iy < ny; iy++)
+      {
+        if (iy < iy1)
+          omega[omega_index(x, y, iy)] = 0.;
+        else if (iy == iy1)
+          omega[omega_index(x, y, iy)] = d1;
+        else if (iy > iy1 && iy < iy2)
+          omega[omega_index(x, y, iy)] = step;
+        else if (iy == iy2)
+          omega[omega_index(x, y, iy)] = d2;
+        else
+          omega[omega_index(x, y, iy)] = 0.;
+      }
+    }
+  }
+
+  /* Loop through sL , sP reconstruction until convergence is reached */
+  iter = 0;
+  do
+  {
+    /* Compute slit function sL */
+    /* Fill in SLE arrays */
+    diag_tot = 0.e0;
+    for (iy = 0; iy < ny; iy++)
+    {
+      bj[iy] = 0.e0;
+      for (jy = max(iy - osample, 0); jy <= min(iy + osample, ny - 1); jy++)
+      {
+        Aij[iy + ny * (jy - iy + osample)] = 0.e0;
+        for (x = 0; x < ncols; x++)
+        {
+          sum = 0.e0;
+          for (y = 0; y < nrows; y++)
+            sum += omega[omega_index(x, y, iy)] *
+                   omega[omega_index(x, y, jy)] * mask[y * ncols + x];
+          Aij[iy + ny * (jy - iy + osample)] += sum * sP[x] * sP[x];
+        }
+      }
+      for (x = 0; x < ncols; x++)
+      {
+        sum = 0.e0;
+        for (y = 0; y < nrows; y++)
+          sum += omega[omega_index(x, y, iy)] *
+                 mask[y * ncols + x] * im[y * ncols + x];
+        bj[iy] += sum * sP[x];
+      }
+      diag_tot += Aij[iy + ny * osample];
+    }
+
+    /* Scale regularization parameters */
+    lambda = lambda_sL * diag_tot / ny;
+
+    /* Add regularization parts for the slit function */
+    Aij[ny * osample] += lambda;       /* Main diagonal  */
+    Aij[ny * (osample + 1)] -= lambda; /* Upper diagonal */
+    for (iy = 1; iy < ny - 1; iy++)
+    {
+      Aij[iy + ny * (osample - 1)] -= lambda;  /* Lower diagonal */
+      Aij[iy + ny * osample] += lambda * 2.e0; /* Main diagonal  */
+      Aij[iy + ny * (osample + 1)] -= lambda;  /* Upper diagonal */
+    }
+    Aij[ny - 1 + ny * (osample - 1)] -= lambda; /* Lower diagonal */
+    Aij[ny - 1 + ny * osample] += lambda;       /* Main diagonal  */
+
+    /* Solve the system of equations */
+    info = bandsol(Aij, bj, ny, nd);
+    if (info)
+      printf("Bandsol exited with %d", info);
+
+    /* Normalize the slit function */
+    norm = 0.e0;
+    for (iy = 0; iy < ny; iy++)
+    {
+      sL[iy] = bj[iy];
+      norm += sL[iy];
+    }
+    norm /= osample;
+    for (iy = 0; iy < ny; iy++)
+      sL[iy] /= norm;
+
+    /* Compute spectrum sP */
+    for (x = 0; x < ncols; x++)
+    {
+      Adiag[x + ncols] = 0.e0;
+      E[x] = 0.e0;
+      for (y = 0; y < nrows; y++)
+      {
+        sum = 0.e0;
+        for (iy = 0; iy < ny; iy++)
+        {
+          sum += omega[omega_index(x, y, iy)] * sL[iy];
+        }
+
+        Adiag[x + ncols] += sum * sum * mask[y * ncols + x];
+        E[x] += sum * im[y * ncols + x] * mask[y * ncols + x];
+      }
+    }
+    if (lambda_sP > 0.e0)
+    {
+      norm = 0.e0;
+      for (x = 0; x < ncols; x++)
+      {
+        sP_old[x] = sP[x];
+        norm += sP[x];
+      }
+      norm /= ncols;
+      lambda = lambda_sP * norm;
+      Adiag[0] = 0.e0;
+      Adiag[0 + ncols] += lambda;
+      Adiag[0 + ncols * 2] -= lambda;
+      for (x = 1; x < ncols - 1; x++)
+      {
+        Adiag[x] = -lambda;
+        Adiag[x + ncols] += 2.e0 * lambda;
+        Adiag[x + ncols * 2] = -lambda;
+      }
+      Adiag[ncols - 1] -= lambda;
+      Adiag[ncols - 1 + ncols] += lambda;
+      Adiag[ncols - 1 + 2 * ncols] = 0.e0;
+
+      info = bandsol(Adiag, E, ncols, 3);
+      for (x = 0; x < ncols; x++)
+        sP[x] = E[x];
+    }
+    else
+    {
+      for (x = 0; x < ncols; x++)
+      {
+        sP_old[x] = sP[x];
+        sP[x] = E[x] / Adiag[x + ncols];
+      }
+    }
+
+    /* Compute the model */
+    for (y = 0; y < nrows; y++)
+    {
+      for (x = 0; x < ncols; x++)
+      {
+        sum = 0.e0;
+        for (iy = 0; iy < ny; iy++)
+          sum += omega[omega_index(x, y, iy)] * sL[iy];
+        model[y * ncols + x] = sum * sP[x];
+      }
+    }
+
+    /* Compare model and data */
+    sum = 0.e0;
+    isum = 0;
+    for (y = 0; y < nrows; y++)
+    {
+      for (x = 0; x < ncols; x++)
+      {
+        sum += mask[y * ncols + x] * (model[y * ncols + x] - im[y * ncols + x]) *
+               (model[y * ncols + x] - im[y * ncols + x]);
+        isum += mask[y * ncols + x];
+      }
+    }
+    dev = sqrt(sum / isum);
+
+    /* Adjust the mask marking outlyers */
+    for (y = 0; y < nrows; y++)
+    {
+      for (x = 0; x < ncols; x++)
+      {
+        if (fabs(model[y * ncols + x] - im[y * ncols + x]) > 6. * dev)
+          mask[y * ncols + x] = 0;
+        else
+          mask[y * ncols + x] = 1;
+      }
+    }
+
+    /* Compute the change in the spectrum */
+    sP_change = 0.e0;
+    sP_max = 1.e0;
+    for (x = 0; x < ncols; x++)
+    {
+      if (sP[x] > sP_max)
+        sP_max = sP[x];
+      if (fabs(sP[x] - sP_old[x]) > sP_change)
+        sP_change = fabs(sP[x] - sP_old[x]);
+    }
+    /* Check the convergence */
+  } while (iter++ < 5 && sP_change > 1e-5 * sP_max);
+
+  /* Uncertainty estimate */
+  for (x = 0; x < ncols; x++)
+  {
+    unc[x] = 0.;
+    p_bj[x] = 0.;
+  }
+  for (x = 0; x < ncols; x++)
+  {
+    // Loop through all pixels contributing to x
+    for (y = 0; y < nrows; y++)
+    {
+      unc[x] += (im[y * ncols + x] - model[y * ncols + x]) *
+                (im[y * ncols + x] - model[y * ncols + x]) *
+                sL[y] * mask[y * ncols + x];
+      unc[x] += pix_unc[y * ncols + x] * pix_unc[y * ncols + x] *
+                sL[y] * mask[y * ncols + x];
+      // Norm
+      p_bj[x] += sL[y] * mask[y * ncols + x];
+    }
+  }
+  for (x = 0; x < ncols; x++)
+  {
+    unc[x] = sqrt(unc[x] / p_bj[x] * nrows);
+  }
+
+  if (!(sP[0] == sP[0]))
+  {
+    printf("SOMETHING WENT WRONG STOP HERE!!!\n");
+    // raise(SIGINT);
+  }
+
+  free(E);
+  free(sP_old);
+  free(omega);
+  free(Aij);
+  free(bj);
+  free(Adiag);
+  free(p_bj);
+
+  return 0;
+}
+
+
+/************************************************************/
+
+static void *_cffi_types[] = {
+/*  0 */ _CFFI_OP(_CFFI_OP_FUNCTION, 1), // int()(int, int, double *, double *, int *, double *, int, double, double, double *, double *, double *, double *)
+/*  1 */ _CFFI_OP(_CFFI_OP_PRIMITIVE, 7), // int
+/*  2 */ _CFFI_OP(_CFFI_OP_PRIMITIVE, 7),
+/*  3 */ _CFFI_OP(_CFFI_OP_POINTER, 8), // double *
+/*  4 */ _CFFI_OP(_CFFI_OP_NOOP, 3),
+/*  5 */ _CFFI_OP(_CFFI_OP_POINTER, 1), // int *
+/*  6 */ _CFFI_OP(_CFFI_OP_NOOP, 3),
+/*  7 */ _CFFI_OP(_CFFI_OP_PRIMITIVE, 7),
+/*  8 */ _CFFI_OP(_CFFI_OP_PRIMITIVE, 14), // double
+/*  9 */ _CFFI_OP(_CFFI_OP_PRIMITIVE, 14),
+/* 10 */ _CFFI_OP(_CFFI_OP_NOOP, 3),
+/* 11 */ _CFFI_OP(_CFFI_OP_NOOP, 3),
+/* 12 */ _CFFI_OP(_CFFI_OP_NOOP, 3),
+/* 13 */ _CFFI_OP(_CFFI_OP_NOOP, 3),
+/* 14 */ _CFFI_OP(_CFFI_OP_FUNCTION_END, 0),
+};
+
+static int _cffi_d_slit_func_vert(int x0, int x1, double * x2, double * x3, int * x4, double * x5, int x6, double x7, double x8, double * x9, double * x10, double * x11, double * x12)
+{
+  return slit_func_vert(x0, x1, x2, x3, x4, x5, x6, x7, x8, x9, x10, x11, x12);
+}
+#ifndef PYPY_VERSION
+static PyObject *
+_cffi_f_slit_func_vert(PyObject *self, PyObject *args)
+{
+  int x0;
+  int x1;
+  double * x2;
+  double * x3;
+  int * x4;
+  double * x5;
+  int x6;
+  double x7;
+  double x8;
+  double * x9;
+  double * x10;
+  double * x11;
+  double * x12;
+  Py_ssize_t datasize;
+  struct _cffi_freeme_s *large_args_free = NULL;
+  int result;
+  PyObject *pyresult;
+  PyObject *arg0;
+  PyObject *arg1;
+  PyObject *arg2;
+  PyObject *arg3;
+  PyObject *arg4;
+  PyObject *arg5;
+  PyObject *arg6;
+  PyObject *arg7;
+  PyObject *arg8;
+  PyObject *arg9;
+  PyObject *arg10;
+  PyObject *arg11;
+  PyObject *arg12;
+
+  if (!PyArg_UnpackTuple(args, "slit_func_vert", 13, 13, &arg0, &arg1, &arg2, &arg3, &arg4, &arg5, &arg6, &arg7, &arg8, &arg9, &arg10, &arg11, &arg12))
+    return NULL;
+
+  x0 = _cffi_to_c_int(arg0, int);
+  if (x0 == (int)-1 && PyErr_Occurred())
+    return NULL;
+
+  x1 = _cffi_to_c_int(arg1, int);
+  if (x1 == (int)-1 && PyErr_Occurred())
+    return NULL;
+
+  datasize = _cffi_prepare_pointer_call_argument(
+      _cffi_type(3), arg2, (char **)&x2);
+  if (datasize != 0) {
+    x2 = ((size_t)datasize) <= 640 ? (double *)alloca((size_t)datasize) : NULL;
+    if (_cffi_convert_array_argument(_cffi_type(3), arg2, (char **)&x2,
+            datasize, &large_args_free) < 0)
+      return NULL;
+  }
+
+  datasize = _cffi_prepare_pointer_call_argument(
+      _cffi_type(3), arg3, (char **)&x3);
+  if (datasize != 0) {
+    x3 = ((size_t)datasize) <= 640 ? (double *)alloca((size_t)datasize) : NULL;
+    if (_cffi_convert_array_argument(_cffi_type(3), arg3, (char **)&x3,
+            datasize, &large_args_free) < 0)
+      return NULL;
+  }
+
+  datasize = _cffi_prepare_pointer_call_argument(
+      _cffi_type(5), arg4, (char **)&x4);
+  if (datasize != 0) {
+    x4 = ((size_t)datasize) <= 640 ? (int *)alloca((size_t)datasize) : NULL;
+    if (_cffi_convert_array_argument(_cffi_type(5), arg4, (char **)&x4,
+            datasize, &large_args_free) < 0)
+      return NULL;
+  }
+
+  datasize = _cffi_prepare_pointer_call_argument(
+      _cffi_type(3), arg5, (char **)&x5);
+  if (datasize != 0) {
+    x5 = ((size_t)datasize) <= 640 ? (double *)alloca((size_t)datasize) : NULL;
+    if (_cffi_convert_array_argument(_cffi_type(3), arg5, (char **)&x5,
+            datasize, &large_args_free) < 0)
+      return NULL;
+  }
+
+  x6 = _cffi_to_c_int(arg6, int);
+  if (x6 == (int)-1 && PyErr_Occurred())
+    return NULL;
+
+  x7 = (double)_cffi_to_c_double(arg7);
+  if (x7 == (double)-1 && PyErr_Occurred())
+    return NULL;
+
+  x8 = (double)_cffi_to_c_double(arg8);
+  if (x8 == (double)-1 && PyErr_Occurred())
+    return NULL;
+
+  datasize = _cffi_prepare_pointer_call_argument(
+      _cffi_type(3), arg9, (char **)&x9);
+  if (datasize != 0) {
+    x9 = ((size_t)datasize) <= 640 ? (double *)alloca((size_t)datasize) : NULL;
+    if (_cffi_convert_array_argument(_cffi_type(3), arg9, (char **)&x9,
+            datasize, &large_args_free) < 0)
+      return NULL;
+  }
+
+  datasize = _cffi_prepare_pointer_call_argument(
+      _cffi_type(3), arg10, (char **)&x10);
+  if (datasize != 0) {
+    x10 = ((size_t)datasize) <= 640 ? (double *)alloca((size_t)datasize) : NULL;
+    if (_cffi_convert_array_argument(_cffi_type(3), arg10, (char **)&x10,
+            datasize, &large_args_free) < 0)
+      return NULL;
+  }
+
+  datasize = _cffi_prepare_pointer_call_argument(
+      _cffi_type(3), arg11, (char **)&x11);
+  if (datasize != 0) {
+    x11 = ((size_t)datasize) <= 640 ? (double *)alloca((size_t)datasize) : NULL;
+    if (_cffi_convert_array_argument(_cffi_type(3), arg11, (char **)&x11,
+            datasize, &large_args_free) < 0)
+      return NULL;
+  }
+
+  datasize = _cffi_prepare_pointer_call_argument(
+      _cffi_type(3), arg12, (char **)&x12);
+  if (datasize != 0) {
+    x12 = ((size_t)datasize) <= 640 ? (double *)alloca((size_t)datasize) : NULL;
+    if (_cffi_convert_array_argument(_cffi_type(3), arg12, (char **)&x12,
+            datasize, &large_args_free) < 0)
+      return NULL;
+  }
+
+  Py_BEGIN_ALLOW_THREADS
+  _cffi_restore_errno();
+  { result = slit_func_vert(x0, x1, x2, x3, x4, x5, x6, x7, x8, x9, x10, x11, x12); }
+  _cffi_save_errno();
+  Py_END_ALLOW_THREADS
+
+  (void)self; /* unused */
+  pyresult = _cffi_from_c_int(result, int);
+  if (large_args_free != NULL) _cffi_free_array_arguments(large_args_free);
+  return pyresult;
+}
+#else
+#  define _cffi_f_slit_func_vert _cffi_d_slit_func_vert
+#endif
+
+static const struct _cffi_global_s _cffi_globals[] = {
+  { "slit_func_vert", (void *)_cffi_f_slit_func_vert, _CFFI_OP(_CFFI_OP_CPYTHON_BLTN_V, 0), (void *)_cffi_d_slit_func_vert },
+};
+
+static const struct _cffi_type_context_s _cffi_type_context = {
+  _cffi_types,
+  _cffi_globals,
+  NULL,  /* no fields */
+  NULL,  /* no struct_unions */
+  NULL,  /* no enums */
+  NULL,  /* no typenames */
+  1,  /* num_globals */
+  0,  /* num_struct_unions */
+  0,  /* num_enums */
+  0,  /* num_typenames */
+  NULL,  /* no includes */
+  15,  /* num_types */
+  0,  /* flags */
+};
+
+#ifdef __GNUC__
+#  pragma GCC visibility push(default)  /* for -fvisibility= */
+#endif
+
+#ifdef PYPY_VERSION
+PyMODINIT_FUNC
+_cffi_pypyinit__slitfunc_bd(const void *p[])
+{
+    p[0] = (const void *)0x2601;
+    p[1] = &_cffi_type_context;
+    return NULL;
+}
+#  ifdef _MSC_VER
+     PyMODINIT_FUNC
+     PyInit__slitfunc_bd(void) { return NULL; }
+#  endif
+#else
+PyMODINIT_FUNC
+PyInit__slitfunc_bd(void)
+{
+  return _cffi_init("_slitfunc_bd", 0x2601, &_cffi_type_context);
+}
+#endif
+
+#ifdef __GNUC__
+#  pragma GCC visibility pop
+#endif
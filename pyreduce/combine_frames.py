@@ -7,6 +7,7 @@ Used to create master bias and master flat
 
 import datetime
 import logging
+import os
 
 import astropy.io.fits as fits
 import matplotlib.pyplot as plt
@@ -152,6 +153,33 @@ def fix_bad_pixels(probability: np.ndarray[float],
     return corrected_signal, nbad
 
 
+def prefetch(files: list[Path]) -> None:
+    """Ask the operating system to start reading files into its cache, in the background
+
+    Reading them afterwards, e.g. row by row through memmap, then waits less for the disk.
+    Does nothing where posix_fadvise is not available (e.g. on Windows or macOS), or for files that can not be opened.
+
+    Parameters
+    ----------
+    files : list[Path]
+        files that are about to be read
+    """
+    if not hasattr(os, "posix_fadvise"):  # pragma: no cover
+        return
+    for file in files:
+        try:
+            fd = os.open(file, os.O_RDONLY)
+        except OSError:
+            continue
+        try:
+            # A length of 0 means the whole file
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+
 def combine_frames(files: list[Path],
                    instrument: Instrument,
                    mode: str,
@@ -255,6 +283,9 @@ def combine_frames(files: list[Path],
 
     DEBUG_NROWS = 128  # print status update every DEBUG_NROWS rows (if debug is True)
 
+    # The disk reads ahead while the first files are processed
+    prefetch(files)
+
     # Only one image
     if len(files) == 0:
         raise ValueError(f"No files given for {c.name('combining frames')}")
@@ -616,7 +647,8 @@ def combine_polynomial(files: list[Path],
     coeffs = coeffs.reshape(shape)
     # And apply the mask to each image of coefficients
     if mask is not None:
-        bias = np.ma.masked_array(coeffs, mask=[mask for _ in range(degree + 1)])
+        # A read-only view, instead of a copy of the mask for each coefficient
+        bias = np.ma.masked_array(coeffs, mask=np.broadcast_to(mask, shape))
     # We arbitralily pick the first header as the bias header
     # and change the exposure time
     bhead = hdus[0][1]
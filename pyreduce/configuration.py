@@ -8,6 +8,8 @@ It also checks that all parameters exists, and that
 no new parameters have been added by accident.
 """
 
+import copy
+import functools
 import json
 import logging
 import jsonschema
@@ -76,17 +78,27 @@ def load_config(configuration: None | str | list | dict | Path, instrument_name:
         raise TypeError(f"Configuration must be None | dict | list | str, got {type(configuration)}")
 
     if isinstance(config, str) or isinstance(config, Path):
-        logger.info(f"Loading configuration from {config}")
-        try:
-            with open(config) as f:
-                config = json.load(f)
-        except FileNotFoundError:
+        config = Path(config)
+        if not config.is_file():
             fname = Path(__file__).parent / "instruments" / instrument_name.lower() / f"settings_{instrument_name}.json"
             logger.warning(f"File {config} was not found, defaulting to {fname}")
-            with open(fname) as f:
-                config = json.load(f)
+            config = fname
+        logger.info(f"Loading configuration from {config}")
+        # The settings are modified by the callers, so each gets its own copy of the cached ones
+        return copy.deepcopy(_load_config_file(config, config.stat().st_mtime_ns))
+
+    return _with_defaults(config)
+
+
+@functools.lru_cache(maxsize=32)
+def _load_config_file(fname: Path, mtime_ns: int) -> dict:
+    """Read, complete and validate a configuration file, only once as long as it is not modified"""
+    with open(fname) as f:
+        return _with_defaults(json.load(f))
+
 
-    # Combine instrument specific settings, with default values
+def _with_defaults(config: dict) -> dict:
+    """Combine instrument specific settings with the default values, and validate the result"""
     settings = read_instrument_config()
     settings = update(settings, config)
 
@@ -11,6 +11,8 @@ import astropy.io.fits as fits
 import numpy as np
 import scipy.constants
 
+from pyreduce import util
+
 logger = logging.getLogger(__name__)
 
 
@@ -357,7 +359,7 @@ def save(fname: str, header: fits.Header, **kwargs) -> None:
     if not isinstance(header, fits.Header):
         header = fits.Header(cards=header)
 
-    primary = fits.PrimaryHDU(header=header)
+    primary = fits.PrimaryHDU(header=util.verified_header(header))
 
     columns = []
     for key, value in kwargs.items():
@@ -384,4 +386,4 @@ def save(fname: str, header: fits.Header, **kwargs) -> None:
     table = fits.BinTableHDU.from_columns(columns)
 
     hdulist = fits.HDUList(hdus=[primary, table])
-    hdulist.writeto(fname, overwrite=True, output_verify="silentfix+ignore")
+    hdulist.writeto(fname, overwrite=True, output_verify="ignore")
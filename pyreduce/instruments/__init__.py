@@ -1,12 +1,49 @@
+import importlib
+
 from .instrument import Instrument, InstrumentWithModes
 
-from .andes.andes import ANDES
-from .crires_plus.crires_plus import CRIRES_PLUS
-from .uves.uves import UVES
-from .metis_ifu.metis_ifu import METIS_IFU
-from .metis_lss.metis_lss import METIS_LSS
+# Instrument classes are only imported when they are first used, see __getattr__
+# Maps the class name to the module it is defined in
+_instrument_modules: dict[str, str] = {
+    'COMMON': '.instrument',
+    'ANDES': '.andes.andes',
+    'CRIRES_PLUS': '.crires_plus.crires_plus',
+    'HARPS': '.harps.harps',
+    'JWST_MIRI': '.jwst_miri.jwst_miri',
+    'JWST_NIRISS': '.jwst_niriss.jwst_niriss',
+    'LICK_APF': '.lick_apf.lick_apf',
+    'MCDONALD': '.mcdonald.mcdonald',
+    'METIS_IFU': '.metis_ifu.metis_ifu',
+    'METIS_LSS': '.metis_lss.metis_lss',
+    'MICADO': '.micado.micado',
+    'NIRSPEC': '.nirspec.nirspec',
+    'NTE': '.nte.nte',
+    'UVES': '.uves.uves',
+    'XSHOOTER': '.xshooter.xshooter',
+}
+
+__all__ = ['Instrument', 'InstrumentWithModes', 'get_instrument_class', *_instrument_modules]
+
+
+def __getattr__(name: str):
+    try:
+        module = _instrument_modules[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+
+    instrument_class = getattr(importlib.import_module(module, package=__name__), name)
+    # Store it, so that the next access does not go through __getattr__ again
+    globals()[name] = instrument_class
+    return instrument_class
+
+
+def get_instrument_class(name: str) -> type[Instrument]:
+    """Get the class of an instrument by its name, ignoring the case (e.g. "uves" or "UVES")"""
+    class_name = name.upper()
+    if class_name not in _instrument_modules:
+        raise ValueError(f"Unknown instrument {name!r}, expected one of {', '.join(_instrument_modules)}")
+    return globals().get(class_name) or __getattr__(class_name)
+
 
-__all__ = ['Instrument', 'InstrumentWithModes',
-           'ANDES', 'CRIRES_PLUS', 'UVES', 'METIS_LSS', 'METIS_IFU',
-           # TODO Add the rest too
-           ]
+def __dir__():
+    return sorted(set(globals()) | set(_instrument_modules))
@@ -9,10 +9,10 @@ import re
 import numpy as np
 
 from itertools import product
-from pathlib import Path
 from astropy.io import fits
 
-from pyreduce.instruments.instrument import Instrument, InstrumentWithModes, HeaderGetter, observation_date_to_night
+from pyreduce.instruments.instrument import (Instrument, InstrumentWithModes, HeaderGetter, observation_date_to_night,
+                                             WAVECAL_DIR, MASK_DIR)
 from pyreduce.instruments.filters import Filter
 
 logger = logging.getLogger(__name__)
@@ -69,11 +69,11 @@ class ANDES(InstrumentWithModes):
 
     def get_wavecal_filename(self, header: fits.Header, mode: str, **kwargs):
         """Get the filename of the wavelength calibration config file"""
-        return Path(__file__).parents[1] / "wavecal" / f"{self.name}_{mode}.npz"
+        return WAVECAL_DIR / f"{self.name}_{mode}.npz"
 
     def get_mask_filename(self, mode, **kwargs):
         band, decker, detector = self.parse_mode(mode)
-        return Path(__file__).parents[1] / "masks" / f"mask_{self.name.lower()}_det{detector}.fits.gz"
+        return MASK_DIR / f"mask_{self.name}_det{detector}.fits.gz"
 
     def get_wavelength_range(self, header, mode, **kwargs) -> np.ndarray:
         wmin = [header["ESO INS WLEN MIN%i" % i] for i in range(1, 11)]
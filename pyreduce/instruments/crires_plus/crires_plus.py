@@ -4,15 +4,13 @@ Mostly reading data from the header
 """
 import datetime
 import logging
-import os.path
 import re
 from itertools import product
 
 import numpy as np
 from astropy.io import fits
-from pathlib import Path
 
-from pyreduce.instruments.instrument import Instrument, HeaderGetter, observation_date_to_night
+from pyreduce.instruments.instrument import Instrument, HeaderGetter, observation_date_to_night, WAVECAL_DIR, MASK_DIR
 from pyreduce.instruments.filters import Filter
 
 logger = logging.getLogger(__name__)
@@ -32,7 +30,6 @@ class CRIRES_PLUS(Instrument):
         # alternatively you can implement all of it here, whatever works
         band, decker, detector = self.parse_mode(mode)
         header = super().add_header_info(header, band)
-        info = self.load_info()
 
         return header
 
@@ -77,16 +74,11 @@ class CRIRES_PLUS(Instrument):
 
     def get_wavecal_filename(self, header: fits.Header, mode: str, **kwargs):
         """Get the filename of the wavelength calibration config file"""
-        return Path(__file__).parents[1] / "wavecal" / f"{self.name}_{mode}.npz"
+        return WAVECAL_DIR / f"{self.name}_{mode}.npz"
 
     def get_mask_filename(self, mode, **kwargs):
-        i = self.name.lower()
         band, decker, detector = self.parse_mode(mode)
-
-        fname = f"mask_{i}_det{detector}.fits.gz"
-        cwd = os.path.dirname(__file__)
-        fname = os.path.join(cwd, "..", "masks", fname)
-        return fname
+        return MASK_DIR / f"mask_{self.name}_det{detector}.fits.gz"
 
     def get_wavelength_range(self, header, mode, **kwargs):
         wmin = [header["ESO INS WLEN MIN%i" % i] for i in range(1, 11)]
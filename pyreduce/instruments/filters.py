@@ -13,6 +13,18 @@ from typing import Any
 logger = logging.getLogger(__name__)
 
 
+def parse_date(value: str) -> datetime.date:
+    """Parse the date of a timestamp string
+
+    FITS dates are ISO 8601, which the builtin parser handles much faster than dateutil,
+    so dateutil is only used for anything else
+    """
+    try:
+        return datetime.datetime.fromisoformat(value).date()
+    except ValueError:
+        return parser.parse(value).date()
+
+
 class Filter:
     def __init__(
         self,
@@ -30,12 +42,28 @@ class Filter:
         self.regex = regex
         self.flags = flags
         self.data = []
+        # Distinct values in self.data and the index of each entry among them, see _factorize
+        self._uniques = None
+        self._codes = None
         self.unique = unique
         self.ignorecase = ignorecase
 
         if self.ignorecase and not self.flags & re.IGNORECASE:
             self.flags += re.IGNORECASE
 
+    @property
+    def keywords(self) -> list[str] | None:
+        """Header keywords read by `collect`, or None if they can not be listed (e.g. wildcards)"""
+        if self.keyword is None:
+            return []
+        if "{" in self.keyword:
+            keywords = re.findall(r"{([^{}]+)}", self.keyword)
+        else:
+            keywords = [self.keyword]
+        if any(char in keyword for keyword in keywords for char in "*?"):
+            return None
+        return keywords
+
     def _collect_value(self, header: fits.Header) -> Any:
         if self.keyword is None:
             value = ""
@@ -57,26 +85,47 @@ class Filter:
         self.data.append(value)
         return value
 
+    def _factorize(self) -> tuple[list, np.ndarray]:
+        """Split the collected data into its distinct values and the index of each entry among them
+
+        Files of one night share only a handful of header values,
+        so matching can run once per distinct value instead of once per file.
+        The result is cached until more data is collected.
+        """
+        if self._codes is None or len(self._codes) != len(self.data):
+            index = {}
+            try:
+                codes = [index.setdefault(v, len(index)) for v in self.data]
+                self._uniques = list(index)
+            except TypeError:
+                # Unhashable values can not be grouped, just use each one by itself
+                codes = range(len(self.data))
+                self._uniques = list(self.data)
+            self._codes = np.fromiter(codes, dtype=int, count=len(self.data))
+        return self._uniques, self._codes
+
+    def _match_values(self, value, values: list) -> np.ndarray:
+        try:
+            if self.regex:
+                regex = re.compile(f"^(?:{value})$", flags=self.flags)
+            elif self.wildcards:
+                regex = re.compile(fnmatch.translate(value), flags=self.flags)
+            else:
+                regex = re.compile(value, flags=self.flags)
+
+            result = [
+                regex.match(f) is not None if f is not None else False
+                for f in values
+            ]
+        except TypeError as exc:
+            result = [f == value for f in values]
+        return np.asarray(result, dtype=bool)
+
     def match(self, value):
         if self.keyword is None:
-            result = np.full(len(self.data), False)
-        else:
-            try:
-                if self.regex:
-                    regex = re.compile(f"^(?:{value})$", flags=self.flags)
-                elif self.wildcards:
-                    regex = re.compile(fnmatch.translate(value), flags=self.flags)
-                else:
-                    regex = re.compile(value, flags=self.flags)
-
-                result = [
-                    regex.match(f) is not None if f is not None else False
-                    for f in self.data
-                ]
-            except TypeError as exc:
-                result = [f == value for f in self.data]
-        result = np.asarray(result, dtype=bool)
-        return result
+            return np.full(len(self.data), False)
+        uniques, codes = self._factorize()
+        return self._match_values(value, uniques)[codes]
 
     def classify(self, value):
         if self.unique:
@@ -97,6 +146,8 @@ class Filter:
 
     def clear(self):
         self.data = []
+        self._uniques = None
+        self._codes = None
 
 
 class InstrumentFilter(Filter):
@@ -122,7 +173,7 @@ class NightFilter(Filter):
         timezone_local=None,
         **kwargs,
     ):
-        super().__init__(keyword, dtype=datetime, **kwargs)
+        super().__init__(keyword, dtype=datetime.date, **kwargs)
         self.timeformat = timeformat
         self.timezone = timezone
         self.timezone_local = timezone_local
@@ -155,7 +206,7 @@ class NightFilter(Filter):
 
     def match(self, value):
         try:
-            value = parser.parse(value).date()
+            value = parse_date(value)
         except Exception:
             pass
         match = super().match(value)
@@ -11,7 +11,7 @@ from pathlib import Path
 from astropy.io import fits
 from typing import overload
 
-from pyreduce.instruments.instrument import Instrument
+from pyreduce.instruments.instrument import Instrument, WAVECAL_DIR
 from pyreduce.instruments.filters import Filter, InstrumentFilter, NightFilter, ObjectFilter
 
 logger = logging.getLogger(__name__)
@@ -67,6 +67,10 @@ class PolarizationFilter(Filter):
     def __init__(self, keyword="ESO INS RET?? POS"):
         super().__init__(keyword, regex=True)
 
+    @property
+    def keywords(self) -> list[str]:
+        return ["ESO DPR TYPE"]
+
     def collect(self, header: fits.Header) -> str:
         dpr_type = header.get("ESO DPR TYPE", "")
 
@@ -298,7 +302,7 @@ class HARPS(Instrument):
                              **kwargs) -> Path:
         """Get the filename of the wavelength calibration config file"""
         pol = "_pol" if polarimetry is not None else ""
-        return Path(__file__).parents[1] / "wavecal" / f"harps_{mode.lower()}{pol}_2D.npz"
+        return WAVECAL_DIR / f"harps_{mode.lower()}{pol}_2D.npz"
 
     def get_wavelength_range(self, header, mode, **kwargs):
         wave_range = super().get_wavelength_range(header, mode, **kwargs)
@@ -3,12 +3,13 @@ Abstract parent module for all other instruments
 Contains some general functionality, which may be overridden by the children of course
 """
 import abc
+import copy
 import datetime
+import functools
 import itertools
 import json
 import logging
 import os.path
-import pprint
 
 import numpy as np
 
@@ -21,11 +22,15 @@ from typing import Any, Iterable
 
 from ..clipnflip import clipnflip
 from .filters import Filter, InstrumentFilter, ModeFilter, NightFilter, ObjectFilter
-from ..util import ConfigurationError
+from ..util import ConfigurationError, LazyPformat, read_header_fast
 from .. import colour as c
 
 logger = logging.getLogger(__name__)
 
+# Data files distributed with PyReduce
+WAVECAL_DIR = Path(__file__).resolve().parents[1] / "wavecal"
+MASK_DIR = Path(__file__).resolve().parents[1] / "masks"
+
 
 def find_first_index(arr, value):
     """find the first element equal to value in the array arr"""
@@ -62,14 +67,38 @@ def observation_date_to_night(observation_date: datetime.date | None) -> datetim
         return observation_date.date()
 
 
+@functools.lru_cache(maxsize=32)
+def _scan_dir(input_dir: Path,
+              mtime_ns: int,
+              keys: tuple[str, ...] | None) -> tuple[tuple[Path, fits.Header | dict[str, Any]], ...]:
+    """Read the primary headers of all FITS files in a directory
+
+    The modification time of the directory is part of the cache key,
+    so that adding or removing files invalidates the cached scan.
+    """
+    logger.debug(f"Scanning {c.path(input_dir)} for FITS files")
+    return tuple((f, read_header_fast(f, keys)) for f in tqdm(Instrument.find_files(input_dir)))
+
+
+def get_mode_index(info: dict[str, Any]) -> dict[str, int]:
+    """Map the (uppercase) name of each instrument mode to its position in info["modes"]"""
+    index = {}
+    for i, mode in enumerate(info.get("modes", [])):
+        # Keep the first occurrence, like find_first_index
+        index.setdefault(mode.upper(), i)
+    return index
+
+
 class HeaderGetter:
     """Get data from a header/dict, based on the given mode, and applies replacements"""
 
-    def __init__(self, header: fits.Header, info, mode):
+    def __init__(self, header: fits.Header, info, mode, mode_index: dict[str, int] = None):
         self.header = header
         self.info = info.copy()
+        if mode_index is None:
+            mode_index = get_mode_index(info)
         try:
-            self.index = find_first_index(info["modes"], mode.upper())
+            self.index = mode_index[mode.upper()]
         except KeyError:
             logger.warning("No instrument modes found in instrument info")
             self.index = 0
@@ -79,9 +108,26 @@ class HeaderGetter:
             if isinstance(v, list):
                 self.info[k] = v[self.index]
 
+        # Fill in the placeholders once, instead of on every call to get
+        self._values = {}
+        for k, v in self.info.items():
+            if isinstance(v, str):
+                try:
+                    v = v.format(**self.info)
+                except (KeyError, IndexError, ValueError):
+                    # Leave it to get, which raises the error if the value is ever used
+                    continue
+            self._values[k] = v
+
     def __call__(self, key: str, default: Any = None):
         return self.get(key, default)
 
+    def with_header(self, header: fits.Header) -> "HeaderGetter":
+        """Get a copy of this getter that reads from a different header, reusing the mode specific values"""
+        getter = copy.copy(self)
+        getter.header = header
+        return getter
+
     def get(self, key: str, default: Any = None):
         """Get data
 
@@ -98,11 +144,13 @@ class HeaderGetter:
             value found in header (or alternatively alt)
         """
 
-        value = self.info.get(key, key)
-        # if isinstance(value, list):
-        #     value = value[self.index]
+        try:
+            value = self._values[key]
+        except KeyError:
+            value = self.info.get(key, key)
+            if isinstance(value, str):
+                value = value.format(**self.info)
         if isinstance(value, str):
-            value = value.format(**self.info)
             value = self.header.get(value, default)
         return value
 
@@ -118,6 +166,10 @@ class Instrument(metaclass=abc.ABCMeta):
         self.name: str = self.__class__.__name__.lower()
         # Information about the instrument
         self.info: dict[str, Any] = self.load_info()
+        # Position of each mode in the per-mode lists of self.info
+        self._mode_index: dict[str, int] = get_mode_index(self.info)
+        # HeaderGetter for each mode, with the mode specific values already resolved
+        self._header_getters: dict[str, HeaderGetter] = {}
 
         self.filters = {
             "instrument": InstrumentFilter(self.info["instrument"], regex=True),
@@ -152,20 +204,40 @@ class Instrument(metaclass=abc.ABCMeta):
     def __str__(self):
         return self.name
 
+    @functools.cached_property
+    def supported_modes(self) -> tuple[str, ...]:
+        """Modes supported by this instrument, see `get_supported_modes`. Only determined once per instance"""
+        return tuple(self.get_supported_modes())
+
     def get(self,
             key: str,
             header: fits.Header,
             mode: str,
             default: Any = None):
-        get = HeaderGetter(header, self.info, mode)
+        get = self.header_getter(header, mode)
         return get(key, default=default)
 
+    def header_getter(self, header: fits.Header, mode: str) -> HeaderGetter:
+        """Get a HeaderGetter for the given header and mode
+
+        The mode specific values are only resolved on the first call for each mode
+        """
+        try:
+            getter = self._header_getters[mode]
+        except KeyError:
+            getter = HeaderGetter(None, self.info, mode, self._mode_index)
+            self._header_getters[mode] = getter
+        return getter.with_header(header)
+
     def get_extension(self, header, mode):
         mode = mode.upper()
         extension = self.info.get("extension", 0)
 
         if isinstance(extension, list):
-            imode = find_first_index(self.info["modes"], mode)
+            try:
+                imode = self._mode_index[mode]
+            except KeyError:
+                raise KeyError("Value %s not found" % mode)
             extension = extension[imode]
 
         return extension
@@ -175,6 +247,8 @@ class Instrument(metaclass=abc.ABCMeta):
         Load static instrument information
         Either as fits header keywords or static values
 
+        This reads the instrument file from disk, use the already loaded `self.info` instead
+
         Returns
         ------
         info : dict(str:object)
@@ -259,7 +333,7 @@ class Instrument(metaclass=abc.ABCMeta):
             data = clipnflip(hdu[extension].data, header)
 
             if dtype is not None:
-                logger.debug(f"Forcing dtype to {c.over(dtype.__name__)}")
+                logger.debug(f"Forcing dtype to {c.over(np.dtype(dtype).name)}")
                 data = data.astype(dtype)
 
             data = np.ma.masked_array(data, mask=mask)
@@ -284,8 +358,8 @@ class Instrument(metaclass=abc.ABCMeta):
             header with added information
         """
 
-        info = self.load_info()
-        get = HeaderGetter(header, info, mode)
+        info = self.info
+        get = self.header_getter(header, mode)
 
         header["e_instrument"] = get("instrument", self.name.upper())
         header["e_telescope"] = get("telescope", "")
@@ -360,78 +434,86 @@ class Instrument(metaclass=abc.ABCMeta):
         return list(itertools.chain(input_dir.glob("*.fits"),
                                     input_dir.glob("*.fits.gz")))
 
+    @staticmethod
+    def scan_dir(input_dir: Path,
+                 keys: Iterable[str] = None) -> tuple[tuple[Path, fits.Header | dict[str, Any]], ...]:
+        """Find FITS files in the given folder and read their primary headers
+
+        The result is cached, so that classifying the same directory for several
+        targets, nights or modes only reads the headers once.
+
+        Parameters
+        ----------
+        input_dir : Path
+            directory to look for fits and fits.gz files in
+        keys : Iterable[str], optional
+            header keywords to read, if None the full headers are read (default: None)
+
+        Returns
+        -------
+        scan : tuple((Path, fits.Header | dict))
+            pairs of filename and primary header, see `util.read_header_fast`
+        """
+        input_dir = input_dir.resolve()
+        if keys is not None:
+            keys = tuple(sorted(set(keys)))
+        try:
+            mtime_ns = input_dir.stat().st_mtime_ns
+        except OSError:
+            # Missing directory, or one containing wildcards
+            return tuple((f, read_header_fast(f, keys)) for f in Instrument.find_files(input_dir))
+        return _scan_dir(input_dir, mtime_ns, keys)
+
+    def header_keys(self) -> list[str] | None:
+        """Header keywords needed to classify files with `self.filters`, None if the full header is needed"""
+        keys = []
+        for fil in self.filters.values():
+            if (keywords := fil.keywords) is None:
+                return None
+            keys += keywords
+        return keys
+
     def get_expected_values(self,
                             target: str,
                             night: datetime.date,
                             *args, **kwargs) -> dict[str, dict]:
+        # Filter that identifies the files of each calibration step
+        calibrations = {
+            "bias": "bias",
+            "flat": "flat",
+            "orders": "orders",
+            "scatter": "scatter",
+            "curvature": "curvature",
+            "wavecal_master": "wave",
+            "freq_comb_master": "comb",
+        }
         expectations = {
-            "bias": {
-                "instrument": self.info["id_instrument"],
-                "night": night,
-                "bias": self.info["id_bias"],
-            },
-            "flat": {
-                "instrument": self.info["id_instrument"],
-                "night": night,
-                "flat": self.info["id_flat"],
-            },
-            "orders": {
-                "instrument": self.info["id_instrument"],
-                "night": night,
-                "orders": self.info["id_orders"],
-            },
-            "scatter": {
-                "instrument": self.info["id_instrument"],
-                "night": night,
-                "scatter": self.info["id_scatter"],
-            },
-            "curvature": {
-                "instrument": self.info["id_instrument"],
-                "night": night,
-                "curvature": self.info["id_curvature"],
-            },
-            "wavecal_master": {
-                "instrument": self.info["id_instrument"],
-                "night": night,
-                "wave": self.info["id_wave"],
-            },
-            "freq_comb_master": {
-                "instrument": self.info["id_instrument"],
-                "night": night,
-                "comb": self.info["id_comb"],
-            },
-            "science": {
+            step: {
                 "instrument": self.info["id_instrument"],
                 "night": night,
-                "target": target,
-                "spec": self.info["id_spec"],
-            },
+                kind: self.info[f"id_{kind}"],
+            } for step, kind in calibrations.items()
         }
-
-        # TODO: Compressed, DRY version of the dict above (which can be removed afterwards)
-        better_expectations = {
-            key: {
-                "instrument": self.info["id_instrument"],
-                "night": night,
-                key: self.info[f"id_{key}"],
-            } for key in ["bias", "flat", "orders", "scatter", "curvature"]
-        } | {
-            key: {
-                "instrument": self.info["id_instrument"],
-                "night": night,
-                "target": target,
-                "spec": self.info["id_spec"],
-            } for key in ["science"]
+        expectations["science"] = {
+            "instrument": self.info["id_instrument"],
+            "night": night,
+            "target": target,
+            "spec": self.info["id_spec"],
         }
         return expectations
 
-    def populate_filters(self, files: Iterable[Path]) -> dict[str, Filter]:
+    def populate_filters(self,
+                         files: Iterable[Path],
+                         headers: Iterable[fits.Header] = None) -> dict[str, Filter]:
         """Extract values from the fits headers and store them in `self.filters`
 
         Parameters
         ----------
         files : list(str)
             list of fits files
+        headers : list(fits.Header), optional
+            primary headers of `files`, or the keywords used by the filters, if already known.
+            Otherwise they are read from the files
 
         Returns
         -------
@@ -444,9 +526,11 @@ class Instrument(metaclass=abc.ABCMeta):
 
         logger.debug(f"Populating filters")
 
-        for f in tqdm(files):
-            h = fits.open(f)[0].header
+        if headers is None:
+            keys = self.header_keys()
+            headers = (read_header_fast(f, keys) for f in tqdm(files))
 
+        for h in headers:
             for _, fil in self.filters.items():
                 fil.collect(h)
 
@@ -456,7 +540,8 @@ class Instrument(metaclass=abc.ABCMeta):
                       files: list[Path],
                       expected: dict[str, dict],
                       *,
-                      allow_calibration_only=False):
+                      allow_calibration_only=False,
+                      headers: list[fits.Header] = None):
         """
         Determine the relevant files for a given set of expected values.
 
@@ -468,6 +553,8 @@ class Instrument(metaclass=abc.ABCMeta):
             dictionary with expected header values for each reduction step
         allow_calibration_only : bool
             TODO: what does this do?
+        headers : list(fits.Header), optional
+            primary headers of `files`, if already known
 
         Returns
         -------
@@ -476,12 +563,13 @@ class Instrument(metaclass=abc.ABCMeta):
             and the second are the files for each step.
         """
         logger.trace(f"Filtering files")
-        for file in files:
-            logger.trace(f"\t{c.path(file)}")
-        logger.trace(f"for expected header values\n{pprint.pformat(expected)}")
+        if logger.isEnabledFor(logging.TRACE):
+            for file in files:
+                logger.trace(f"\t{c.path(file)}")
+        logger.trace("for expected header values\n%s", LazyPformat(expected))
 
         # Fill the filters with header information
-        self.populate_filters(files)
+        self.populate_filters(files, headers)
 
         # Use the header information determined in populate filters
         # to find potential science and calibration files in the list of files
@@ -617,9 +705,11 @@ class Instrument(metaclass=abc.ABCMeta):
         input_dir = Path(input_dir_template.format(target=target,
                                                    night=night.isoformat(),
                                                    instrument=self.name, **kwargs))
-        files = self.find_files(input_dir)
+        scan = self.scan_dir(input_dir, self.header_keys())
+        files = [f for f, _ in scan]
+        headers = [h for _, h in scan]
         ev = self.get_expected_values(target, night, *args, **kwargs)
-        files = self.apply_filters(files, ev, allow_calibration_only=allow_calibration_only)
+        files = self.apply_filters(files, ev, allow_calibration_only=allow_calibration_only, headers=headers)
         return files
 
     def get_wavecal_filename(self, header, mode, **kwargs):
@@ -638,18 +728,18 @@ class Instrument(metaclass=abc.ABCMeta):
             name of the wavelength solution file
         """
 
-        info = self.load_info()
+        info = self.info
         specifier = header.get(info.get("wavecal_specifier", ""), "")
         instrument = "wavecal"
 
-        return Path(__file__).parents[1] / "wavecal" / f"{instrument}_{mode}_{specifier}.npz"
+        return WAVECAL_DIR / f"{instrument}_{mode}_{specifier}.npz"
 
     def get_supported_modes(self):
-        info = self.load_info()
+        info = self.info
         return info["modes"]
 
     def get_mask_filename(self, mode, **kwargs) -> Path:
-        return Path(__file__).parents[2] / "masks" / f"mask_{self.name.lower()}_{mode.lower()}.fits.gz"
+        return MASK_DIR / f"mask_{self.name}_{mode.lower()}.fits.gz"
 
     def get_wavelength_range(self, header, mode, **kwargs):
         return self.get("wavelength_range", header, mode)
@@ -684,7 +774,10 @@ class InstrumentWithModes(Instrument):
 
 
 class COMMON(Instrument):
-    pass
+    def load_info(self) -> dict[str, Any]:
+        # The defaults are stored next to this module, not in their own subpackage
+        with open(Path(__file__).parent / "common.json") as f:
+            return json.load(f)
 
 
 def create_custom_instrument(name, *,
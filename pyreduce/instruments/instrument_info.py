@@ -4,44 +4,60 @@ The actual info is contained in the instruments/{name}.py modules/classes, which
 """
 
 import datetime
-import importlib
+import functools
 
 from pathlib import Path
 from astropy.io import fits
 from typing import Any
 
 from .instrument import Instrument
+from .. import instruments
+
+
+@functools.lru_cache(maxsize=None)
+def _resolve_instrument_class(instrument_name: str) -> type[Instrument]:
+    """Get the class of the instrument, only the first call for each name does any work"""
+    return instruments.get_instrument_class(instrument_name)
+
+
+@functools.lru_cache(maxsize=None)
+def _load_instrument(instrument_name: str) -> Instrument:
+    return _resolve_instrument_class(instrument_name)()
 
 
 def load_instrument(instrument_name: str | None = None) -> Instrument:
     """
     Load a Python instrument module
 
+    The instrument is only created once for each name, later calls return the same instance
+
     Parameters
     ----------
     instrument_name : str
-        name of the instrument
+        name of the instrument, in any case
 
     Returns
     -------
     instrument : Instrument
         Instance of the {instrument} class
     """
-
-    # TODO: Loading arbitrary modules is most definitely bad style
     if instrument_name is None:
         instrument_name = "common"
 
-    fname = f".instruments.{instrument_name.lower()}.{instrument_name.lower()}"
-    lib = importlib.import_module(fname, package="pyreduce")
-    instrument_class = getattr(lib, instrument_name, instrument_name.upper())
-    return instrument_class()
+    return _load_instrument(instrument_name.upper())
+
+
+def _as_instrument(instrument: str | Instrument | None) -> Instrument:
+    """Use the given Instrument as is, or load it by name"""
+    if isinstance(instrument, Instrument):
+        return instrument
+    return load_instrument(instrument)
 
 
 def sort_files(input_dir_template: str,
                target: str,
                night: datetime.date | None,
-               instrument: str,
+               instrument: str | Instrument,
                mode: str,
                **kwargs):
     """Sort a list of files into different categories and discard files that are not used
@@ -54,8 +70,8 @@ def sort_files(input_dir_template: str,
         observation target name, as found in the files
     night : str
         observation night of interest, as found in the files
-    instrument : str
-        instrument name
+    instrument : str, Instrument
+        instrument name, or the instrument itself
     mode : str
         instrument mode, if applicable (e.g. red/blue for HARPS)
 
@@ -73,24 +89,29 @@ def sort_files(input_dir_template: str,
         list of science files, i.e. observations
     """
 
-    instrument = load_instrument(instrument)
+    instrument = _as_instrument(instrument)
     return instrument.classify_files(input_dir_template, target, night, mode, **kwargs)
 
 
-def get_supported_modes(instrument):
-    instrument = load_instrument(instrument)
-    return instrument.get_supported_modes()
+def get_supported_modes(instrument: str | Instrument) -> list[str]:
+    """Modes of the instrument
+
+    Instruments are only created once per name and determine their modes only once,
+    so repeated queries do not repeat any work
+    """
+    instrument = _as_instrument(instrument)
+    return list(instrument.supported_modes)
 
 
-def modeinfo(header: fits.Header, instrument: Instrument, mode: str, **kwargs) -> fits.Header:
+def modeinfo(header: fits.Header, instrument: str | Instrument, mode: str, **kwargs) -> fits.Header:
     """Add instrument specific information to a header/dict
 
     Parameters
     ----------
     header : fits.header, dict
         header to add information to
-    instrument : str
-        instrument name
+    instrument : str, Instrument
+        instrument name, or the instrument itself
     mode : str
         instrument mode (e.g. red/blue for HARPS)
 
@@ -100,7 +121,7 @@ def modeinfo(header: fits.Header, instrument: Instrument, mode: str, **kwargs) -
         header with added information
     """
 
-    instrument = load_instrument(instrument)
+    instrument = _as_instrument(instrument)
     header = instrument.add_header_info(header, mode, **kwargs)
     return header
 
@@ -112,8 +133,8 @@ def get_wavecal_filename(header, instrument, mode, **kwargs):
     ----------
     header : fits.header, dict
         header of the wavelength calibration file
-    instrument : str
-        instrument name
+    instrument : str, Instrument
+        instrument name, or the instrument itself
     mode : str
         instrument mode (e.g. red/blue for HARPS)
 
@@ -123,5 +144,5 @@ def get_wavecal_filename(header, instrument, mode, **kwargs):
         wavelength solution file
     """
 
-    instrument = load_instrument(instrument)
+    instrument = _as_instrument(instrument)
     return instrument.get_wavecal_filename(header, mode, **kwargs)
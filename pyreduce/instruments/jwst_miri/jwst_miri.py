@@ -5,13 +5,12 @@ Handles instrument specific info for the HARPS spectrograph
 Mostly reading data from the header
 """
 import logging
-import os.path
 
 import numpy as np
 from astropy.io import fits
 from dateutil import parser
 
-from pyreduce.instruments.instrument import Instrument, HeaderGetter, observation_date_to_night
+from pyreduce.instruments.instrument import Instrument, HeaderGetter, observation_date_to_night, WAVECAL_DIR
 
 logger = logging.getLogger(__name__)
 
@@ -22,12 +21,8 @@ class JWST_MIRI(Instrument):
         # "Normal" stuff is handled by the general version, specific changes to values happen here
         # alternatively you can implement all of it here, whatever works
         header = super().add_header_info(header, mode)
-        info = self.load_info()
         return header
 
     def get_wavecal_filename(self, header, mode, **kwargs):
         """Get the filename of the wavelength calibration config file"""
-        cwd = os.path.dirname(__file__)
-        fname = "{instrument}_{mode}_2D.npz".format(instrument="harps", mode=mode)
-        fname = os.path.join(cwd, "..", "wavecal", fname)
-        return fname
+        return WAVECAL_DIR / f"harps_{mode}_2D.npz"
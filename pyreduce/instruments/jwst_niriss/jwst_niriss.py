@@ -13,7 +13,7 @@ from astropy.io import fits
 from astropy.time import Time
 from dateutil import parser
 
-from pyreduce.instruments.instrument import Instrument, HeaderGetter, observation_date_to_night
+from pyreduce.instruments.instrument import Instrument, HeaderGetter, observation_date_to_night, WAVECAL_DIR
 
 logger = logging.getLogger(__name__)
 
@@ -24,7 +24,6 @@ class JWST_NIRISS(Instrument):
         # "Normal" stuff is handled by the general version, specific changes to values happen here
         # alternatively you can implement all of it here, whatever works
         header = super().add_header_info(header, mode)
-        info = self.load_info()
 
         # TODO: this references some files, I dont know where they should be
         header["e_gain"] = 1.61
@@ -93,7 +92,4 @@ class JWST_NIRISS(Instrument):
 
     def get_wavecal_filename(self, header, mode, **kwargs):
         """Get the filename of the wavelength calibration config file"""
-        cwd = os.path.dirname(__file__)
-        fname = "{instrument}_{mode}_2D.npz".format(instrument="harps", mode=mode)
-        fname = os.path.join(cwd, "..", "wavecal", fname)
-        return fname
+        return WAVECAL_DIR / f"harps_{mode}_2D.npz"
@@ -5,14 +5,13 @@ Handles instrument specific info for the HARPS spectrograph
 Mostly reading data from the header
 """
 import logging
-import os.path
 
 import numpy as np
 from astropy.coordinates import EarthLocation
 from astropy.io import fits
 from dateutil import parser
 
-from pyreduce.instruments.instrument import Instrument, HeaderGetter, observation_date_to_night
+from pyreduce.instruments.instrument import Instrument, HeaderGetter, observation_date_to_night, WAVECAL_DIR
 
 logger = logging.getLogger(__name__)
 
@@ -23,7 +22,6 @@ class LICK_APF(Instrument):
         # "Normal" stuff is handled by the general version, specific changes to values happen here
         # alternatively you can implement all of it here, whatever works
         header = super().add_header_info(header, mode)
-        info = self.load_info()
 
         # pos = EarthLocation.of_site("Lick Observatory")
         # header["e_obslon"] = pos.lon.to_value("deg")
@@ -34,7 +32,4 @@ class LICK_APF(Instrument):
 
     def get_wavecal_filename(self, header, mode, **kwargs):
         """Get the filename of the wavelength calibration config file"""
-        cwd = os.path.dirname(__file__)
-        fname = "lick_apf_2D.npz"
-        fname = os.path.join(cwd, "..", "wavecal", fname)
-        return fname
+        return WAVECAL_DIR / "lick_apf_2D.npz"
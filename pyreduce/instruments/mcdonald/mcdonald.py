@@ -6,12 +6,11 @@ Mostly reading data from the header
 """
 import logging
 import numpy as np
-import os
 import re
 
 from astropy.time import Time
 
-from pyreduce.instruments.instrument import InstrumentWithModes, HeaderGetter
+from pyreduce.instruments.instrument import InstrumentWithModes, WAVECAL_DIR, MASK_DIR
 
 logger = logging.getLogger(__name__)
 
@@ -35,8 +34,8 @@ class MCDONALD(InstrumentWithModes):
         # alternatively you can implement all of it here, whatever works
 
         header = super().add_header_info(header, mode, **kwargs)
-        info = self.load_info()
-        get = HeaderGetter(header, info, mode)
+        info = self.info
+        get = self.header_getter(header, mode)
 
         header["e_orient"] = get("orientation", 0)
         # As per IDL rotate if orient is 4 or larger and transpose is undefined
@@ -113,13 +112,7 @@ class MCDONALD(InstrumentWithModes):
 
     def get_wavecal_filename(self, header, mode, **kwargs):
         """Get the filename of the wavelength calibration config file"""
-        cwd = os.path.dirname(__file__)
-        fname = "mcdonald.npz"
-        fname = os.path.join(cwd, "..", "wavecal", fname)
-        return fname
+        return WAVECAL_DIR / "mcdonald.npz"
 
     def get_mask_filename(self, mode, **kwargs):
-        fname = "mask_mcdonald.fits.gz"
-        cwd = os.path.dirname(__file__)
-        fname = os.path.join(cwd, "..", "masks", fname)
-        return fname
+        return MASK_DIR / "mask_mcdonald.fits.gz"
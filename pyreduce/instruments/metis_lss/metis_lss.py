@@ -5,9 +5,7 @@ Mostly reading data from the header
 """
 import logging
 
-from pathlib import Path
-
-from pyreduce.instruments.instrument import InstrumentWithModes
+from pyreduce.instruments.instrument import InstrumentWithModes, WAVECAL_DIR
 
 logger = logging.getLogger(__name__)
 
@@ -34,4 +32,4 @@ class METIS_LSS(InstrumentWithModes):
 
     def get_wavecal_filename(self, header, mode, **kwargs):
         """ Get the filename of the wavelength calibration config file """
-        return Path(__file__).parents[1] / "wavecal" / f"metis_{mode.lower()}_2D.npz"
+        return WAVECAL_DIR / f"metis_{mode.lower()}_2D.npz"
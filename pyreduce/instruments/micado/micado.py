@@ -5,9 +5,7 @@ Mostly reading data from the header
 """
 import logging
 
-from pathlib import Path
-
-from pyreduce.instruments.instrument import Instrument
+from pyreduce.instruments.instrument import Instrument, WAVECAL_DIR
 
 logger = logging.getLogger(__name__)
 
@@ -34,4 +32,4 @@ class MICADO(Instrument):
 
     def get_wavecal_filename(self, header, mode, **kwargs):
         """ Get the filename of the wavelength calibration config file """
-        return Path(__file__).parents[1] / 'wavecal' / f"MICADO_HK_3arcsec_chip5.npz"
+        return WAVECAL_DIR / "MICADO_HK_3arcsec_chip5.npz"
@@ -13,10 +13,9 @@ import numpy as np
 from astropy.coordinates import EarthLocation
 from astropy.io import fits
 from dateutil import parser
-from pathlib import Path
 from tqdm import tqdm
 
-from pyreduce.instruments.instrument import Instrument, HeaderGetter, observation_date_to_night
+from pyreduce.instruments.instrument import Instrument, HeaderGetter, observation_date_to_night, WAVECAL_DIR
 
 logger = logging.getLogger(__name__)
 
@@ -81,7 +80,7 @@ class NIRSPEC(Instrument):
 
         # TODO allow several names for the target?
 
-        info = self.load_info()
+        info = self.info
         target = target.casefold()
         instrument = self.__class__.__name__
 
@@ -193,7 +192,7 @@ class NIRSPEC(Instrument):
 
     def get_wavecal_filename(self, header, mode, **kwargs):
         """Get the filename of the wavelength calibration config file"""
-        info = self.load_info()
+        info = self.info
         if header[info["id_neon"]] == 1:
             element = "neon"
         elif header[info["id_argon"]] == 1:
@@ -207,4 +206,4 @@ class NIRSPEC(Instrument):
 
         echelle_setting = "K2"
 
-        return Path(__file__).parents[1] / "wavecal" / f"nirspec_{echelle_setting}.npz"
+        return WAVECAL_DIR / f"nirspec_{echelle_setting}.npz"
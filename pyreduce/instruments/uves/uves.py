@@ -9,7 +9,7 @@ import os.path
 from astropy.io import fits
 from pathlib import Path
 
-from pyreduce.instruments.instrument import Instrument
+from pyreduce.instruments.instrument import Instrument, WAVECAL_DIR, MASK_DIR
 
 logger = logging.getLogger(__name__)
 
@@ -21,17 +21,17 @@ class UVES(Instrument):
         # alternatively you can implement all of it here, whatever works
         header = super().add_header_info(header, mode)
 
-        header["e_ra"] /= 15
-        if header["e_jd"] is not None:
-            header["e_jd"] += header["e_exptime"] / (7200 * 24) + 0.5
+        header["e_ra"] = header["e_ra"] / 15
+        if (jd := header["e_jd"]) is not None:
+            header["e_jd"] = jd + header["e_exptime"] / (7200 * 24) + 0.5
 
         return header
 
     def get_wavecal_filename(self, header: fits.Header, mode: str, **kwargs) -> Path:
         """Get the filename of the wavelength calibration config file"""
-        info = self.load_info()
+        info = self.info
         specifier = int(header[info["wavecal_specifier"]])
-        return Path(__file__).parents[2] / "wavecal" / f"{self.name}_{mode.lower()}_{specifier}nm_2D.npz"
+        return WAVECAL_DIR / f"{self.name}_{mode.lower()}_{specifier}nm_2D.npz"
 
     def get_mask_filename(self, mode: str, **kwargs) -> Path:
-        return Path(__file__).parents[2] / "masks" / f"mask_{self.name.lower()}_{mode.lower()}.fits.gz"
+        return MASK_DIR / f"mask_{self.name}_{mode.lower()}.fits.gz"
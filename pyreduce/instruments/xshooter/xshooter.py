@@ -5,13 +5,12 @@ Handles instrument specific info for the UVES spectrograph
 Mostly reading data from the header
 """
 import logging
-import os.path
 
 import numpy as np
 from astropy.io import fits
 from dateutil import parser
 
-from pyreduce.instruments.instrument import InstrumentWithModes, HeaderGetter, observation_date_to_night
+from pyreduce.instruments.instrument import InstrumentWithModes, HeaderGetter, observation_date_to_night, WAVECAL_DIR
 
 logger = logging.getLogger(__name__)
 
@@ -35,9 +34,4 @@ class XSHOOTER(InstrumentWithModes):
 
     def get_wavecal_filename(self, header, mode, **kwargs):
         """Get the filename of the wavelength calibration config file"""
-        info = self.load_info()
-
-        cwd = os.path.dirname(__file__)
-        fname = f"xshooter_{mode.lower()}.npz"
-        fname = os.path.join(cwd, "..", "wavecal", fname)
-        return fname
+        return WAVECAL_DIR / f"xshooter_{mode.lower()}.npz"
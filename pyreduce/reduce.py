@@ -18,18 +18,18 @@ License
 
 """
 
+import concurrent.futures
 import datetime
+import functools
 import logging
 import itertools
 import os
-import numpy as np
-import pprint
 
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable
 
 # PyReduce subpackages
-from . import __version__, instruments, util
+from . import __version__, util
 from .configuration import load_config
 from .instruments.instrument import Instrument
 from .instruments.instrument_info import load_instrument
@@ -44,19 +44,31 @@ from . import colour as c
 logger = logging.getLogger(__name__)
 
 
-def main(instrument_name: str,
+def _as_list(value: Any, scalar_types: type | tuple[type, ...] = str) -> list:
+    """Wrap a single value (or None) in a length-1 list, other iterables are converted to a list"""
+    if value is None or isinstance(value, scalar_types):
+        return [value]
+    return list(value)
+
+
+def main(instrument: str | Instrument,
          target: str | list[str] = None,
          night: datetime.date | list[datetime.date] | None = None,
          modes: str | list[str] | dict[Instrument, str] = None,
          *,
          steps: str | list[str] = "all",
-         base_dir_template: str = None,
-         input_dir_template: str = None,
-         output_dir_template: str = None,
+         base_dir_template: str | Path = None,
+         input_dir_template: str | Path = None,
+         output_dir_template: str | Path = None,
          configuration: dict[str, Any] = None,
          order_range: tuple[int, int] = None,
          allow_calibration_only: bool = False,
-         skip_existing: bool = False):  # until converted to a class
+         skip_existing: bool = False,
+         num_workers: int = 1,
+         parallel_steps: bool = False,
+         memoize: bool = False,
+         on_result: Callable[[str, datetime.date, str, dict], Any] = None,
+         debug: bool = False):  # until converted to a class
     r"""
     Main entry point for REDUCE scripts,
     default values can be changed as required if reduce is used as a script
@@ -64,8 +76,8 @@ def main(instrument_name: str,
 
     Parameters
     ----------
-    instrument_name : str, list[str]
-        instrument used for the observation (e.g. UVES, HARPS)
+    instrument : str, Instrument
+        instrument used for the observation, either its name (e.g. UVES, HARPS) or an already loaded Instrument
     target : str, list[str]
         the observed star, as named in the folder structure/fits headers
     night : str, list[str]
@@ -79,51 +91,51 @@ def main(instrument_name: str,
         the possible steps are: "bias", "flat", "orders", "norm_flat", "wavecal", "science"
         alternatively set steps to "all", which is equivalent to setting all steps
         Note that the later steps require the previous intermediary products to exist and raise an exception otherwise
-    base_dir_template : str, optional
+    base_dir_template : str, Path, optional
         base data directory that Reduce should work in, is prefixed on input_dir and output_dir
         (default: use settings_pyreduce.json)
-    input_dir_template : str, optional
+    input_dir_template : str, Path, optional
         input directory containing raw files. Can contain placeholders {instrument}, {target}, {night}, {mode}
         as well as wildcards. If relative will use base_dir as root (default: use settings_pyreduce.json)
-    output_dir_template : str, optional
+    output_dir_template : str, Path, optional
         output directory for intermediary and final results.
         Can contain placeholders {instrument}, {target}, {night}, {mode}, but no wildcards.
         If relative will use base_dir as root (default: use settings_pyreduce.json)
     configuration : dict[str:obj], str, list[str], dict[{instrument}:dict,str], optional
         configuration file for the current run, contains parameters for different parts of reduce.
         Can be a path to a json file, or a dict with configurations for the different instruments.
-        When a list, the order must be the same as instruments (default: settings_{instrument.upper()}.json)
-    debug: bool
-        Show debugging info and set logger level accordingly
+        When a list, the order must be the same as instruments (default: settings_{instrument.upper()}.json).
+        Json files are only read and validated again once they have been modified
+    num_workers : int, optional
+        number of processes that reduce different targets, nights and modes in parallel.
+        Each process logs to its own file (default: 1, i.e. no parallelisation)
+    parallel_steps : bool, optional
+        run the steps of each reduction that do not depend on each other in parallel threads.
+        Not safe together with plotting (default: False)
+    memoize : bool, optional
+        store the result of each step, and reuse it while the settings and input files of the step
+        and its dependencies are unchanged, see `Reducer.run_memoized` (default: False)
+    on_result : callable, optional
+        called as on_result(target, night, mode, data) with the data of each reduction, e.g. to save or summarise it.
+        Its return value is collected in the output instead of the data, which can then be freed.
+        Must be picklable if num_workers > 1 (default: None, i.e. return all data)
+    debug : bool, optional
+        Show debugging info and set logger level accordingly (default: False)
     """
+    if debug:
+        logging.getLogger(__package__).setLevel(logging.DEBUG)
 
     logger.debug(f"Running reduction for target {c.name(target)} on nights {c.name(night)}")
 
-    # If there is a single target, create a length-1 list from it
-    if isinstance(target, str) or target is None:
-        targets = [target]
-    else:
-        targets = target
-
-    # If there is a single night, create a length-1 list from it
-    if night is None:
-        nights = [None]
-    elif isinstance(night, datetime.date):
-        nights = [night]
-    elif isinstance(night, list):
-        for n in night:
-            if not isinstance(n, datetime.date):
-                raise TypeError(f"All nights must be instances of `datetime.date`")
-        nights = night
-    else:
-        raise TypeError(f"Parameter 'night' must be an instance of `datetime.date` or a list thereof")
-
-    is_none = {
-        "modes": modes is None,
-        "base_dir": base_dir_template is None,
-        "input_dir": input_dir_template is None,
-        "output_dir": output_dir_template is None,
-    }
+    # If there is a single target or night, create a length-1 list from it
+    targets = _as_list(target, str)
+    try:
+        nights = _as_list(night, datetime.date)
+    except TypeError:
+        raise TypeError(f"Parameter 'night' must be an instance of `datetime.date` or a list thereof") from None
+    if night is not None and not all(isinstance(n, datetime.date) for n in nights):
+        raise TypeError(f"All nights must be instances of `datetime.date`")
+
     output = []
 
     # Loop over everything
@@ -132,9 +144,13 @@ def main(instrument_name: str,
     # config: paramters for the current reduction
     # info: constant, instrument specific parameters
 
-    logger.trace(f"Current configuration is:\n{pprint.pformat(configuration)}")
+    logger.trace("Current configuration is:\n%s", util.LazyPformat(configuration))
 
-    instrument: Instrument = instruments.instrument_info.load_instrument(instrument_name)
+    if isinstance(instrument, str):
+        instrument_name = instrument
+        instrument = load_instrument(instrument_name)
+    else:
+        instrument_name = instrument.name.upper()
 
     config = load_config(configuration, instrument_name, 0)
     info = instrument.info
@@ -147,28 +163,92 @@ def main(instrument_name: str,
     if output_dir_template is None:
         output_dir_template = config["reduce"]["output_dir"]
 
-    input_dir_template: str = os.path.join(base_dir_template, input_dir_template)
+    # The templates stay strings, as their placeholders are only filled in later
+    base_dir_template = str(base_dir_template)
+    input_dir_template: str = str(Path(base_dir_template, input_dir_template))
     logger.debug(f"input_dir_template is {c.path(input_dir_template)}")
 
-    output_dir_template: str = os.path.join(base_dir_template, output_dir_template)
+    output_dir_template: str = str(Path(base_dir_template, output_dir_template))
     logger.debug(f"output_dir_template is {c.path(output_dir_template)}")
 
     if modes is None:
         modes = info["modes"]
-    if np.isscalar(modes):
-        modes = [modes]
+    modes = _as_list(modes, str)
+
+    # The instrument is the same for every iteration, so only bind it once
+    format_base_dir = functools.partial(base_dir_template.format, instrument=instrument.name)
 
     logger.debug(f"Running over a Cartesian product of "
                  f"targets {c.print_list(targets, c.name)} × "
                  f"nights {c.print_list(nights, c.name)} × "
                  f"modes {c.print_list(modes, c.name)}")
 
+    jobs = []
+    # The log file only depends on the target and mode, not on the night
+    log_files = {}
     for target, night, mode in itertools.product(targets, nights, modes):
         assert isinstance(night, datetime.date), f"Expected night to be a `datetime.date`, got {type(night)} instead"
+        if (target, mode) not in log_files:
+            log_files[target, mode] = Path(format_base_dir(mode=mode, target=target)) / "logs" / f"{target}.log"
+        jobs.append((target, night, mode, log_files[target, mode]))
+
+    logger.info(f"Reducing {len(jobs)} combination(s) of target, night and mode")
+
+    # Settings shared by all jobs
+    kwargs = dict(
+        steps=steps,
+        input_dir_template=input_dir_template,
+        output_dir_template=output_dir_template,
+        config=config,
+        order_range=order_range,
+        allow_calibration_only=allow_calibration_only,
+        skip_existing=skip_existing,
+        parallel_steps=parallel_steps,
+        memoize=memoize,
+        on_result=on_result,
+    )
+
+    if num_workers > 1 and len(jobs) > 1 and not _loadable_by_name(instrument):
+        logger.warning(f"Instrument {c.name(instrument.name)} can not be loaded by name in other processes, "
+                       f"reducing in this process only")
+        num_workers = 1
+
+    if num_workers > 1 and len(jobs) > 1:
+        # Each combination reduces different files into a different output directory,
+        # so they can run in separate processes. Results are collected in the original order.
+        # The workers get the instrument by name and load it themselves, instead of a pickled copy
+        max_workers = min(num_workers, len(jobs), os.cpu_count() or 1)
+        with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+            worker = functools.partial(_reduce_in_worker, instrument_name, **kwargs)
+            for data in executor.map(worker, *zip(*jobs)):
+                output += data
+    else:
+        for job in jobs:
+            output += _reduce(instrument, *job, **kwargs)
 
-        log_file = (Path(base_dir_template.format(instrument=instrument.name, mode=modes, target=target)) /
-                    "logs" / f"{target}.log")
-        util.start_logging(log_file)
+    return output
+
+
+def _reduce(instrument: Instrument,
+            target: str,
+            night: datetime.date,
+            mode: str,
+            log_file: Path,
+            *,
+            steps: str | list[str],
+            input_dir_template: str,
+            output_dir_template: str,
+            config: dict[str, Any],
+            order_range: tuple[int, int],
+            allow_calibration_only: bool,
+            skip_existing: bool,
+            parallel_steps: bool = False,
+            memoize: bool = False,
+            on_result: Callable[[str, datetime.date, str, dict], Any] | None = None) -> list:
+    """Classify the files of one target, night and mode and run the reduction for each of their settings"""
+    output = []
+
+    with util.logging_to(log_file):
         # find input files and sort them by type
         files = instrument.classify_files(input_dir_template, target, night,
                                           mode=mode,
@@ -178,32 +258,68 @@ def main(instrument_name: str,
             logger.warning(f"No files found for instrument {c.name(instrument.name)}, target: {c.name(target)}, "
                            f"night: {c.name(night)}, mode: {c.name(mode)} in directory {c.path(input_dir_template)}")
         else:
+            # Arguments of the Reducer that are the same for every set of files
+            reducer_kwargs = dict(
+                output_dir_template=output_dir_template,
+                instrument=instrument,
+                mode=mode,
+                config=config,
+                order_range=order_range,
+                skip_existing=skip_existing,
+                parallel_steps=parallel_steps,
+                memoize=memoize,
+            )
             for settings, filedict in files:
-                logger.info("Settings:")
-                for key, value in settings.items():
-                    logger.info(f"\t{c.param(key)}: {c.param(value)}")
+                logger.info("Settings:\n" + "\n".join(f"\t{c.param(key)}: {c.param(value)}"
+                                                      for key, value in settings.items()))
 
                 logger.info("Input files were classified")
-                for step, filelist in filedict.items():
-                    logger.debug(f"\t{c.name(step)}")
-                    for path in filelist:
-                        logger.debug(f"\t\t{c.path(path)}")
-
-                reducer = Reducer(
-                    filedict,
-                    output_dir_template,
-                    settings.get("target"),
-                    instrument,
-                    mode,
-                    settings.get("night"),
-                    config,
-                    order_range=order_range,
-                    skip_existing=skip_existing,
-                )
-                # try:
-                data = reducer.run_steps(steps=steps)
+                if logger.isEnabledFor(logging.DEBUG):
+                    lines = ["Files per step:"]
+                    for step, filelist in filedict.items():
+                        lines.append(f"\t{c.name(step)}")
+                        lines += [f"\t\t{c.path(path)}" for path in filelist]
+                    logger.debug("\n".join(lines))
+
+                existing = None
+                if skip_existing and (steps == "all" or "finalize" in steps):
+                    existing = Reducer.existing_outputs(filedict["science"], instrument, mode, settings.get("target"),
+                                                        settings.get("night"), output_dir_template, order_range, config)
+
+                if existing is not None and all(fname is not None for fname in existing):
+                    logger.info("All science files already exist, skipping this set")
+                    data = {"finalize": existing}
+                else:
+                    reducer = Reducer(filedict, target=settings.get("target"), night=settings.get("night"),
+                                      **reducer_kwargs)
+                    # try:
+                    data = reducer.run_steps(steps=steps)
+                    # except Exception as e:
+                    #     logger.error("Reduction failed with error message: %s", str(e))
+                    #     logger.info("------------")
+                    del reducer
+
+                if on_result is not None:
+                    # Only keep what the callback returns, so that the intermediate data can be freed
+                    data = on_result(target, night, mode, data)
                 output.append(data)
-                # except Exception as e:
-                #     logger.error("Reduction failed with error message: %s", str(e))
-                #     logger.info("------------")
     return output
+
+
+def _loadable_by_name(instrument: Instrument) -> bool:
+    """Whether load_instrument gives this instrument by its name, so that worker processes can load it themselves"""
+    try:
+        return load_instrument(instrument.name) is instrument
+    except ValueError:
+        return False
+
+
+def _reduce_in_worker(instrument_name: str,
+                      target: str,
+                      night: datetime.date,
+                      mode: str,
+                      log_file: Path,
+                      **kwargs) -> list:
+    """Run `_reduce` in a worker process, which loads the instrument by name and logs to its own file"""
+    log_file = log_file.with_name(f"{log_file.stem}.{os.getpid()}{log_file.suffix}")
+    return _reduce(load_instrument(instrument_name), target, night, mode, log_file, **kwargs)
@@ -1,25 +1,49 @@
+import bisect
+import concurrent.futures
+import contextlib
 import datetime
+import functools
+import hashlib
+import itertools
+import json
 import logging
 import os
-import glob
+import re
+import threading
+import time
 
 from pathlib import Path
-from typing import ClassVar
-from collections import OrderedDict
+
+import joblib
 
 from .instruments.instrument import Instrument
 from .instruments.instrument_info import load_instrument
-from .steps import (Step, ExtractionStep, CalibrationStep,
-                    Bias, Flat, Mask, OrderTracing, SlitCurvatureDetermination, Finalize, BackgroundScatter,
-                    NormalizeFlatField, RectifyImage, ScienceExtraction,
-                    ContinuumNormalization, LaserFrequencyCombMaster, LaserFrequencyCombFinalize,
-                    WavelengthCalibrationInitialize, WavelengthCalibrationMaster, WavelengthCalibrationFinalize)
+from . import steps as step_classes
+from .steps import Step
+from .steps.step import format_output_dir
+from . import util
 from . import colour as c
 
 logger = logging.getLogger(__name__)
 
+# Stands in for the number in the names of final output files, see Reducer.existing_outputs
+_number_marker = "\0"
+
 
 class Reducer:
+    # Only these attributes are set, so there is no need for a __dict__ on every instance
+    __slots__ = ("files", "output_dir", "data", "inputs", "config", "skip_existing", "parallel_steps", "memoize",
+                 "_step_configs", "_step_modules", "_step_keys", "_data_lock")
+
+    # Least recently used results are removed from the memo directory, once it grows larger than this
+    memo_max_bytes: int = 2 ** 30
+    # Whether memoized results are identified by the contents of the input files, instead of their modification time
+    memo_hash_contents: bool = False
+    # Run times of the steps in earlier runs, per instrument, so that run_parallel can start the longest chains of
+    # steps first. None to not record them
+    step_times_file: Path | None = (Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache"))
+                                    / "pyreduce" / "step_times.json")
+
     step_order: dict[str, int] = {
         "mask": 5,  # TODO: This was not here but I do not understand why, maybe Thomas can explain
         "bias": 10,
@@ -39,23 +63,25 @@ class Reducer:
         "finalize": 100,
     }
 
-    modules: OrderedDict[str, ClassVar] = {
-        "mask": Mask,
-        "bias": Bias,
-        "flat": Flat,
-        "orders": OrderTracing,
-        "curvature": SlitCurvatureDetermination,
-        "scatter": BackgroundScatter,
-        "norm_flat": NormalizeFlatField,
-        "wavecal_master": WavelengthCalibrationMaster,
-        "wavecal_init": WavelengthCalibrationInitialize,
-        "wavecal": WavelengthCalibrationFinalize,
-        "freq_comb_master": LaserFrequencyCombMaster,
-        "freq_comb": LaserFrequencyCombFinalize,
-        "rectify": RectifyImage,
-        "science": ScienceExtraction,
-        "continuum": ContinuumNormalization,
-        "finalize": Finalize,
+    # Step classes by name, only imported when they are first used, see module_class.
+    # Subclasses may also give the classes themselves
+    modules: dict[str, str | type[Step]] = {
+        "mask": "Mask",
+        "bias": "Bias",
+        "flat": "Flat",
+        "orders": "OrderTracing",
+        "curvature": "SlitCurvatureDetermination",
+        "scatter": "BackgroundScatter",
+        "norm_flat": "NormalizeFlatField",
+        "wavecal_master": "WavelengthCalibrationMaster",
+        "wavecal_init": "WavelengthCalibrationInitialize",
+        "wavecal": "WavelengthCalibrationFinalize",
+        "freq_comb_master": "LaserFrequencyCombMaster",
+        "freq_comb": "LaserFrequencyCombFinalize",
+        "rectify": "RectifyImage",
+        "science": "ScienceExtraction",
+        "continuum": "ContinuumNormalization",
+        "finalize": "Finalize",
     }
 
     def __init__(self,
@@ -68,7 +94,9 @@ class Reducer:
                  config: dict,
                  *,
                  order_range=None,
-                 skip_existing: bool = False):
+                 skip_existing: bool = False,
+                 parallel_steps: bool = False,
+                 memoize: bool = False):
         """Reduce all observations from a single night and instrument mode
 
         Parameters
@@ -91,51 +119,397 @@ class Reducer:
             fixed instrument specific values, usually header keywords for gain, readnoise, etc.
         skip_existing : bool
             Whether to skip reductions with existing output
+        parallel_steps : bool
+            Whether to run steps that do not depend on each other in parallel threads.
+            Only use this without plotting, as matplotlib is not thread safe
+        memoize : bool
+            Whether to store the result of each step that is run in the ".memo" folder of the output directory,
+            and reuse it instead of running the step again, as long as its settings, input files
+            and dependencies are the same
         """
         self.files = classified_files
-        self.output_dir = output_dir_template.format(instrument=str(instrument),
-                                                     target=target,
-                                                     night=night,
-                                                     mode=mode)
-
         if isinstance(instrument, str):
             instrument = load_instrument(instrument)
 
+        # The same directory the steps write to
+        self.output_dir = str(format_output_dir(output_dir_template, instrument.name, target, night, mode))
+
         self.data = {"files": classified_files, "config": config}
         self.inputs = (instrument, mode, target, night, output_dir_template, order_range)
         self.config = config
+        # Settings of each step, the steps without any use their defaults
+        self._step_configs = {step: config.get(step, {}) for step in self.modules}
         self.skip_existing = skip_existing
+        self.parallel_steps = parallel_steps
+        self.memoize = memoize
+        # Hashes of the inputs of each step, see step_key
+        self._step_keys: dict[str, str] = {}
+        # Guards self.data while steps run in parallel threads
+        self._data_lock = threading.Lock()
+        # Step instances, created on first use by get_module
+        self._step_modules: dict[str, Step] = {}
 
-    def run_module(self, step: str, load: bool = False):
-        # The Module this step is based on (an object of the Step class)
-        module = self.modules[step](*self.inputs, **self.config.get(step, {}))
+    @classmethod
+    def existing_outputs(cls,
+                         science_files: list[Path],
+                         instrument: Instrument,
+                         mode: str,
+                         target: str,
+                         night: datetime.date,
+                         output_dir_template: str,
+                         order_range,
+                         config: dict) -> list[str | None]:
+        """Find the final output files of a previous reduction, without setting up a Reducer
+
+        Parameters
+        ----------
+        science_files : list[Path]
+            science input files
+        instrument, mode, target, night, output_dir_template, order_range
+            same as the inputs of each step
+        config : dict
+            reduction settings, the "finalize" section determines the output filenames
+
+        Returns
+        -------
+        outputs : list[str | None]
+            the final output file of each science file, or None if it does not exist
+        """
+        module = cls.module_class("finalize")(instrument, mode, target, night, output_dir_template, order_range,
+                                              **config.get("finalize", {}))
+        # The number of each output file is not known here, so mark where it goes and match any number there
+        patterns = [module.output_file(_number_marker, Path(f).stem) for f in science_files]
+
+        # List each output directory only once, instead of globbing it for every science file.
+        # The listings are sorted, so that only the names that start like a pattern need to be matched against it
+        listings = {}
+        # Templates without {input} give the same pattern for every science file, match it only once
+        found = {}
+        for pattern in patterns:
+            if pattern in found:
+                continue
+            directory, name = os.path.split(pattern)
+            if directory not in listings:
+                try:
+                    with os.scandir(directory or ".") as entries:
+                        listings[directory] = sorted(entry.name for entry in entries if entry.is_file())
+                except FileNotFoundError:
+                    listings[directory] = []
+            listing = listings[directory]
+            # Templates without {number} are plain filenames, they are their own prefix
+            prefix = name.split(_number_marker, 1)[0]
+            regex = re.compile(r"\d+".join(re.escape(part) for part in name.split(_number_marker)))
+            found[pattern] = None
+            for filename in itertools.takewhile(lambda f: f.startswith(prefix),
+                                                itertools.islice(listing, bisect.bisect_left(listing, prefix), None)):
+                # The first match in sorted order, as glob would have returned it
+                if regex.fullmatch(filename):
+                    found[pattern] = os.path.join(directory, filename)
+                    break
+        return [found[pattern] for pattern in patterns]
 
-        # Load the dependencies necessary for loading/running this step
-        dependencies = module.depends_on if not load else module.load_depends_on
+    @classmethod
+    @functools.cache
+    def all_steps(cls) -> tuple[str, ...]:
+        """All steps, in the order in which they are executed"""
+        return tuple(sorted(cls.step_order, key=cls.step_order.__getitem__))
 
-        for dependency in dependencies:
-            if dependency not in self.data.keys():
-                self.data[dependency] = self.run_module(dependency, load=True)
-        kwargs = {d: self.data[d] for d in dependencies}
+    @classmethod
+    def module_class(cls, step: str) -> type[Step]:
+        """The Step subclass that implements `step`"""
+        module = cls.modules[step]
+        if isinstance(module, str):
+            module = getattr(step_classes, module)
+        return module
 
-        # Try to load the data, if the step is not specifically given as necessary
-        # If the intermediate data is not available, run it normally instead
-        # But give a warning
-        if load:
+    def get_module(self, step: str) -> Step:
+        """The Step object for `step`, it is only created once and then reused"""
+        if step not in self._step_modules:
+            self._step_modules[step] = self.module_class(step)(*self.inputs, **self._step_configs[step])
+        return self._step_modules[step]
+
+    def load_modules(self, steps: list[str]) -> None:
+        """Load the intermediate results of several steps, reading their files in parallel threads
+
+        Only steps whose own load dependencies are available already are loaded here.
+        Others, and those that fail to load, are left for run_module to deal with.
+        """
+        loadable = []
+        for step in steps:
+            module = self.get_module(step)
+            if module.intermediate_exists() and all(d in self.data for d in module.load_depends_on):
+                loadable.append(step)
+        if len(loadable) < 2:
+            return
+
+        def load(step):
+            module = self.get_module(step)
+            logger.info(f"Loading data from step {c.step(step)}")
             try:
-                logger.info(f"Loading data from step {c.step(step)}")
-                data = module.load(**kwargs)
+                return True, module.load(**{d: self.data[d] for d in module.load_depends_on})
             except FileNotFoundError:
-                logger.warning(f"Intermediate file(s) for loading step {c.act(step)} not found. Running it instead.")
-                data = self.run_module(step, load=False)
-        else:
-            logger.debug(f"Running step {c.act(step)}")
-            if step in self.files.keys():
-                kwargs["files"] = self.files[step]
+                return False, None
+
+        # Loading is mostly waiting for the disk, so threads are enough to overlap it
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(loadable)) as executor:
+            for step, (loaded, data) in zip(loadable, executor.map(load, loadable)):
+                if loaded:
+                    self.data[step] = data
+
+    def run_module(self, step: str, load: bool = False):
+        """Run or load a step, after loading any of its dependencies that are not available yet
+
+        Dependencies are resolved with an explicit stack rather than by recursion.
+        Each step is loaded at most once, unless loading fails, in which case it is run instead.
+        """
+        # Steps waiting for their dependencies, the last one is worked on next
+        stack = [(step, load)]
+        while len(stack) > 0:
+            current, current_load = stack[-1]
+            # The Module this step is based on (an object of the Step class)
+            module = self.get_module(current)
+
+            # Do not bother loading the dependencies for load() if there is nothing to load
+            if current_load and not module.intermediate_exists():
+                logger.info(f"Intermediate file(s) for step {c.act(current)} do not exist, running it instead")
+                stack[-1] = (current, False)
+                continue
+
+            # Load the dependencies necessary for loading/running this step first
+            dependencies = module.depends_on if not current_load else module.load_depends_on
+            missing = [d for d in dependencies if d not in self.data]
+            if len(missing) > 1:
+                self.load_modules(missing)
+                missing = [d for d in missing if d not in self.data]
+            if len(missing) > 0:
+                # Handle one dependency at a time, in the usual step order,
+                # so that the stack is always a chain of steps waiting for the next one
+                dependency = min(missing, key=lambda d: self.step_order.get(d, 0))
+                if any(dependency == s for s, _ in stack):
+                    raise ValueError(f"Circular dependency between steps {c.step(current)} and {c.step(dependency)}")
+                stack.append((dependency, True))
+                continue
+
+            stack.pop()
+            kwargs = {d: self.data[d] for d in dependencies}
+
+            # Try to load the data, if the step is not specifically given as necessary
+            # If the intermediate data is not available, run it normally instead
+            # But give a warning
+            if current_load:
+                try:
+                    logger.info(f"Loading data from step {c.step(current)}")
+                    data = module.load(**kwargs)
+                except FileNotFoundError:
+                    logger.warning(f"Intermediate file(s) for loading step {c.act(current)} not found. "
+                                   f"Running it instead.")
+                    stack.append((current, False))
+                    continue
+            else:
+                logger.debug(f"Running step {c.act(current)}")
+                if current in self.files:
+                    kwargs["files"] = self.files[current]
+
+                if self.memoize:
+                    data = self.run_memoized(current, module, kwargs)
+                else:
+                    data = module.run(**kwargs)
+
+            with self._data_lock:
+                self.data[current] = data
+        return self.data[step]
+
+    def step_graph(self, steps: list[str]) -> tuple[list[str], dict[str, set[str]]]:
+        """Order steps so that each comes after the steps it depends on (Kahn's algorithm)
+
+        Parameters
+        ----------
+        steps : list[str]
+            steps to order. Other steps are not ordered themselves, but the given steps they (indirectly) depend on
+            count as dependencies of the given steps that need them, as they are loaded or run with that data
 
-            data = module.run(**kwargs)
+        Returns
+        -------
+        order : list[str]
+            the steps, each after its dependencies, otherwise in step order
+        depends : dict[str, set[str]]
+            the dependencies of each step among the given steps
 
-        self.data[step] = data
+        Raises
+        ------
+        ValueError
+            if the steps depend on each other in a circle
+        """
+        depends = {}
+        for step in steps:
+            depends[step] = set()
+            # Follow the dependencies through the other steps, up to the given ones.
+            # Either may be needed by the other steps, depending on whether they are loaded or run
+            pending = list(self.get_module(step).depends_on)
+            visited = set(pending)
+            while len(pending) > 0:
+                dependency = pending.pop()
+                if dependency in steps:
+                    depends[step].add(dependency)
+                    continue
+                module = self.get_module(dependency)
+                for d in (*module.depends_on, *module.load_depends_on):
+                    if d not in visited:
+                        visited.add(d)
+                        pending.append(d)
+        remaining = {step: len(dependencies) for step, dependencies in depends.items()}
+        ready = [step for step in steps if remaining[step] == 0]
+        order = []
+        while len(ready) > 0:
+            step = ready.pop(0)
+            order.append(step)
+            for successor in steps:
+                if step in depends[successor]:
+                    remaining[successor] -= 1
+                    if remaining[successor] == 0:
+                        ready.append(successor)
+        if len(order) < len(steps):
+            raise ValueError(f"Circular dependency between steps {', '.join(s for s in steps if s not in order)}")
+        return order, depends
+
+    def run_parallel(self, steps: list[str]) -> None:
+        """Run steps in parallel threads, each as soon as the steps it depends on are done
+
+        When there are more steps ready than threads, those that start the longest chain of steps, by their run
+        times in earlier runs (see step_times_file), start first. Steps without a recorded run time count as
+        instant, and ties go to the steps that most other steps wait for.
+        """
+        order, depends = self.step_graph(steps)
+        successors = {step: [s for s in order if step in depends[s]] for step in order}
+        times = self.load_step_times()
+        # All steps that (indirectly) wait for each step, and the run time of the longest chain of steps that starts
+        # with it (its critical path). Going backwards, so that successors are done first
+        descendants, critical_path = {}, {}
+        for step in reversed(order):
+            descendants[step] = set(successors[step]).union(*(descendants[s] for s in successors[step]))
+            critical_path[step] = times.get(step, 0) + max((critical_path[s] for s in successors[step]), default=0)
+
+        def run_timed(step: str) -> float:
+            start = time.perf_counter()
+            self.run_module(step)
+            return time.perf_counter() - start
+
+        remaining = {step: len(depends[step]) for step in order}
+        ready = [step for step in order if remaining[step] == 0]
+        running = {}
+        measured = {}
+        # Many steps spend most of their time in numpy, scipy and astropy, which release the GIL
+        with concurrent.futures.ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            while len(ready) > 0 or len(running) > 0:
+                for step in sorted(ready, key=lambda s: (critical_path[s], len(descendants[s])), reverse=True):
+                    # Load the dependencies that are not run themselves here, so that threads do not load them twice.
+                    # The given steps these need are done already, as the step waits for them too (see step_graph)
+                    for dependency in self.get_module(step).depends_on:
+                        if dependency not in self.data:
+                            self.run_module(dependency, load=True)
+                    running[executor.submit(run_timed, step)] = step
+                ready = []
+
+                done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in done:
+                    step = running.pop(future)
+                    # Raise any exception from the step
+                    measured[step] = future.result()
+                    for successor in successors[step]:
+                        remaining[successor] -= 1
+                        if remaining[successor] == 0:
+                            ready.append(successor)
+        self.save_step_times(measured)
+
+    def load_step_times(self) -> dict[str, float]:
+        """Run time of each step of this instrument in earlier runs, in seconds, from step_times_file"""
+        if self.step_times_file is None:
+            return {}
+        try:
+            with open(self.step_times_file) as file:
+                return json.load(file).get(self.inputs[0].name, {})
+        except (OSError, ValueError):
+            return {}
+
+    def save_step_times(self, measured: dict[str, float]) -> None:
+        """Record the run time of steps in step_times_file
+
+        Averaged with the earlier runs (with exponentially decreasing weights), so that a single slow run
+        does not change the order much
+        """
+        if self.step_times_file is None or len(measured) == 0:
+            return
+        try:
+            with open(self.step_times_file) as file:
+                all_times = json.load(file)
+        except (OSError, ValueError):
+            all_times = {}
+        times = all_times.setdefault(self.inputs[0].name, {})
+        for step, seconds in measured.items():
+            times[step] = (times[step] + seconds) / 2 if step in times else seconds
+
+        try:
+            self.step_times_file.parent.mkdir(parents=True, exist_ok=True)
+            # Replace the file at once, so that other reductions never read half of it
+            temporary = self.step_times_file.with_name(f"{self.step_times_file.name}.{os.getpid()}")
+            with open(temporary, "w") as file:
+                json.dump(all_times, file, indent=2)
+            os.replace(temporary, self.step_times_file)
+        except OSError as e:
+            logger.warning(f"Could not record the run times of the steps in {c.path(self.step_times_file)}: {e}")
+
+    def step_key(self, step: str) -> str:
+        """Hash of everything the result of a step depends on
+
+        That is its settings, its input files, the reduction it belongs to, and the keys of its dependencies.
+        Files are identified by their path, size and modification time,
+        or by a hash of their contents if memo_hash_contents is set.
+        """
+        if step not in self._step_keys:
+            key = hashlib.blake2b(step.encode(), digest_size=16)
+            if step == "config":
+                key.update(json.dumps(self.config, sort_keys=True, default=str).encode())
+            elif step == "files":
+                for files in self.files.values():
+                    key.update(_fingerprint(files, self.memo_hash_contents))
+            else:
+                instrument, mode, target, night, output_dir_template, order_range = self.inputs
+                key.update(repr((instrument.name, mode, target, str(night), output_dir_template,
+                                 order_range)).encode())
+                key.update(json.dumps(self._step_configs[step], sort_keys=True, default=str).encode())
+                key.update(_fingerprint(self.files.get(step, []), self.memo_hash_contents))
+                for dependency in sorted(self.get_module(step).depends_on):
+                    key.update(self.step_key(dependency).encode())
+            self._step_keys[step] = key.hexdigest()
+        return self._step_keys[step]
+
+    def run_memoized(self, step: str, module: Step, kwargs: dict):
+        """Run a step, or reuse its result from an earlier run with the same inputs (see step_key)
+
+        Note that steps that also write files, e.g. finalize, do not write them again when their result is reused.
+        """
+        memo_dir = Path(self.output_dir) / ".memo"
+        memo_file = memo_dir / f"{step}.{self.step_key(step)}.pkl"
+        # Other threads may prune the file at any time, so it is not checked for first
+        try:
+            data = joblib.load(memo_file)
+        except (FileNotFoundError, EOFError):
+            pass
+        else:
+            logger.info(f"Inputs of step {c.step(step)} did not change, using the result from {c.path(memo_file)}")
+            # Mark it as recently used, without creating it again if it was pruned meanwhile
+            with contextlib.suppress(FileNotFoundError):
+                os.utime(memo_file)
+            return data
+
+        data = module.run(**kwargs)
+        memo_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            joblib.dump(data, memo_file)
+        except Exception as exc:
+            logger.warning(f"Could not store the result of step {c.step(step)}: {exc}")
+            memo_file.unlink(missing_ok=True)
+        _prune(memo_dir, self.memo_max_bytes)
         return data
 
     def prepare_output_dir(self) -> None:
@@ -158,23 +532,18 @@ class Reducer:
         self.prepare_output_dir()
 
         if steps == "all":
-            steps = list(self.step_order.keys())
-        steps = list(steps)
+            steps = list(self.all_steps())
+        else:
+            # Pick the requested steps from the sorted list of all steps, instead of sorting them each time
+            requested = set(steps)
+            if len(unknown := requested.difference(self.step_order)) > 0:
+                raise ValueError(f"Unknown step(s) {', '.join(sorted(unknown))}, "
+                                 f"expected any of {', '.join(self.all_steps())}")
+            steps = [step for step in self.all_steps() if step in requested]
 
         if self.skip_existing and "finalize" in steps:
-            module = self.modules["finalize"](*self.inputs,
-                                              **self.config.get("finalize", {}))
-            exists = [False] * len(self.files["science"])
-            data = {"finalize": [None] * len(self.files["science"])}
-
-            for i, f in enumerate(self.files["science"]):
-                fname_in = os.path.basename(f)
-                fname_in = os.path.splitext(fname_in)[0]
-                fname_out = module.output_file("?", fname_in)
-                fname_out = glob.glob(fname_out)
-                exists[i] = len(fname_out) != 0
-                if exists[i]:
-                    data["finalize"][i] = fname_out[0]
+            data = {"finalize": self.existing_outputs(self.files["science"], *self.inputs, self.config)}
+            exists = [fname is not None for fname in data["finalize"]]
 
             logger.debug(f"These steps already exists: {c.name(exists)}")
 
@@ -186,10 +555,48 @@ class Reducer:
             logger.info(f"Flag {c.param('skip_existing')} is {c.over('False')} or {c.param('finalize')} "
                         f"is not in steps, all steps will be performed")
 
-        steps.sort(key=lambda x: self.step_order[x])
-
-        for step in steps:
-            self.run_module(step)
+        if self.parallel_steps:
+            self.run_parallel(steps)
+        else:
+            for step in steps:
+                self.run_module(step)
 
         logger.debug("--------------------------------")
         return self.data
+
+
+def _fingerprint(files, contents: bool = False) -> bytes:
+    """Path, size and modification time of each file, which change whenever the file does
+
+    With contents, use a hash of the contents instead of the modification time,
+    so that e.g. files that are copied again still match
+    """
+    parts = []
+    for file in files:
+        if contents:
+            size, _, digest = util.file_fingerprint(file)
+            parts.append(f"{file}:{size}:{digest}")
+        else:
+            stat = os.stat(file)
+            parts.append(f"{file}:{stat.st_size}:{stat.st_mtime_ns}")
+    return "\n".join(parts).encode()
+
+
+def _prune(directory: Path, max_bytes: int) -> None:
+    """Remove the least recently used files in a directory, until it is no larger than max_bytes
+
+    Other threads may prune the same directory at the same time, so files can disappear at any point
+    """
+    files = []
+    for file in directory.iterdir():
+        try:
+            stat = file.stat()
+        except FileNotFoundError:
+            continue
+        files.append((stat.st_mtime_ns, stat.st_size, file))
+    files.sort(reverse=True)
+    total = 0
+    for _, size, file in files:
+        total += size
+        if total > max_bytes:
+            file.unlink(missing_ok=True)
@@ -1,28 +1,47 @@
-# Abstract base classes
+import importlib
+
+# Abstract base class
 from .step import Step
-from .calibration import CalibrationStep
-from .extraction import ExtractionStep
-
-# Concrete instantiable classes
-from .bias import Bias
-from .flat import Flat
-from .mask import Mask
-from .finalize import Finalize
-from .order_tracing import OrderTracing
-from .background_scatter import BackgroundScatter
-from .continuum import ContinuumNormalization
-from .slit_curvature import SlitCurvatureDetermination
-from .wc_initialize import WavelengthCalibrationInitialize
-from .wc_master import WavelengthCalibrationMaster
-from .wc_finalize import WavelengthCalibrationFinalize
-from .laser_comb_master import LaserFrequencyCombMaster
-from .laser_comb_finalize import LaserFrequencyCombFinalize
-from .normalize_flatfield import NormalizeFlatField
-from .science import ScienceExtraction
-from .rectify import RectifyImage
-
-__all__ = ['Step', 'CalibrationStep', 'ExtractionStep',
-           'Bias', 'Flat', 'Mask', 'Finalize', 'OrderTracing', 'BackgroundScatter', 'ContinuumNormalization',
-           'SlitCurvatureDetermination', 'WavelengthCalibrationInitialize', 'WavelengthCalibrationMaster',
-           'WavelengthCalibrationFinalize', 'LaserFrequencyCombMaster', 'LaserFrequencyCombFinalize',
-           'NormalizeFlatField', 'ScienceExtraction', 'RectifyImage']
+
+# All other steps pull in the heavy numerical modules, so they are only imported when they are first used,
+# see __getattr__. Maps the class name to the module it is defined in
+_step_modules: dict[str, str] = {
+    # Abstract base classes
+    'CalibrationStep': '.calibration',
+    'ExtractionStep': '.extraction',
+    # Concrete instantiable classes
+    'Bias': '.bias',
+    'Flat': '.flat',
+    'Mask': '.mask',
+    'Finalize': '.finalize',
+    'OrderTracing': '.order_tracing',
+    'BackgroundScatter': '.background_scatter',
+    'ContinuumNormalization': '.continuum',
+    'SlitCurvatureDetermination': '.slit_curvature',
+    'WavelengthCalibrationInitialize': '.wc_initialize',
+    'WavelengthCalibrationMaster': '.wc_master',
+    'WavelengthCalibrationFinalize': '.wc_finalize',
+    'LaserFrequencyCombMaster': '.laser_comb_master',
+    'LaserFrequencyCombFinalize': '.laser_comb_finalize',
+    'NormalizeFlatField': '.normalize_flatfield',
+    'ScienceExtraction': '.science',
+    'RectifyImage': '.rectify',
+}
+
+__all__ = ['Step', *_step_modules]
+
+
+def __getattr__(name: str):
+    try:
+        module = _step_modules[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+
+    step_class = getattr(importlib.import_module(module, package=__name__), name)
+    # Store it, so that the next access does not go through __getattr__ again
+    globals()[name] = step_class
+    return step_class
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_step_modules))
@@ -56,7 +56,8 @@ class BackgroundScatter(CalibrationStep):
         scatter : array
             scatter coefficients
         """
-        np.savez(self.savefile, scatter=scatter)
+        # A plain float array, so that it can be loaded without unpickling
+        np.savez_compressed(self.savefile, scatter=np.asarray(scatter, dtype=float))
         logger.info("Created background scatter file: %s", self.savefile)
 
     def load(self):
@@ -68,13 +69,13 @@ class BackgroundScatter(CalibrationStep):
             scatter coefficients
         """
         try:
-            data = np.load(self.savefile, allow_pickle=True)
+            with np.load(self.savefile, allow_pickle=False) as data:
+                scatter = data["scatter"]
             logger.info(f"Background scatter file {self.savefile}")
         except FileNotFoundError:
             logger.warning("No intermediate files found for the scatter. Using scatter = 0 instead.")
-            data = {"scatter": None}
+            scatter = None
 
-        scatter = data["scatter"]
         return scatter
 
 
@@ -3,12 +3,11 @@ import pprint
 import numpy as np
 import os
 
-from astropy.io import fits
 from pathlib import Path
 
 from pyreduce.combine_frames import combine_bias, combine_polynomial
 from .step import Step
-from pyreduce import colour as c
+from pyreduce import colour as c, util
 
 logger = logging.getLogger(__name__)
 
@@ -89,21 +88,14 @@ class Bias(Step):
         bhead : FITS header
             bias header
         """
-        bias = np.asarray(bias, dtype=np.float32)
+        # Only copies the data if it is not float32 already
+        bias = np.asarray(bias).astype(np.float32, copy=False)
 
         if self.degree == 0:
-            hdus = fits.PrimaryHDU(data=bias, header=bhead)
+            util.write_fits(self.savefile, bias, bhead)
         else:
-            hdus = [fits.PrimaryHDU(data=bias[0], header=bhead)]
-            for i in range(1, len(bias)):
-                hdus += [fits.ImageHDU(data=bias[i])]
-            hdus = fits.HDUList(hdus)
-
-        hdus.writeto(
-            self.savefile,
-            overwrite=True,
-            output_verify="silentfix+ignore",
-        )
+            # One image per polynomial coefficient, as views into the bias
+            util.write_fits(self.savefile, bias[0], bhead, *bias[1:])
         logger.info(f"Created master bias file {c.path(self.savefile)}")
 
     def load(self, mask):
@@ -123,15 +115,18 @@ class Bias(Step):
         """
         try:
             logger.info("Master bias file: %s", self.savefile)
-            hdu = fits.open(self.savefile)
-            degree = len(hdu) - 1
+            with util.open_fits(self.savefile) as hdu:
+                degree = len(hdu) - 1
+                bhead = hdu[0].header
+                if degree == 0:
+                    bias = hdu[0].data
+                else:
+                    bias = np.array([h.data for h in hdu])
             if degree == 0:
-                bias, bhead = hdu[0].data, hdu[0].header
                 bias = np.ma.masked_array(bias, mask=mask)
             else:
-                bhead = hdu[0].header
-                bias = np.array([h.data for h in hdu])
-                bias = np.ma.masked_array(bias, mask=[mask for _ in range(len(hdu))])
+                # The same mask for every coefficient, as a read-only view instead of a copy per coefficient
+                bias = np.ma.masked_array(bias, mask=np.broadcast_to(mask, bias.shape))
         except FileNotFoundError:
             logger.warning("No intermediate bias file found. Using Bias = 0 instead.")
             bias, bhead = None, None
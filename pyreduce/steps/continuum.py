@@ -1,5 +1,6 @@
 import logging
 import joblib
+import numpy as np
 
 from pathlib import Path
 
@@ -16,6 +17,8 @@ class ContinuumNormalization(Step):
         super().__init__(*args, **config)
         self._depends_on += ["science", "freq_comb", "norm_flat"]
         self._load_depends_on += ["norm_flat", "science"]
+        # Number of processes that normalize the spectra, only used without plotting
+        self.num_workers: int = config["num_workers"]
 
     @property
     def savefile(self) -> Path:
@@ -39,40 +42,38 @@ class ContinuumNormalization(Step):
         -------
         heads : list(FITS header)
             FITS headers of each observation
-        specs : list(array of shape (nord, ncol))
+        specs : array of shape (nobs, nord, ncol)
             extracted spectra
-        sigmas : list(array of shape (nord, ncol))
+        sigmas : array of shape (nobs, nord, ncol)
             uncertainties of the extracted spectra
-        conts : list(array of shape (nord, ncol))
+        conts : array of shape (nobs, nord, ncol)
             continuum for each spectrum
-        columns : list(array of shape (nord, 2))
+        columns : array of shape (nobs, nord, 2)
             column ranges for each spectra
+
+        If the observations do not all have the same shape, these are lists of arrays of shape
+        (nord, ncol) and (nord, 2) instead
         """
         wave = freq_comb
         heads, specs, sigmas, columns = science
         norm, blaze = norm_flat
 
         logger.info("Continuum normalization")
-        conts = [None for _ in specs]
-        for j, (spec, sigma) in enumerate(zip(specs, sigmas)):
-            specs[j], wave, blaze, sigmas[j] = splice_orders(
-                spec,
-                wave,
-                blaze,
-                sigma,
-                scaling=True,
-                plot=self.plot,
-                plot_title=self.plot_title,
-            )
-            logger.info("Normalizing continuum")
-            conts[j] = continuum_normalize(
-                specs[j],
-                wave,
-                blaze,
-                sigmas[j],
-                plot=self.plot,
-                plot_title=self.plot_title,
+        if self.num_workers > 1 and not self.plot and len(specs) > 1:
+            # The spectra are normalized independently of each other
+            n_jobs = min(self.num_workers, len(specs))
+            results = joblib.Parallel(n_jobs=n_jobs)(
+                joblib.delayed(_normalize_one)(spec, sigma, wave, blaze) for spec, sigma in zip(specs, sigmas)
             )
+        else:
+            results = [_normalize_one(spec, sigma, wave, blaze, plot=self.plot, plot_title=self.plot_title)
+                       for spec, sigma in zip(specs, sigmas)]
+
+        # One array of shape (nobs, nord, ncol) each, instead of a list of arrays per observation
+        specs = _stack([spec for spec, _, _ in results])
+        sigmas = _stack([sigma for _, sigma, _ in results])
+        conts = _stack([cont for _, _, cont in results])
+        columns = _stack(columns, np.stack)
 
         self.save(heads, specs, sigmas, conts, columns)
         return heads, specs, sigmas, conts, columns
@@ -84,20 +85,22 @@ class ContinuumNormalization(Step):
         ----------
         heads : list(FITS header)
             FITS headers of each observation
-        specs : list(array of shape (nord, ncol))
+        specs : array of shape (nobs, nord, ncol)
             extracted spectra
-        sigmas : list(array of shape (nord, ncol))
+        sigmas : array of shape (nobs, nord, ncol)
             uncertainties of the extracted spectra
-        conts : list(array of shape (nord, ncol))
+        conts : array of shape (nobs, nord, ncol)
             continuum for each spectrum
-        columns : list(array of shape (nord, 2))
+        columns : array of shape (nobs, nord, 2)
             column ranges for each spectra
         """
+        # joblib writes plain arrays straight from memory, but pickles masked arrays through copies of their
+        # data and mask, so store those as plain arrays
         value = {
             "heads": heads,
-            "specs": specs,
-            "sigmas": sigmas,
-            "conts": conts,
+            "specs": _unmask(specs),
+            "sigmas": _unmask(sigmas),
+            "conts": _unmask(conts),
             "columns": columns,
         }
         joblib.dump(value, self.savefile)
@@ -110,13 +113,13 @@ class ContinuumNormalization(Step):
         -------
         heads : list(FITS header)
             FITS headers of each observation
-        specs : list(array of shape (nord, ncol))
+        specs : array of shape (nobs, nord, ncol)
             extracted spectra
-        sigmas : list(array of shape (nord, ncol))
+        sigmas : array of shape (nobs, nord, ncol)
             uncertainties of the extracted spectra
-        conts : list(array of shape (nord, ncol))
+        conts : array of shape (nobs, nord, ncol)
             continuum for each spectrum
-        columns : list(array of shape (nord, 2))
+        columns : array of shape (nobs, nord, 2)
             column ranges for each spectra
         """
         try:
@@ -129,13 +132,68 @@ class ContinuumNormalization(Step):
             )
             heads, specs, sigmas, columns = science
             norm, blaze = norm_flat
-            conts = [blaze for _ in specs]
+            specs, sigmas, columns = _stack(specs), _stack(sigmas), _stack(columns, np.stack)
+            conts = _stack([blaze for _ in specs])
             data = dict(
                 heads=heads, specs=specs, sigmas=sigmas, conts=conts, columns=columns
             )
         heads = data["heads"]
-        specs = data["specs"]
-        sigmas = data["sigmas"]
-        conts = data["conts"]
+        specs = _remask(data["specs"])
+        sigmas = _remask(data["sigmas"])
+        conts = _remask(data["conts"])
         columns = data["columns"]
         return heads, specs, sigmas, conts, columns
+
+
+def _stack(arrays: list, stack=np.ma.stack):
+    """Stack the arrays of all observations into one, or keep the list if their shapes differ"""
+    if len(arrays) != 0 and all(isinstance(a, np.ndarray) and a.shape == arrays[0].shape for a in arrays):
+        return stack(arrays)
+    return list(arrays)
+
+
+def _unmask(array):
+    """Split a stacked masked array into its data and mask, other values are kept as they are"""
+    if isinstance(array, np.ma.MaskedArray):
+        return {"data": array.data, "mask": np.ma.getmaskarray(array)}
+    return array
+
+
+def _remask(value):
+    """Inverse of _unmask"""
+    if isinstance(value, dict):
+        return np.ma.masked_array(value["data"], mask=value["mask"])
+    return value
+
+
+def _normalize_one(spec, sigma, wave, blaze, plot=False, plot_title=None):
+    """Splice the orders of one spectrum and determine its continuum
+
+    splice_orders rescales the blaze in place, so each spectrum starts from its own copy of it
+
+    Returns
+    -------
+    spec, sigma : array of shape (nord, ncol)
+        spliced spectrum and its uncertainties
+    cont : array of shape (nord, ncol)
+        continuum of the spectrum
+    """
+    spec, wave, blaze, sigma = splice_orders(
+        spec,
+        wave,
+        np.ma.copy(blaze),
+        sigma,
+        scaling=True,
+        plot=plot,
+        plot_title=plot_title,
+    )
+    logger.info("Normalizing continuum")
+    cont = continuum_normalize(
+        spec,
+        wave,
+        blaze,
+        sigma,
+        plot=plot,
+        plot_title=plot_title,
+    )
+    return spec, sigma, cont
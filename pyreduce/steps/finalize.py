@@ -1,15 +1,69 @@
+import concurrent.futures
+import itertools
+import json
 import logging
 import os
 import numpy as np
-import matplotlib.pyplot as plt
 
 import pyreduce
 from pyreduce import echelle, util
+from pyreduce import colour as c
 from .step import Step
 
+try:
+    # Optional, serializes the settings considerably faster than the json module
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
 
+# Settings that are not relevant to the file product
+_skipped_settings = frozenset(["plot", "$schema", "__skip_existing__"])
+
+
+def _config_cards(config: dict, prefix: str) -> dict:
+    """Flatten the nested settings into header cards, in the order in which they appear in the settings"""
+    cards = {}
+    # Walk the settings with a stack of iterators instead of recursing into each section
+    stack = [(prefix, iter(config.items()))]
+    while len(stack) != 0:
+        section, items = stack[-1]
+        for key, value in items:
+            name = f"{section} {key.upper()}"
+            if isinstance(value, dict):
+                stack.append((name, iter(value.items())))
+                break
+            if key in _skipped_settings:
+                continue
+            if value is None:
+                value = "null"
+            elif not np.isscalar(value):
+                value = _to_json(value)
+            cards[f"HIERARCH {name}"] = value
+        else:
+            stack.pop()
+    return cards
+
+
+def _to_json(value) -> str:
+    """Compact JSON text of a setting that is not a scalar (e.g. a list), so that it can be read back.
+    Values that JSON can not represent are stored as their str instead"""
+    try:
+        if orjson is not None:
+            return orjson.dumps(value, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+        return json.dumps(value, separators=(",", ":"), default=_numpy_to_list)
+    except TypeError:
+        return str(value)
+
+
+def _numpy_to_list(value):
+    if isinstance(value, (np.ndarray, np.generic)):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
 class Finalize(Step):
     """Create the final output files"""
 
@@ -17,9 +71,14 @@ class Finalize(Step):
         super().__init__(*args, **config)
         self._depends_on += ["continuum", "freq_comb", "config"]
         self.filename = config["filename"]
+        # Number of processes that write the output files, only used without plotting
+        self.num_workers: int = config["num_workers"]
 
     def output_file(self, number, name) -> str:
-        """str: output file name"""
+        """Name of the output file for the given number and input filename (without its extension)
+
+        Only formats the filename template, so it may also be used with a wildcard as the number
+        """
         out = self.filename.format(
             instrument=self.instrument.name,
             night=self.night,
@@ -30,20 +89,8 @@ class Finalize(Step):
         return str(os.path.join(self.output_dir, out))
 
     def save_config_to_header(self, head, config, prefix="PR"):
-        for key, value in config.items():
-            if isinstance(value, dict):
-                head = self.save_config_to_header(
-                    head, value, prefix=f"{prefix} {key.upper()}"
-                )
-            else:
-                if key in ["plot", "$schema", "__skip_existing__"]:
-                    # Skip values that are not relevant to the file product
-                    continue
-                if value is None:
-                    value = "null"
-                elif not np.isscalar(value):
-                    value = str(value)
-                head[f"HIERARCH {prefix} {key.upper()}"] = value
+        """Add the reduction settings to the header, as HIERARCH cards like "PR FINALIZE FILENAME" """
+        head.update(_config_cards(config, prefix))
         return head
 
     def run(self, continuum: tuple, freq_comb: tuple, config):
@@ -62,48 +109,108 @@ class Finalize(Step):
         """
         heads, specs, sigmas, conts, columns = continuum
         wave = freq_comb
+        # astropy works on arrays, so calculate all corrections at once instead of once per file
+        corrections = self.heliocentric_corrections(heads)
+
+        if self.num_workers > 1 and not self.plot and len(heads) > 1:
+            # Each exposure is written to its own file, so they can be done in separate processes.
+            # The headers are changed in the workers, so return them as well
+            max_workers = min(self.num_workers, len(heads), os.cpu_count() or 1)
+            with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+                results = list(executor.map(self.finalize_one, range(len(heads)), heads, specs, sigmas, conts,
+                                            columns, itertools.repeat(wave), itertools.repeat(config), corrections))
+            fnames = [fname for fname, _ in results]
+            heads[:] = [head for _, head in results]
+        else:
+            fnames = [self.finalize_one(i, head, spec, sigma, blaze, column, wave, config, correction)[0]
+                      for i, (head, spec, sigma, blaze, column, correction)
+                      in enumerate(zip(heads, specs, sigmas, conts, columns, corrections))]
+        return fnames
+
+    @staticmethod
+    def heliocentric_corrections(heads) -> list[tuple[float, float]]:
+        """Radial velocity correction and barycentric Julian date of each exposure
 
-        fnames = []
-        # Combine science with wavecal and continuum
-        for i, (head, spec, sigma, blaze, column) in enumerate(
-                zip(heads, specs, sigmas, conts, columns)
-        ):
-            head["e_erscle"] = ("absolute", "error scale")
+        The corrections of all exposures are calculated in one call of util.helcorr, or one call per exposure
+        if that fails. Exposures whose headers lack the observatory or target position get no correction.
 
-            # Add heliocentric correction
+        Parameters
+        ----------
+        heads : list(FITS header)
+            headers of the exposures
+
+        Returns
+        -------
+        corrections : list[tuple[float, float]]
+            radial velocity correction (km/s) and barycentric Julian date of each exposure
+        """
+        keys = ("e_obslon", "e_obslat", "e_obsalt", "e_ra", "e_dec", "e_jd")
+        corrections = [None] * len(heads)
+        complete = [i for i, head in enumerate(heads) if all(head.get(key) is not None for key in keys)]
+        if len(complete) != 0:
+            # Plain lists, as the positions may also be sexagesimal strings, which astropy parses
+            values = [[heads[i][key] for i in complete] for key in keys]
             try:
-                rv_corr, bjd = util.helcorr(
-                    head["e_obslon"],
-                    head["e_obslat"],
-                    head["e_obsalt"],
-                    head["e_ra"],
-                    head["e_dec"],
-                    head["e_jd"],
-                )
-
-                logger.info(f"Heliocentric correction: {rv_corr:.6f} km/s")
-                logger.info(f"Heliocentric Julian Date: {str(bjd)}")
-            except KeyError:
+                rv_corr, bjd = util.helcorr(*values)
+            except (ValueError, TypeError):
+                # Find the exposures whose values can not be parsed
+                rv_corr, bjd = [], []
+                for i in complete:
+                    try:
+                        rv, jd = util.helcorr(*(heads[i][key] for key in keys))
+                    except (ValueError, TypeError) as e:
+                        logger.warning(f"Invalid position or time in the header of exposure {i}: {e}")
+                        rv, jd = None, None
+                    rv_corr.append(rv)
+                    bjd.append(jd)
+            for i, rv, jd in zip(complete, rv_corr, bjd):
+                if rv is None:
+                    continue
+                corrections[i] = (float(rv), float(jd))
+                logger.info(f"Heliocentric correction: {rv:.6f} km/s")
+                logger.info(f"Heliocentric Julian Date: {jd}")
+
+        for i, head in enumerate(heads):
+            if corrections[i] is None:
                 logger.warning("Could not calculate heliocentric correction")
-                # logger.warning("Telescope is in space?")
-                rv_corr = 0
-                bjd = head["e_jd"]
+                corrections[i] = (0, head["e_jd"])
+        return corrections
 
-            head["barycorr"] = rv_corr
-            head["e_jd"] = bjd
-            head["HIERARCH PR_version"] = pyreduce.__version__
+    def finalize_one(self, i, head, spec, sigma, blaze, column, wave, config, correction=None):
+        """Combine one science spectrum with the wavelength calibration and continuum, and save it
 
-            head = self.save_config_to_header(head, config)
+        correction is the (radial velocity correction, barycentric Julian date) of the exposure,
+        from heliocentric_corrections. If it is None, it is calculated here
 
-            if self.plot:
-                plt.plot(wave.T, (spec / blaze).T)
-                if self.plot_title is not None:
-                    plt.title(self.plot_title)
-                plt.show()
+        Returns
+        -------
+        out_file : str
+            name of the output file
+        head : FITS header
+            the header of the output file
+        """
+        head["e_erscle"] = ("absolute", "error scale")
 
-            fname = self.save(i, head, spec, sigma, blaze, wave, column)
-            fnames.append(fname)
-        return fnames
+        # Add heliocentric correction
+        if correction is None:
+            correction = self.heliocentric_corrections([head])[0]
+        rv_corr, bjd = correction
+
+        head["barycorr"] = rv_corr
+        head["e_jd"] = bjd
+        head["HIERARCH PR_version"] = pyreduce.__version__
+
+        head = self.save_config_to_header(head, config)
+
+        if self.plot:
+            # pyplot is slow to import, and only needed for plotting
+            import matplotlib.pyplot as plt
+            plt.plot(wave.T, (spec / blaze).T)
+            if self.plot_title is not None:
+                plt.title(self.plot_title)
+            plt.show()
+
+        return self.save(i, head, spec, sigma, blaze, wave, column), head
 
     def save(self, i, head, spec, sigma, cont, wave, columns):
         """Save one output spectrum to disk
@@ -2,8 +2,8 @@ import abc
 import logging
 import numpy as np
 
-from astropy.io import fits
 
+from pyreduce import util
 from .step import Step
 
 logger = logging.getLogger(__name__)
@@ -29,13 +29,7 @@ class FitsIOStep(Step, metaclass=abc.ABCMeta):
         if dtype is not None:
             data = np.asarray(data, dtype=np.float32)
 
-        fits.writeto(
-            self.savefile,
-            data=data,
-            header=head,
-            overwrite=True,
-            output_verify="silentfix+ignore",
-        )
+        util.write_fits(self.savefile, data, head)
         logger.info("Created data file: %s", self.savefile)
 
     def load(self, mask):
@@ -55,8 +49,8 @@ class FitsIOStep(Step, metaclass=abc.ABCMeta):
             header of the master bias
         """
         try:
-            data = fits.open(self.savefile)[0]
-            data, head = data.data, data.header
+            with util.open_fits(self.savefile) as hdus:
+                data, head = hdus[0].data, hdus[0].header
             data = np.ma.masked_array(data, mask=mask)
             logger.info("Data file: %s", self.savefile)
         except FileNotFoundError as ex:
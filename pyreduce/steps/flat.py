@@ -1,11 +1,10 @@
 import logging
 import numpy as np
 
-from astropy.io import fits
 from os.path import join
 
 from .calibration import CalibrationStep
-from pyreduce import colour as c
+from pyreduce import colour as c, util
 
 logger = logging.getLogger(__name__)
 
@@ -16,6 +15,8 @@ class Flat(CalibrationStep):
     def __init__(self, *args, **config):
         super().__init__(*args, **config)
         self._load_depends_on += ["mask"]
+        # Whether to save the master flat tile compressed, see util.write_fits
+        self.compress: bool = config["compress"]
 
     @property
     def savefile(self):
@@ -33,13 +34,7 @@ class Flat(CalibrationStep):
             master flat header
         """
         flat = np.asarray(flat, dtype=np.float32)
-        fits.writeto(
-            self.savefile,
-            data=flat,
-            header=fhead,
-            overwrite=True,
-            output_verify="silentfix+ignore",
-        )
+        util.write_fits(self.savefile, flat, fhead, compress=self.compress)
         logger.info(f"Created master flat file {c.path(self.savefile)}")
 
     def run(self, files, bias, mask):
@@ -86,8 +81,9 @@ class Flat(CalibrationStep):
             Master flat FITS header
         """
         try:
-            flat = fits.open(self.savefile)[0]
-            flat, fhead = flat.data, flat.header
+            with util.open_fits(self.savefile) as hdus:
+                flat = util.image_hdu(hdus)
+                flat, fhead = flat.data, flat.header
             flat = np.ma.masked_array(flat, mask=mask)
             logger.info("Master flat file: %s", self.savefile)
         except FileNotFoundError:
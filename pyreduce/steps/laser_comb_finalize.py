@@ -4,6 +4,7 @@ import numpy as np
 from pathlib import Path
 
 from pyreduce.wavelength_calibration import WavelengthCalibrationComb
+from pyreduce import util
 from .step import Step
 
 logger = logging.getLogger(__name__)
@@ -99,11 +100,9 @@ class LaserFrequencyCombFinalize(Step):
             extracted frequency comb image
         """
         try:
-            data = np.load(self.savefile, allow_pickle=True)
+            wave = util.load_npz(self.savefile)["wave"]
             logger.info(f"Frequency comb wavecal file: '{self.savefile}'")
         except FileNotFoundError:
             logger.warning("No data for Laser Frequency Comb found, using regular wavelength calibration instead")
             wave, coef, linelist = wavecal
-            data = {"wave": wave}
-        wave = data["wave"]
         return wave
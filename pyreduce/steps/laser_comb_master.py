@@ -2,8 +2,8 @@ import logging
 import numpy as np
 
 from os.path import join
-from astropy.io import fits
 
+from pyreduce import util
 from .calibration import CalibrationStep
 from .extraction import ExtractionStep
 
@@ -13,9 +13,13 @@ logger = logging.getLogger(__name__)
 class LaserFrequencyCombMaster(CalibrationStep, ExtractionStep):
     """Create a laser frequency comb (or similar) master image"""
 
+    load_requires_savefile = True
+
     def __init__(self, *args, **config):
         super().__init__(*args, **config)
         self._depends_on += ["norm_flat", "curvature"]
+        # Whether to save the master comb tile compressed, see util.write_fits
+        self.compress: bool = config["compress"]
 
     @property
     def savefile(self):
@@ -67,14 +71,9 @@ class LaserFrequencyCombMaster(CalibrationStep, ExtractionStep):
         chead : FITS header
             master comb header
         """
-        comb = np.asarray(comb, dtype=np.float64)
-        fits.writeto(
-            self.savefile,
-            data=comb,
-            header=chead,
-            overwrite=True,
-            output_verify="silentfix+ignore",
-        )
+        # The extracted counts do not need more than single precision
+        comb = np.asarray(comb, dtype=np.float32)
+        util.write_fits(self.savefile, comb, chead, compress=self.compress)
         logger.info("Created frequency comb master spectrum: %s", self.savefile)
 
     def load(self):
@@ -87,7 +86,8 @@ class LaserFrequencyCombMaster(CalibrationStep, ExtractionStep):
         chead : FITS header
             Master comb FITS header
         """
-        comb = fits.open(self.savefile)[0]
-        comb, chead = comb.data, comb.header
+        with util.open_fits(self.savefile) as hdus:
+            comb = util.image_hdu(hdus)
+            comb, chead = comb.data, comb.header
         logger.info(f"Frequency comb master spectrum: {self.savefile}")
         return comb, chead
@@ -1,12 +1,24 @@
+import functools
 import logging
+import os
 import numpy as np
 
+from pyreduce.instruments import Instrument
+
 from .step import Step
 from .. import colour as c
 
 logger = logging.getLogger(__name__)
 
 
+@functools.lru_cache(maxsize=8)
+def _load_mask(instrument: Instrument, mode: str, mask_file: str, mtime_ns: int) -> np.ndarray:
+    """Read a bad pixel mask file, only once for each mode as long as it is not modified"""
+    # Keep the stored dtype, the mask is compared right away, without a float copy first
+    mask, _ = instrument.load_fits(mask_file, mode, extension=0, dtype=None)
+    return np.equal(mask.data, 0)  # REDUCE mask are inverse to numpy masks
+
+
 class Mask(Step):
     """Load the bad pixel mask for the given instrument/mode"""
 
@@ -33,10 +45,10 @@ class Mask(Step):
         """
         mask_file = self.instrument.get_mask_filename(mode=self.mode)
         try:
-            mask, _ = self.instrument.load_fits(mask_file, self.mode, extension=0)
-            mask = ~mask.data.astype(bool)  # REDUCE mask are inverse to numpy masks
+            mask = _load_mask(self.instrument, self.mode, mask_file, os.stat(mask_file).st_mtime_ns)
             logger.info(f"Loaded a bad pixel mask file {c.path(mask_file)}")
         except (FileNotFoundError, ValueError):
             logger.error(f"Bad pixel mask datafile {c.path(mask_file)} not found. Using all pixels instead.")
-            mask = False
-        return mask
+            return False
+        # Later steps may modify the mask they are given
+        return mask.copy()
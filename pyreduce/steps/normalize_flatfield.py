@@ -3,6 +3,7 @@ import numpy as np
 
 from os.path import join
 
+from pyreduce import util
 from .step import Step
 from pyreduce.extract import extract
 
@@ -36,6 +37,8 @@ class NormalizeFlatField(Step):
         #:int: Threshold of the normalized flat field (values below this are just 1)
         self.threshold = config["threshold"]
         self.threshold_lower = config["threshold_lower"]
+        #:bool: Whether to save the normalized flat field as float16
+        self.low_precision_norm = config["low_precision_norm"]
 
     @property
     def savefile(self):
@@ -65,7 +68,13 @@ class NormalizeFlatField(Step):
 
         # if threshold is smaller than 1, assume percentage value is given
         if self.threshold <= 1:
-            threshold = np.percentile(flat, self.threshold * 100)
+            # Linear percentile, like np.percentile (which also ignores the mask), but from a partition of the plain
+            # data around just the two values that are interpolated
+            data = np.ma.getdata(flat).ravel()
+            position = self.threshold * (data.size - 1)
+            k = int(position)
+            data = np.partition(data, [k, min(k + 1, data.size - 1)])
+            threshold = data[k] + (position - k) * (data[min(k + 1, data.size - 1)] - data[k])
         else:
             threshold = self.threshold
 
@@ -88,8 +97,11 @@ class NormalizeFlatField(Step):
             **self.extraction_kwargs,
         )
 
-        blaze = np.ma.filled(blaze, 0)
-        norm = np.nan_to_num(norm, nan=1)
+        # Both arrays are new from the extraction, so they are fixed in place rather than copied
+        if np.ma.isMaskedArray(blaze):
+            np.copyto(blaze.data, 0, where=np.ma.getmaskarray(blaze))
+            blaze = blaze.data
+        norm = np.nan_to_num(norm, copy=False, nan=1)
         self.save(norm, blaze)
         return norm, blaze
 
@@ -103,6 +115,9 @@ class NormalizeFlatField(Step):
         blaze : array of shape (nord, ncol)
             Continuum level as determined from the flat field for each order
         """
+        if self.low_precision_norm:
+            # The normalized flat is close to 1 everywhere, float16 keeps it to about 5e-4
+            norm = np.asarray(norm, dtype=np.float16)
         np.savez(self.savefile, blaze=blaze, norm=norm)
         logger.info("Created normalized flat file: %s", self.savefile)
 
@@ -117,15 +132,19 @@ class NormalizeFlatField(Step):
             Continuum level as determined from the flat field for each order
         """
         try:
-            data = np.load(self.savefile, allow_pickle=True)
+            # The normalized flat is as large as the detector, it is memory mapped instead of read at once
+            data = util.load_npz(self.savefile)
+            blaze = data["blaze"]
+            norm = data["norm"]
+            if norm.dtype == np.float16:
+                # Saved with low_precision_norm, the calculations should not be done in float16
+                norm = norm.astype(np.float32)
             logger.info("Normalized flat file: %s", self.savefile)
         except FileNotFoundError:
             logger.warning(
                 "No intermediate files found for the normalized flat field. Using flat = 1 instead."
             )
-            data = {"blaze": None, "norm": None}
-        blaze = data["blaze"]
-        norm = data["norm"]
+            blaze, norm = None, None
         return norm, blaze
 
 
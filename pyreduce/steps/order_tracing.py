@@ -4,7 +4,7 @@ import numpy as np
 from pathlib import Path
 
 from pyreduce.trace_orders import mark_orders
-from pyreduce import colour as c
+from pyreduce import colour as c, util
 from .calibration import CalibrationStep
 
 
@@ -14,6 +14,8 @@ logger = logging.getLogger(__name__)
 class OrderTracing(CalibrationStep):
     """Determine the polynomial fits describing the pixel locations of each order"""
 
+    load_requires_savefile = True
+
     def __init__(self, *args, **config):
         super().__init__(*args, **config)
 
@@ -101,6 +103,12 @@ class OrderTracing(CalibrationStep):
         column_range : array of shape (nord, 2)
             first and last(+1) column that carry signal in each order
         """
+        # Plain numeric arrays, so that the file can be loaded without pickles
+        orders = np.ascontiguousarray(orders, dtype=np.float64)
+        column_range = np.ascontiguousarray(column_range, dtype=np.int32)
+        if orders.ndim != 2 or column_range.shape != (len(orders), 2):
+            raise ValueError(f"Expected orders of shape (nord, ndegree+1) and column ranges of shape (nord, 2), "
+                             f"but got {orders.shape} and {column_range.shape}")
         np.savez(self.savefile, orders=orders, column_range=column_range)
         logger.info("Created order tracing file: %s", self.savefile)
 
@@ -115,7 +123,7 @@ class OrderTracing(CalibrationStep):
             first and last(+1) column that carries signal in each order
         """
         logger.info(f"Order tracing file '{self.savefile}'")
-        data = np.load(self.savefile, allow_pickle=True)
+        data = util.load_npz(self.savefile)
         orders = data["orders"]
         column_range = data["column_range"]
         return orders, column_range
@@ -1,3 +1,4 @@
+import concurrent.futures
 import numpy as np
 from astropy.io import fits
 from tqdm import tqdm
@@ -14,10 +15,11 @@ class RectifyImage(Step):
     def __init__(self, *args, **config):
         super().__init__(*args, **config)
         self._depends_on += ["files", "orders", "curvature", "mask", "freq_comb"]
-        # self._loadDependsOn += []
 
         self.extraction_width = config["extraction_width"]
         self.input_files = config["input_files"]
+        # Number of threads that rectify the files, only used without plotting
+        self.num_workers: int = config["num_workers"]
 
     def filename(self, name):
         return util.swap_extension(name, ".rectify.fits", path=self.output_dir)
@@ -29,9 +31,9 @@ class RectifyImage(Step):
 
         files = files[self.input_files]
 
-        rectified = {}
-        for fname in tqdm(files, desc="Files"):
-            img, head = self.instrument.load_fits(fname, self.mode, mask=mask, dtype="f8")
+        def rectify_one(fname):
+            # Single precision is plenty for the detector counts, and halves the memory of each image
+            img, head = self.instrument.load_fits(fname, self.mode, mask=mask, dtype=np.float32)
 
             images, cr, xwd = rectify_image(
                 img,
@@ -45,31 +47,41 @@ class RectifyImage(Step):
             wavelength, image = merge_images(images, wave, cr, xwd)
 
             self.save(fname, image, wavelength, header=head)
-            rectified[fname] = (wavelength, image)
+            return wavelength, image
 
-        return rectified
+        if self.num_workers > 1 and not self.plot and len(files) > 1:
+            # The files are independent, so reading, rectifying and writing them can overlap
+            with concurrent.futures.ThreadPoolExecutor(max_workers=min(self.num_workers, len(files))) as executor:
+                results = list(tqdm(executor.map(rectify_one, files), total=len(files), desc="Files"))
+        else:
+            results = [rectify_one(fname) for fname in tqdm(files, desc="Files")]
+
+        return dict(zip(files, results))
 
     def save(self, fname, image, wavelength, header=None):
         # Change filename
         fname = self.filename(fname)
         # Create HDU List, one extension per order
-        primary = fits.PrimaryHDU(header=header)
+        primary = fits.PrimaryHDU(header=None if header is None else util.verified_header(header))
         secondary = fits.ImageHDU(data=image)
         column = fits.Column(name="wavelength", array=wavelength, format="D")
         tertiary = fits.BinTableHDU.from_columns([column])
         hdus = fits.HDUList([primary, secondary, tertiary])
         # Save data to file
-        hdus.writeto(fname, overwrite=True, output_verify="silentfix")
+        hdus.writeto(fname, overwrite=True, output_verify="ignore")
 
     def load(self, files):
         files = files[self.input_files]
 
-        rectified = {}
-        for orig_fname in files:
-            fname = self.filename(orig_fname)
-            data = fits.open(fname)
-            img = data[1].data
-            wave = data[2].data["wavelength"]
-            rectified[orig_fname] = (wave, img)
+        if len(files) == 0:
+            return {}
+
+        def read(orig_fname):
+            with util.open_fits(self.filename(orig_fname)) as hdus:
+                img = hdus[1].data
+                wave = hdus[2].data["wavelength"]
+            return wave, img
+
+        rectified = dict(zip(files, util.read_files(read, files)))
 
         return rectified
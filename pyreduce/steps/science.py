@@ -1,3 +1,4 @@
+import concurrent.futures
 import logging
 import numpy as np
 
@@ -70,6 +71,28 @@ class ScienceExtraction(CalibrationStep, ExtractionStep):
             column ranges for each spectrum
         """
         heads, specs, sigmas, columns = [], [], [], []
+        if len(files) > 1 and not self.plot:
+            # The extraction itself keeps its state in globals of the C library, so only one file can be extracted
+            # at a time. Meanwhile, the next file is read and calibrated, and the previous spectrum is saved
+            with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+                calibrated = executor.submit(self.calibrate, [files[0]], mask, bias, norm_flat)
+                saved = []
+                for i, fname in enumerate(tqdm(files, desc="Files")):
+                    logger.info(f"Science file: '{fname}'")
+                    im, head = calibrated.result()
+                    if i + 1 < len(files):
+                        calibrated = executor.submit(self.calibrate, [files[i + 1]], mask, bias, norm_flat)
+                    spec, sigma, _, cr = self.extract(im, head, orders, curvature, scatter=scatter)
+                    saved.append(executor.submit(self.save, fname, head, spec, sigma, cr))
+                    heads.append(head)
+                    specs.append(spec)
+                    sigmas.append(sigma)
+                    columns.append(cr)
+                # Raise any exception from saving
+                for future in saved:
+                    future.result()
+            return heads, specs, sigmas, columns
+
         for fname in tqdm(files, desc="Files"):
             logger.info(f"Science file: '{fname}'")
             # Calibrate the input image
@@ -128,18 +151,18 @@ class ScienceExtraction(CalibrationStep, ExtractionStep):
 
         logger.info("Science files: %s", files)
 
-        heads, specs, sigmas, columns = [], [], [], []
-        for fname in files:
-            # fname = join(self.output_dir, fname)
-            science = echelle.read(
+        def read(fname):
+            return echelle.read(
                 fname,
                 continuum_normalization=False,
                 barycentric_correction=False,
                 radial_velociy_correction=False,
             )
-            heads.append(science.header)
-            specs.append(science["spec"])
-            sigmas.append(science["sig"])
-            columns.append(science["columns"])
 
+        sciences = util.read_files(read, files)
+
+        heads = [science.header for science in sciences]
+        specs = [science["spec"] for science in sciences]
+        sigmas = [science["sig"] for science in sciences]
+        columns = [science["columns"] for science in sciences]
         return heads, specs, sigmas, columns
@@ -3,7 +3,7 @@ import numpy as np
 import pprint
 import os
 
-from pyreduce.make_shear import Curvature as CurvatureModule
+from pyreduce import util
 from .calibration import CalibrationStep
 from .extraction import ExtractionStep
 from .. import colour as c
@@ -60,6 +60,8 @@ class SlitCurvatureDetermination(CalibrationStep, ExtractionStep):
         shear : array of shape (nord, ncol)
             second order slit curvature at each point
         """
+        # The curvature module pulls in scipy.signal, which is slow to import, and loading does not need it
+        from pyreduce.make_shear import Curvature as CurvatureModule
 
         logger.info(f"Slit curvature files:")
         for file in files:
@@ -113,7 +115,7 @@ class SlitCurvatureDetermination(CalibrationStep, ExtractionStep):
             second order slit curvature at each point
         """
         try:
-            data = np.load(self.savefile, allow_pickle=True)
+            data = util.load_npz(self.savefile)
             logger.info(f"Loaded a slit curvature file: {c.path(self.savefile)}")
         except FileNotFoundError:
             logger.warning("No data for slit curvature found, setting it to 0.")
@@ -1,14 +1,43 @@
 import abc
 import datetime
+import functools
 
 from pathlib import Path
 
 from pyreduce.instruments import Instrument
 
 
+@functools.lru_cache
+def format_output_dir(template: str, instrument: str, target: str, night: datetime.date, mode: str) -> Path:
+    """Fill in the placeholders of an output directory template
+
+    The same few templates are filled in by every step, so the results are cached.
+    Templates without placeholders, like the default "reduced", are used as they are.
+    """
+    if "{" not in template:
+        return Path(template)
+    return Path(template.format(instrument=instrument.upper(), target=target, night=night.isoformat(), mode=mode))
+
+
+@functools.lru_cache
+def format_prefix(instrument: str, mode: str | None) -> str:
+    """Prefix of the intermediate files of an instrument and mode, e.g. "uves_middle"
+
+    Like the output directory, this is requested for every file name of every step, so the results are cached.
+    """
+    name = instrument.lower()
+    if mode is not None and mode != "":
+        return f"{name}_{mode.lower()}"
+    return name
+
+
 class Step(metaclass=abc.ABCMeta):
     """ Abstract parent class for all steps """
 
+    # Whether load() can only succeed if self.savefile exists.
+    # Steps that fall back to default values when their file is missing leave this False.
+    load_requires_savefile: bool = False
+
     def __init__(self,
                  instrument: str,
                  mode: str,
@@ -74,41 +103,39 @@ class Step(metaclass=abc.ABCMeta):
         """
         raise NotImplementedError
 
+    def intermediate_exists(self) -> bool:
+        """Whether the results of a previous execution are available for load()
+
+        This is checked before any dependencies of load() are resolved,
+        so that a step without intermediate files is run without loading them first.
+        """
+        if not self.load_requires_savefile:
+            return True
+        return Path(self.savefile).exists()
+
     @property
     def name(self) -> str:
         return self.__class__.__name__
 
     @property
     def depends_on(self):
-        """list(str): Steps that are required before running this step"""
-        return list(set(self._depends_on))
+        """list(str): Steps that are required before running this step, in the order they were added"""
+        return list(dict.fromkeys(self._depends_on))
 
     @property
     def load_depends_on(self) -> list[str]:
-        """ list(str): Steps that are required before loading data from this step"""
-        return list(set(self._load_depends_on))
+        """ list(str): Steps that are required before loading data from this step, in the order they were added"""
+        return list(dict.fromkeys(self._load_depends_on))
 
     @property
     def output_dir(self) -> Path:
         """ Fill the output dir template and return a Path where outputs will be stored """
-        return Path(
-            self._output_dir_template.format(
-                instrument=self.instrument.name.upper(),
-                target=self.target,
-                night=self.night.isoformat(),
-                mode=self.mode,
-            )
-        )
+        return format_output_dir(self._output_dir_template, self.instrument.name, self.target, self.night, self.mode)
 
     @property
     def prefix(self) -> str:
         """ Temporary file prefix """
-        name = self.instrument.name.lower()
-        if self.mode is not None and self.mode != "":
-            mode = self.mode.lower()
-            return f"{name}_{mode}"
-        else:
-            return name
+        return format_prefix(self.instrument.name, self.mode)
 
 
 class SingleFileStep(Step):
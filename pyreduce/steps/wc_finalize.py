@@ -3,9 +3,8 @@ import numpy as np
 
 from pathlib import Path
 
-from pyreduce.wavelength_calibration import WavelengthCalibration as WavelengthCalibrationModule
 from .step import Step
-from pyreduce import colour as c
+from pyreduce import colour as c, util
 
 logger = logging.getLogger(__name__)
 
@@ -13,6 +12,8 @@ logger = logging.getLogger(__name__)
 class WavelengthCalibrationFinalize(Step):
     """Perform wavelength calibration"""
 
+    load_requires_savefile = True
+
     def __init__(self, *args, **config):
         super().__init__(*args, **config)
         self._depends_on += ["wavecal_master", "wavecal_init"]
@@ -67,6 +68,9 @@ class WavelengthCalibrationFinalize(Step):
         linelist : record array of shape (nlines,)
             Updated line information for all lines
         """
+        # The wavelength calibration module is slow to import, and loading does not need it
+        from pyreduce.wavelength_calibration import WavelengthCalibration as WavelengthCalibrationModule
+
         thar, thead = wavecal_master
         linelist = wavecal_init
 
@@ -115,9 +119,10 @@ class WavelengthCalibrationFinalize(Step):
         linelist : record array of shape (nlines,)
             Updated line information for all lines
         """
-        data = np.load(self.savefile, allow_pickle=True)
-        logger.info(f"Loaded a wavelength calibration file {c.path(self.savefile)}")
+        # The line list has an object field, so this needs pickles. Large wavelength solutions are memory mapped
+        data = util.load_npz(self.savefile, allow_pickle=True)
         wave = data["wave"]
         coef = data["coef"]
         linelist = data["linelist"]
+        logger.info(f"Loaded a wavelength calibration file {c.path(self.savefile)}")
         return wave, coef, linelist
@@ -2,9 +2,8 @@ import logging
 import numpy as np
 import os
 
-from astropy.io import fits
 
-from pyreduce import colour as c
+from pyreduce import colour as c, util
 from .calibration import CalibrationStep
 from .extraction import ExtractionStep
 
@@ -14,6 +13,8 @@ logger = logging.getLogger(__name__)
 class WavelengthCalibrationMaster(CalibrationStep, ExtractionStep):
     """Create wavelength calibration master image"""
 
+    load_requires_savefile = True
+
     def __init__(self, *args, **config):
         super().__init__(*args, **config)
         self._depends_on += ["norm_flat", "curvature"]
@@ -68,14 +69,11 @@ class WavelengthCalibrationMaster(CalibrationStep, ExtractionStep):
         thead : FITS header
             master flat header
         """
-        thar = np.asarray(thar, dtype=np.float64)
-        fits.writeto(
-            self.savefile,
-            data=thar,
-            header=thead,
-            overwrite=True,
-            output_verify="silentfix+ignore",
-        )
+        thar = np.asarray(thar)
+        # Floating point spectra are written as they are, only other data is converted
+        if not np.issubdtype(thar.dtype, np.floating):
+            thar = thar.astype(np.float32)
+        util.write_fits(self.savefile, thar, thead)
         logger.info(f"Created wavelength calibration spectrum file {c.path(self.savefile)}")
 
     def load(self):
@@ -88,8 +86,9 @@ class WavelengthCalibrationMaster(CalibrationStep, ExtractionStep):
         thead : FITS header
             Master wavecal FITS header
         """
-        thar = fits.open(self.savefile)[0]
-        thar, thead = thar.data, thar.header
+        # Large files are memory mapped, the map stays open as long as the data is used
+        with util.open_fits(self.savefile) as hdus:
+            thar, thead = hdus[0].data, hdus[0].header
         logger.info("Wavelength calibration spectrum file: %s", self.savefile)
         return thar, thead
 
@@ -48,8 +48,9 @@ def best_fit(x, y):
     return coeff
 
 
-def determine_overlap_rating(xi, yi, xj, yj, mean_cluster_thickness, nrow, ncol, deg=2):
+def determine_overlap_rating(xi, yi, xj, yj, mean_cluster_thickness, nrow, ncol, deg=2, order_i=None, order_j=None):
     # i and j are the indices of the 2 clusters
+    # order_i and order_j are the polynomial fits to the clusters, if they are known already
     i_left, i_right = yi.min(), yi.max()
     j_left, j_right = yj.min(), yj.max()
 
@@ -58,8 +59,10 @@ def determine_overlap_rating(xi, yi, xj, yj, mean_cluster_thickness, nrow, ncol,
     n_min = min(i_right - i_left, j_right - j_left)
 
     # Fit a polynomial to each cluster
-    order_i = fit(xi, yi, deg)
-    order_j = fit(xj, yj, deg)
+    if order_i is None:
+        order_i = fit(xi, yi, deg)
+    if order_j is None:
+        order_j = fit(xj, yj, deg)
 
     # Get polynomial points inside cluster limits for each cluster and polynomial
     y_ii = np.polyval(order_i, np.arange(i_left, i_right))
@@ -98,9 +101,11 @@ def create_merge_array(x, y, mean_cluster_thickness, nrow, ncol, deg, threshold)
     n_clusters = list(x.keys())
     nmax = len(n_clusters) ** 2
     merge = np.zeros((nmax, 5))
+    # Each cluster is part of many pairs, so it is only fitted once
+    fits = {i: fit(x[i], y[i], deg) for i in n_clusters}
     for k, (i, j) in enumerate(combinations(n_clusters, 2)):
         overlap, region = determine_overlap_rating(
-            x[i], y[i], x[j], y[j], mean_cluster_thickness, nrow, ncol, deg=deg
+            x[i], y[i], x[j], y[j], mean_cluster_thickness, nrow, ncol, deg=deg, order_i=fits[i], order_j=fits[j]
         )
         merge[k] = [i, j, overlap, *region]
     merge = merge[merge[:, 2] > threshold]
@@ -114,9 +119,10 @@ def update_merge_array(
     j = int(j)
     n_clusters = np.array(list(x.keys()))
     update = []
+    order_j = fit(x[j], y[j], deg)
     for i in n_clusters[n_clusters != j]:
         overlap, region = determine_overlap_rating(
-            x[i], y[i], x[j], y[j], mean_cluster_thickness, nrow, ncol, deg=deg
+            x[i], y[i], x[j], y[j], mean_cluster_thickness, nrow, ncol, deg=deg, order_j=order_j
         )
         if overlap <= threshold:
             # no , or little overlap
@@ -132,17 +138,17 @@ def update_merge_array(
 
 def calculate_mean_cluster_thickness(x, y):
     # Calculate mean cluster thickness
-    # TODO optimize
     n_clusters = list(x.keys())
     mean_cluster_thickness = 10
     for cluster in n_clusters:
         # individual columns of this cluster
-        columns = np.unique(y[cluster])
-        delta = 0
-        for col in columns:
-            # thickness of the cluster in each column
-            tmp = x[cluster][y[cluster] == col]
-            delta += np.max(tmp) - np.min(tmp)
+        columns, column = np.unique(y[cluster], return_inverse=True)
+        # thickness of the cluster in each column
+        top = np.full(len(columns), np.iinfo(x[cluster].dtype).min)
+        bottom = np.full(len(columns), np.iinfo(x[cluster].dtype).max)
+        np.maximum.at(top, column, x[cluster])
+        np.minimum.at(bottom, column, x[cluster])
+        delta = np.sum(top - bottom)
         mean_cluster_thickness += delta / len(columns)
 
     mean_cluster_thickness *= 1.5 / len(n_clusters)
@@ -401,8 +407,11 @@ def mark_orders(
     """
 
     # Convert to signed integer, to avoid underflow problems
+    # 32 bits are plenty for detector counts, and the filters below are considerably faster on them than on 64 bits
     im = np.asanyarray(im)
-    im = im.astype(int)
+    data = np.ma.getdata(im)
+    fits_int32 = np.min(data) >= np.iinfo(np.int32).min and np.max(data) <= np.iinfo(np.int32).max
+    im = im.astype(np.int32 if fits_int32 else int)
 
     if filter_size is None:
         col = im[:, im.shape[0] // 2]
@@ -474,16 +483,20 @@ def mark_orders(
     sizes = np.bincount(clusters.ravel())
     mask_sizes = sizes > min_cluster
     mask_sizes[0] = True  # This is the background, which we don't need to remove
-    for i in np.arange(len(sizes))[~mask_sizes]:
-        clusters[clusters == i] = 0
+    clusters[~mask_sizes[clusters]] = 0
 
     # # Reorganize x, y, clusters into a more convenient "pythonic" format
     # # x, y become dictionaries, with an entry for each order
     # # n is just a list of all orders (ignore cluster == 0)
-    n = np.unique(clusters)
-    n = n[n != 0]
-    x = {i: np.where(clusters == c)[0] for i, c in enumerate(n)}
-    y = {i: np.where(clusters == c)[1] for i, c in enumerate(n)}
+    # All pixels are grouped by cluster in one pass, a stable sort keeps them in the order of np.where within each
+    rows, cols = np.nonzero(clusters)
+    labels = clusters[rows, cols]
+    by_cluster = np.argsort(labels, kind="stable")
+    rows, cols = rows[by_cluster], cols[by_cluster]
+    n, starts = np.unique(labels[by_cluster], return_index=True)
+    ends = np.append(starts[1:], len(labels))
+    x = {i: rows[start:end] for i, (start, end) in enumerate(zip(starts, ends))}
+    y = {i: cols[start:end] for i, (start, end) in enumerate(zip(starts, ends))}
 
     def best_fit_degree(x, y):
         L1 = np.sum((np.polyval(np.polyfit(y, x, 1), y) - x) ** 2)
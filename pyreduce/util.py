@@ -2,11 +2,22 @@
 Collection of various useful and/or reoccuring functions across PyReduce
 """
 
+import concurrent.futures
+import contextlib
+import functools
+import gzip
+import hashlib
 import logging
+import mmap
 import os
+import pprint
+import re
+import shutil
+import struct
+import uuid
 import warnings
+import zipfile
 
-import matplotlib.pyplot as plt
 import numpy as np
 import scipy.constants
 import scipy.interpolate
@@ -14,14 +25,21 @@ import scipy.interpolate
 from astropy import coordinates as coord
 from astropy import time
 from astropy import units as u
-from scipy.linalg import lstsq, solve, solve_banded
+from astropy.io import fits
+from scipy.linalg import LinAlgError, lstsq, solve_banded, solveh_banded
 from scipy.ndimage.filters import median_filter
 from scipy.optimize import curve_fit, least_squares
 from scipy.special import binom
 from pathlib import Path
+from typing import Any, Callable, Iterable
 
 from . import __version__
-from .clipnflip import clipnflip
+
+try:
+    # Optional, reads headers considerably faster than astropy
+    import fitsio
+except ImportError:  # pragma: no cover
+    fitsio = None
 
 logger = logging.getLogger(__name__)
 
@@ -30,6 +48,19 @@ class ConfigurationError(Exception):
     """ Exception subclass for reporting configuration errors """
 
 
+class LazyPformat:
+    """Pretty print an object only when a log message using it is actually emitted
+
+    >>> logger.trace("Configuration:\n%s", LazyPformat(config))
+    """
+
+    def __init__(self, obj: Any):
+        self.obj = obj
+
+    def __str__(self) -> str:
+        return pprint.pformat(self.obj)
+
+
 def resample(array, new_size):
     x = np.arange(new_size)
     xp = np.linspace(0, new_size, len(array))
@@ -64,14 +95,24 @@ def log_version():
     logger.debug(f"PyReduce version: {__version__}")
 
 
+# Log files that start_logging was already called for
+_started_log_files: set[Path] = set()
+
+
 def start_logging(log_file: Path = "log.log"):
     """Start logging to log file and command line
 
+    Calling this again for the same file does nothing
+
     Parameters
     ----------
     log_file : str, optional
         name of the logging file (default: "log.log")
     """
+    log_file = Path(log_file)
+    if log_file in _started_log_files:
+        return
+    _started_log_files.add(log_file)
 
     log_file.parent.mkdir(parents=True, exist_ok=True)
     logging.basicConfig(
@@ -83,6 +124,360 @@ def start_logging(log_file: Path = "log.log"):
     log_version()
 
 
+@contextlib.contextmanager
+def logging_to(log_file: Path):
+    """Also write the log to a file, until the end of the with block
+
+    Unlike start_logging, this works for every file and does not leave handlers behind,
+    so consecutive reductions each get their own log file
+
+    Parameters
+    ----------
+    log_file : str, Path
+        name of the logging file, it is appended to if it exists
+    """
+    log_file = Path(log_file)
+    log_file.parent.mkdir(parents=True, exist_ok=True)
+    handler = logging.FileHandler(log_file)
+    handler.setFormatter(logging.Formatter("%(asctime)-15s - %(levelname)s - %(name)-8s - %(message)s"))
+
+    root = logging.getLogger()
+    root.addHandler(handler)
+    logging.captureWarnings(True)
+    try:
+        log_version()
+        yield
+    finally:
+        root.removeHandler(handler)
+        handler.close()
+
+
+def _read_header_keywords(path: Path, keys: Iterable[str]) -> dict[str, Any]:
+    """Find some keywords in the primary header of a FITS file, without parsing the other cards
+
+    Reading stops at the END card, or as soon as all keywords have been found.
+    Only the matching cards are parsed by astropy.
+    Raises ValueError for anything that this simple scan does not handle (e.g. CONTINUE cards),
+    so that the caller can fall back to reading the full header.
+    """
+    # Header card keyword -> requested keys, HIERARCH keywords are stored without the prefix
+    wanted = {}
+    for key in keys:
+        name = key.removeprefix("HIERARCH ").upper()
+        if name in ("COMMENT", "HISTORY", "CONTINUE"):
+            raise ValueError(f"Commentary keyword {key} can not be read from a single card")
+        wanted.setdefault(name, []).append(key)
+
+    values = {}
+    opener = gzip.open if str(path).endswith(".gz") else open
+    with opener(path, "rb") as file:
+        while wanted:
+            block = file.read(fits.Card.length * 36)
+            if len(block) < fits.Card.length * 36:
+                raise ValueError(f"Truncated header in {path}")
+            for i in range(0, len(block), fits.Card.length):
+                card = block[i:i + fits.Card.length].decode("ascii")
+                name = card[:8].rstrip()
+                if name == "END":
+                    return values
+                if name == "HIERARCH":
+                    name = card[9:card.find("=")].strip().upper()
+                if name in wanted:
+                    value = fits.Card.fromstring(card).value
+                    if isinstance(value, str) and value.endswith("&"):
+                        raise ValueError(f"Keyword {name} continues over several cards")
+                    # Like astropy, use the first card with a repeated keyword
+                    for key in wanted.pop(name):
+                        values[key] = value
+    return values
+
+
+def file_fingerprint(path: Path) -> tuple[int, int, str]:
+    """Identify the contents of a file, e.g. to tell whether an input has changed since the last run
+
+    The contents are only hashed again once the size or modification time of the file change.
+
+    Parameters
+    ----------
+    path : str, Path
+        the file
+
+    Returns
+    -------
+    size : int
+        size of the file in bytes
+    mtime_ns : int
+        modification time in nanoseconds
+    digest : str
+        blake2b hash of the contents
+    """
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns, _file_digest(os.fspath(path), stat.st_size, stat.st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=1024)
+def _file_digest(path: str, size: int, mtime_ns: int) -> str:
+    """Hash a file straight from its memory map, without copying it into Python objects"""
+    digest = hashlib.blake2b(digest_size=16)
+    # Empty files can not be memory mapped
+    if size > 0:
+        with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if hasattr(mmap, "MADV_SEQUENTIAL"):
+                mapped.madvise(mmap.MADV_SEQUENTIAL)
+            digest.update(mapped)
+    return digest.hexdigest()
+
+
+def read_header_fast(path: Path, keys: Iterable[str] = None) -> fits.Header | dict[str, Any]:
+    """Read the primary header of a FITS file, or just some of its keywords
+
+    If only some keywords are requested, fitsio is used to read the header if it is installed.
+    Otherwise only the requested cards are parsed from the raw header.
+    Full headers are read by astropy without memory mapping or scaling the data.
+
+    Parameters
+    ----------
+    path : Path
+        FITS file to read
+    keys : Iterable[str], optional
+        keywords to read. If None the full header is returned (default: None)
+
+    Returns
+    -------
+    header : fits.Header, dict[str, Any]
+        the full header, or a dictionary with those of the requested keywords that are present
+    """
+    if keys is None:
+        return fits.getheader(path, memmap=False, do_not_scale_image_data=True)
+
+    if fitsio is not None:
+        header = fitsio.read_header(str(path))
+        values = {}
+        for key in keys:
+            for name in (key, key.removeprefix("HIERARCH "), f"HIERARCH {key}"):
+                if name in header:
+                    values[key] = header[name]
+                    break
+        return values
+
+    try:
+        return _read_header_keywords(path, keys)
+    except (ValueError, UnicodeDecodeError, fits.VerifyError):
+        header = fits.getheader(path, memmap=False, do_not_scale_image_data=True)
+        return {key: header[key] for key in keys if key in header}
+
+
+# Headers that have been verified (and fixed) by verified_header, by their content
+_verified_headers: dict[str, fits.Header] = {}
+_verified_headers_size = 32
+
+
+def verified_header(header: fits.Header) -> fits.Header:
+    """A copy of header with all cards verified and fixed, so that it can be written with output_verify="ignore"
+
+    Verifying every card of long instrument headers is slow, and the same header is often written
+    several times (e.g. for each product of a step). The verified copies are therefore remembered
+    by the content of the header, so that each distinct header is only verified once.
+
+    Parameters
+    ----------
+    header : fits.Header
+        header to verify, it is not modified
+
+    Returns
+    -------
+    header : fits.Header
+        verified copy of the header, it must not be modified
+    """
+    key = header.tostring()
+    verified = _verified_headers.get(key)
+    if verified is None:
+        hdu = fits.PrimaryHDU(header=header)
+        hdu.verify("silentfix+ignore")
+        verified = hdu.header
+        if len(_verified_headers) >= _verified_headers_size:
+            # Forget the oldest header
+            _verified_headers.pop(next(iter(_verified_headers)), None)
+        _verified_headers[key] = verified
+    return verified
+
+
+# Keywords that describe the layout of the data, FITS writers set these themselves
+_structural_keywords = re.compile(r"SIMPLE|BITPIX|NAXIS\d*|EXTEND|XTENSION|PCOUNT|GCOUNT|BZERO|BSCALE")
+
+
+def write_fits(path: Path, data: np.ndarray, header: fits.Header, *extensions: np.ndarray,
+               compress: bool = False) -> None:
+    """Write an image, and optionally further images as extensions, to a (new) FITS file
+
+    Uses fitsio if it is installed, which writes images considerably faster than astropy.
+    Otherwise, or if fitsio rejects the header, astropy is used.
+
+    With compress, the images are tile compressed with RICE, in extensions after an empty primary HDU
+    (see image_hdu). Floating point images are quantized relative to their noise, so this is lossy,
+    but the files are several times smaller.
+
+    If the environment variable PYREDUCE_LOCALBUFF names a directory (e.g. /dev/shm), the file is
+    written there first and then moved to path in one go. This avoids the many small writes of the
+    FITS writers on network file systems, which are slow at those.
+
+    Parameters
+    ----------
+    path : str, Path
+        FITS file to write, it is overwritten if it exists
+    data : array
+        primary image
+    header : fits.Header
+        primary header
+    *extensions : array
+        images of the extensions, without headers
+    compress : bool, optional
+        whether to tile compress the images (default: False)
+    """
+    staging_dir = os.environ.get("PYREDUCE_LOCALBUFF")
+    if not staging_dir:
+        _write_fits(path, data, header, *extensions, compress=compress)
+        return
+
+    staged = os.path.join(staging_dir, f"{uuid.uuid4().hex}.fits")
+    try:
+        _write_fits(staged, data, header, *extensions, compress=compress)
+        shutil.move(staged, path)
+    finally:
+        if os.path.exists(staged):
+            os.remove(staged)
+
+
+def _write_fits(path: Path, data: np.ndarray, header: fits.Header, *extensions: np.ndarray,
+                compress: bool = False) -> None:
+    if compress:
+        def compressed(image, image_header=None):
+            # Tiles of 64 full rows
+            return fits.CompImageHDU(data=image, header=image_header, compression_type="RICE_1",
+                                     tile_shape=(64, *np.shape(image)[1:]))
+
+        hdus = fits.HDUList([fits.PrimaryHDU(), compressed(data, verified_header(header))]
+                            + [compressed(e) for e in extensions])
+        hdus.writeto(path, overwrite=True, output_verify="ignore")
+        return
+
+    if fitsio is not None:
+        records = [{"name": card.keyword, "value": card.value, "comment": card.comment}
+                   for card in header.cards
+                   if card.keyword != "" and not _structural_keywords.fullmatch(card.keyword)]
+        try:
+            with fitsio.FITS(os.fspath(path), "rw", clobber=True) as file:
+                file.write(np.ma.getdata(data), header=records)
+                for extension in extensions:
+                    file.write(np.ma.getdata(extension))
+            return
+        except (OSError, ValueError, TypeError) as e:
+            logger.debug("fitsio could not write %s, using astropy instead: %s", path, e)
+
+    hdus = fits.HDUList([fits.PrimaryHDU(data=data, header=verified_header(header))]
+                        + [fits.ImageHDU(data=extension) for extension in extensions])
+    hdus.writeto(path, overwrite=True, output_verify="ignore")
+
+
+#: Files larger than this (in bytes) are memory mapped by open_fits, smaller ones are read at once
+memmap_threshold = 16 << 20
+
+
+def open_fits(path: Path) -> fits.HDUList:
+    """Open a FITS file, memory mapping only large files
+
+    Small files are faster to read in one go than through a memory map, which pages them in a bit
+    at a time. Large ones are mapped, so that only the parts that are accessed are read.
+
+    Parameters
+    ----------
+    path : str, Path
+        FITS file to open
+
+    Returns
+    -------
+    hdu : fits.HDUList
+        the opened file
+    """
+    if os.stat(path).st_size > memmap_threshold:
+        return fits.open(path, memmap=True, lazy_load_hdus=True)
+    return fits.open(path, memmap=False)
+
+
+def image_hdu(hdus: fits.HDUList, index: int = 0) -> fits.ImageHDU | fits.CompImageHDU | fits.PrimaryHDU:
+    """The HDU of the index-th image in a file from write_fits, whether it was tile compressed or not"""
+    if len(hdus) > 1 and isinstance(hdus[1], fits.CompImageHDU):
+        return hdus[index + 1]
+    return hdus[index]
+
+
+#: Number of files that read_files reads at the same time
+max_concurrent_reads = 16
+
+
+def read_files(read: Callable[[str], Any], files: list[str]) -> list:
+    """Read several files at the same time, in threads
+
+    Reading is mostly waiting for the disk, so threads are enough to overlap it.
+
+    Parameters
+    ----------
+    read : callable
+        function that reads one file, given its name
+    files : list[str]
+        files to read
+
+    Returns
+    -------
+    results : list
+        what read returned for each file, in the same order
+    """
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(max_concurrent_reads, len(files)))) as executor:
+        return list(executor.map(read, files))
+
+
+def load_npz(path: Path, allow_pickle: bool = False) -> dict[str, np.ndarray]:
+    """Read all arrays of a .npz archive (e.g. from np.savez), memory mapping the large ones
+
+    np.load ignores mmap_mode for .npz archives, and reads each array completely.
+    Arrays that are stored uncompressed and are larger than memmap_threshold are instead mapped
+    straight from the archive (copy on write), so that only the parts that are used are read.
+
+    Parameters
+    ----------
+    path : str, Path
+        archive to read
+    allow_pickle : bool, optional
+        whether to allow pickled object arrays, only for trusted files (default: False)
+
+    Returns
+    -------
+    arrays : dict[str, np.ndarray]
+        the arrays by their name in the archive
+    """
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as file:
+        for info in archive.infolist():
+            name = info.filename.removesuffix(".npy")
+            if info.compress_type == zipfile.ZIP_STORED and info.file_size > memmap_threshold:
+                # The data starts after the local file header, whose extra field may differ from the central one
+                file.seek(info.header_offset)
+                name_length, extra_length = struct.unpack("<HH", file.read(30)[26:30])
+                file.seek(info.header_offset + 30 + name_length + extra_length)
+                version = np.lib.format.read_magic(file)
+                read_header = {(1, 0): np.lib.format.read_array_header_1_0,
+                               (2, 0): np.lib.format.read_array_header_2_0}.get(version)
+                if read_header is not None:
+                    shape, fortran_order, dtype = read_header(file)
+                    if not dtype.hasobject:
+                        arrays[name] = np.memmap(path, dtype=dtype, mode="c", offset=file.tell(), shape=shape,
+                                                 order="F" if fortran_order else "C")
+                        continue
+            with archive.open(info) as member:
+                arrays[name] = np.lib.format.read_array(member, allow_pickle=allow_pickle)
+    return arrays
+
+
 def vac2air(wl_vac: np.ndarray[float]) -> np.ndarray[float]:
     """
     Convert vacuum wavelengths to wavelengths in air
@@ -568,6 +963,7 @@ def plot2d(x, y, z, coeff, title=None):
         np.linspace(np.min(x), np.max(x), 20), np.linspace(np.min(y), np.max(y), 20)
     )
     Z = np.polynomial.polynomial.polyval2d(X, Y, coeff)
+    import matplotlib.pyplot as plt
     fig = plt.figure()
     ax = fig.gca(projection="3d")
     ax.plot_surface(X, Y, Z, rstride=1, cstride=1, alpha=0.2)
@@ -699,6 +1095,7 @@ def polyfit2d_2(x, y, z, degree=1, x0=None, loss="arctan", method="trf", plot=Fa
             np.linspace(np.min(x), np.max(x), 20), np.linspace(np.min(y), np.max(y), 20)
         )
         Z = np.polynomial.polynomial.polyval2d(X, Y, coef)
+        import matplotlib.pyplot as plt
         fig = plt.figure()
         ax = fig.gca(projection="3d")
         ax.plot_surface(X, Y, Z, rstride=1, cstride=1, alpha=0.2)
@@ -1177,14 +1574,14 @@ def opt_filter(y, par, par1=None, weight=None, lambda2=-1, maxiter=100):
             # RHS
             b = weight * y
 
-            f = solve_banded((2, 2), aij, b)
+            f = _solve_symmetric_banded(aij, b)
         else:
             a = np.full(n, -abs(par))
             b = np.copy(weight) + abs(par)
             b[1:-1] += abs(par)
             aba = np.array([a, b, a])
 
-            f = solve_banded((1, 1), aba, weight * y)
+            f = _solve_symmetric_banded(aba, weight * y)
 
         return f
     else:
@@ -1229,11 +1626,28 @@ def opt_filter(y, par, par1=None, weight=None, lambda2=-1, maxiter=100):
         return model
 
 
+def _solve_symmetric_banded(ab: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Solve a symmetric banded system, given in the (l, u) band storage of solve_banded with l == u
+
+    With non-negative weights the systems of opt_filter are positive definite, so they are solved
+    by a Cholesky decomposition, which is about twice as fast as the LU decomposition of solve_banded.
+    Otherwise fall back to solve_banded.
+    """
+    u = ab.shape[0] // 2
+    try:
+        return solveh_banded(ab[: u + 1], b)
+    except LinAlgError:
+        return solve_banded((u, u), ab, b)
+
+
 def helcorr(obs_long, obs_lat, obs_alt, ra2000, dec2000, jd, system="barycentric"):
     """
     calculates heliocentric Julian date, barycentric and heliocentric radial
     velocity corrections, using astropy functions
 
+    All position and time arguments may also be arrays of the same shape,
+    to calculate the corrections of several observations at once
+
     Parameters
     ---------
     obs_long : float
@@ -1254,9 +1668,9 @@ def helcorr(obs_long, obs_lat, obs_alt, ra2000, dec2000, jd, system="barycentric
 
     Returns
     -------
-    correction : float
+    correction : float, array
         radial velocity correction due to barycentre offset
-    hjd : float
+    hjd : float, array
         Heliocentric Julian date for middle of exposure
     """
 
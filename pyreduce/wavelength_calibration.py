@@ -4,8 +4,6 @@ Loosely based on the IDL wavecal function
 """
 
 import logging
-import corner
-import emcee
 import matplotlib.pyplot as plt
 import numpy as np
 
@@ -225,8 +223,9 @@ class LineList:
 
     @classmethod
     def load(cls, filename):
-        data = np.load(filename, allow_pickle=True)
-        linelist = cls(data["cs_lines"])
+        # The line lists have an object field (APPROX), so they can only be read with pickles
+        with np.load(filename, allow_pickle=True) as data:
+            linelist = cls(data["cs_lines"])
         return linelist
 
     def save(self, filename):
@@ -1650,6 +1649,9 @@ class WavelengthCalibrationInitialize(WavelengthCalibration):
         coef : array
             polynomial coefficients in numpy order
         """
+        # emcee is slow to import, and only needed for this initial guess
+        import emcee
+
         spectrum = np.asarray(spectrum)
 
         assert self.degree >= 2, "The polynomial degree must be at least 2"
@@ -1754,6 +1756,8 @@ class WavelengthCalibrationInitialize(WavelengthCalibration):
         coef = mid * factors
 
         if self.plot:
+            import corner
+
             fig = corner.corner(samples, truths=mid)
             plt.show()
 
@@ -1,3 +1,4 @@
+import datetime
 import os
 import tempfile
 from os.path import dirname, join
@@ -341,6 +342,28 @@ def step_args(instr, mode, target, night, output_dir, order_range):
     return instr, mode, target, night, output_dir, order_range
 
 
+@pytest.fixture
+def make_step(tmp_path):
+    """Create steps for UVES in the middle mode, which write their files to tmp_path
+
+    Unlike step_args, this does not need a dataset
+
+    Returns
+    -------
+    make_step : callable
+        make_step(step_class, name, **overrides) creates a step_class object, with the default settings of
+        step `name`, updated with `overrides`
+    """
+    config = configuration.get_configuration_for_instrument("UVES", plot=False)
+    instrument = instruments.instrument_info.load_instrument("UVES")
+
+    def make_step(step_class, name, **overrides):
+        settings = {**config[name], **overrides}
+        return step_class(instrument, "middle", "target", datetime.date(2020, 1, 1), str(tmp_path), None, **settings)
+
+    return make_step
+
+
 @pytest.fixture
 def mask(step_args, settings):
     """Load the bad pixel mask for this instrument/mode
@@ -4,6 +4,7 @@ from astropy.io import fits
 
 from pyreduce import instruments
 from pyreduce.combine_frames import combine_bias
+from pyreduce.steps import Bias
 
 
 def test_bias(instrument, mode, files, mask):
@@ -63,3 +64,18 @@ def test_simple_input(tempfiles):
     assert bias.shape[0] == 100
     assert bias.shape[1] == 100
     assert np.all(bias == sum(range(n)) / n)
+
+
+def test_save_load_polynomial(make_step):
+    step = make_step(Bias, "bias", degree=2)
+
+    coefficients = np.random.default_rng(0).normal(size=(3, 10, 12))
+    step.save(coefficients, fits.Header())
+
+    mask = np.zeros((10, 12), dtype=bool)
+    mask[2, 3] = True
+    bias, bhead = step.load(mask)
+    assert bias.shape == (3, 10, 12)
+    assert np.allclose(bias.data, coefficients.astype(np.float32))
+    assert np.all(bias.mask[:, 2, 3])
+    assert bias.mask.sum() == 3
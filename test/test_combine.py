@@ -79,6 +79,13 @@ def test_combine_frames(tempfiles):
     assert chead["exptime"] == len(tempfiles)
 
 
+def test_prefetch(tmp_path):
+    fname = tmp_path / "frame.fits"
+    create_file(fname, 10, 10, 1)
+    # Only a hint to the operating system, missing files are ignored
+    combine_frames.prefetch([fname, tmp_path / "missing.fits"])
+
+
 def test_nofiles():
     files = []
     with pytest.raises(ValueError):
@@ -27,6 +27,18 @@ def test_configuration():
         config = conf.load_config(["settings_UVES.json"], "UVES", 1)
 
 
+def test_load_config_file_is_cached(tmp_path):
+    fname = tmp_path / "settings.json"
+    fname.write_text('{"__instrument__": "UVES", "orders": {"degree": 3}}')
+
+    config = conf.load_config(fname, "UVES")
+    assert config["orders"]["degree"] == 3
+    # Changes by the caller do not end up in the cache
+    config["orders"]["degree"] = 5
+    assert conf.load_config(fname, "UVES")["orders"]["degree"] == 3
+    assert conf._load_config_file.cache_info().hits >= 1
+
+
 def test_update():
     dict1 = {"bla": 0, "blub": {"foo": 0, "bar": 0}}
     dict2 = {"bla": 1, "blub": {"bar": 1}}
@@ -1,8 +1,11 @@
 # -*- coding: utf-8 -*-
+
 import numpy as np
 import pytest
 
 from pyreduce.continuum_normalization import continuum_normalize, splice_orders
+from pyreduce.steps import ContinuumNormalization
+from pyreduce.steps.continuum import _stack
 
 
 @pytest.fixture
@@ -73,3 +76,49 @@ def test_continuum(spliced):
     assert new.ndim == 2
     assert new.shape[0] == spec.shape[0]
     assert new.shape[1] == spec.shape[1]
+
+
+def test_continuum_step_keeps_blaze(make_step):
+    nord, ncol = 3, 300
+    x = np.linspace(-1, 1, ncol)
+    blaze = np.ma.masked_array(np.tile(1000 * (1 - 0.5 * x ** 2), (nord, 1)))
+    wave = np.array([np.linspace(5000 + 80 * i, 5100 + 80 * i, ncol) for i in range(nord)])
+    rng = np.random.default_rng(0)
+    specs = [np.ma.masked_array(blaze.data * (1 + 0.01 * rng.normal(size=blaze.shape))) for _ in range(2)]
+    sigmas = [np.ma.masked_array(np.full(blaze.shape, 10.0)) for _ in range(2)]
+
+    step = make_step(ContinuumNormalization, "continuum")
+    original = blaze.copy()
+    _, _, _, conts, _ = step.run(([None, None], specs, sigmas, [None, None]), wave, (None, blaze))
+
+    # The flat field is not rescaled by the splicing, so both (similar) spectra get a similar continuum
+    assert np.all(blaze == original)
+    assert np.allclose(conts[0], conts[1], rtol=0.1)
+    # All spectra have the same shape, so they are returned as one array each
+    assert isinstance(conts, np.ndarray) and conts.shape == (2, nord, ncol)
+
+
+def test_stack():
+    stacked = _stack([np.ma.masked_array(np.ones((2, 3)), mask=[[0, 1, 0], [0, 0, 0]]), np.ma.zeros((2, 3))])
+    assert stacked.shape == (2, 2, 3)
+    assert stacked.mask[0, 0, 1] and not stacked.mask[1].any()
+    # Observations of different shapes stay a list
+    ragged = [np.ones((2, 3)), np.ones((2, 4))]
+    assert isinstance(_stack(ragged), list) and len(_stack(ragged)) == 2
+    assert _stack([None, None]) == [None, None]
+
+
+def test_continuum_save_load(make_step):
+    step = make_step(ContinuumNormalization, "continuum")
+    specs = np.ma.masked_array(np.arange(24.0).reshape(2, 3, 4), mask=np.arange(24).reshape(2, 3, 4) % 5 == 0)
+    ragged = [np.ma.masked_array(np.ones((3, 4)), mask=True), np.ma.ones((3, 5))]
+    columns = np.zeros((2, 3, 2), dtype=int)
+    step.save([None, None], specs, specs * 2, ragged, columns)
+
+    heads, specs2, sigmas, conts, columns2 = step.load(None, None)
+    assert isinstance(specs2, np.ma.MaskedArray)
+    assert np.array_equal(specs2.mask, specs.mask) and np.ma.allequal(specs2, specs)
+    assert np.ma.allequal(sigmas, specs * 2)
+    # Lists of arrays with different shapes are stored as they are
+    assert isinstance(conts, list) and conts[0].mask.all()
+    assert np.array_equal(columns2, columns)
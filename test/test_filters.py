@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+import datetime
+
+import numpy as np
+
+from pyreduce.instruments.filters import Filter, parse_date
+
+
+def make_filter(values, **kwargs):
+    fil = Filter("OBJECT", **kwargs)
+    for v in values:
+        fil.collect({"OBJECT": v})
+    return fil
+
+
+def test_match_repeated_values():
+    fil = make_filter(["BIAS", "FLAT", "BIAS", "bias", "BIAS_LONG", None])
+
+    # Without regex, the value is matched as a prefix, ignoring the case
+    match = fil.match("BIAS")
+    assert np.array_equal(match, [True, False, True, True, True, False])
+
+    fil = make_filter(["BIAS", "FLAT", "BIAS", "bias", "BIAS_LONG", None], regex=True)
+    match = fil.match("BIAS")
+    assert np.array_equal(match, [True, False, True, True, False, False])
+
+
+def test_match_after_collect():
+    fil = make_filter(["BIAS", "FLAT"])
+    assert np.array_equal(fil.match("FLAT"), [False, True])
+
+    fil.collect({"OBJECT": "FLAT"})
+    assert np.array_equal(fil.match("FLAT"), [False, True, True])
+
+    fil.clear()
+    assert len(fil.match("FLAT")) == 0
+
+
+def test_classify():
+    fil = make_filter(["BIAS", "FLAT", "BIAS"])
+    data = fil.classify(None)
+    data = {k: list(v) for k, v in data}
+    assert data == {"BIAS": [True, False, True], "FLAT": [False, True, False]}
+
+
+def test_parse_date():
+    assert parse_date("2020-01-02") == datetime.date(2020, 1, 2)
+    assert parse_date("2020-01-02T23:59:59.123") == datetime.date(2020, 1, 2)
+    # Not ISO 8601, handled by dateutil
+    assert parse_date("Jan 2 2020") == datetime.date(2020, 1, 2)
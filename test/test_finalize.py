@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+from astropy.io import fits
+
+from pyreduce import util
+from pyreduce.steps import Finalize, finalize
+
+
+@pytest.mark.parametrize("num_workers", [1, 2])
+def test_finalize(make_step, num_workers):
+    step = make_step(Finalize, "finalize", num_workers=num_workers)
+
+    nord, ncol = 3, 20
+    heads = [fits.Header({"e_input": f"science_{i}.fits", "e_jd": 2459000.5 + i}) for i in range(3)]
+    spectra = [np.ones((nord, ncol)) for _ in heads]
+    columns = [np.tile([0, ncol], (nord, 1)) for _ in heads]
+    wave = np.tile(np.linspace(5000, 5100, ncol), (nord, 1))
+
+    fnames = step.run((heads, spectra, spectra, spectra, columns), wave, {"finalize": {"num_workers": num_workers}})
+    assert fnames == [step.output_file(i, f"science_{i}") for i in range(3)]
+    for i, fname in enumerate(fnames):
+        with fits.open(fname) as hdu:
+            assert hdu[0].header["e_jd"] == 2459000.5 + i
+    # The headers of the output files are also returned to the caller
+    assert all(head["HIERARCH PR_version"] for head in heads)
+
+
+def test_save_config_to_header(make_step):
+    step = make_step(Finalize, "finalize")
+    settings = {"a": 1, "plot": True, "b": {"c": None, "d": [1, 2], "e": {"f": "x"}}, "g": 2.5}
+    head = step.save_config_to_header(fits.Header(), settings)
+    assert list(head.items()) == [("PR A", 1), ("PR B C", "null"), ("PR B D", "[1,2]"), ("PR B E F", "x"),
+                                  ("PR G", 2.5)]
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_config_to_json(monkeypatch, use_orjson):
+    if not use_orjson:
+        monkeypatch.setattr(finalize, "orjson", None)
+    elif finalize.orjson is None:
+        pytest.skip("orjson is not installed")
+    assert finalize._to_json([1, None, "a", True]) == '[1,null,"a",true]'
+    assert finalize._to_json(np.array([[1.5, 2]])) == "[[1.5,2.0]]"
+    assert finalize._to_json({1, 2}) == "{1, 2}"
+    # Long values are continued on the next card
+    head = fits.Header(finalize._config_cards({"a": list(range(50))}, "PR"))
+    assert head["PR A"] == finalize._to_json(list(range(50)))
+
+
+def test_heliocentric_corrections():
+    keys = {"e_obslon": -70.4, "e_obslat": -24.6, "e_obsalt": 2635.0, "e_ra": 5.5, "e_dec": -20.0}
+    heads = [fits.Header({**keys, "e_jd": 58000.1 + i}) for i in range(3)]
+    heads.insert(1, fits.Header({"e_jd": 58000.5}))
+
+    corrections = Finalize.heliocentric_corrections(heads)
+    # The same as calculating them one at a time
+    for head, correction in zip(heads[::2], corrections[::2]):
+        expected = util.helcorr(*(head[key] for key in [*keys, "e_jd"]))
+        assert np.allclose(correction, expected, rtol=0, atol=1e-9)
+    # Headers without the observatory position get no correction
+    assert corrections[1] == (0, 58000.5)
+
+
+def test_heliocentric_corrections_sexagesimal():
+    keys = {"e_obslon": -70.4, "e_obslat": -24.6, "e_obsalt": 2635.0, "e_jd": 58000.1}
+    heads = [fits.Header({**keys, "e_ra": "05:30:00", "e_dec": "-20:00:00"}),
+             fits.Header({**keys, "e_ra": 5.5, "e_dec": -20.0}),
+             fits.Header({**keys, "e_ra": None, "e_dec": -20.0})]
+    corrections = Finalize.heliocentric_corrections(heads)
+    # The positions are parsed by astropy, as for a single exposure
+    assert np.allclose(corrections[0], util.helcorr(-70.4, -24.6, 2635.0, "05:30:00", "-20:00:00", 58000.1))
+    assert np.allclose(corrections[0], corrections[1])
+    # Headers without a value get no correction
+    assert corrections[2] == (0, 58000.1)
+
+    # An invalid position only loses the correction of its own exposure
+    heads[2]["e_ra"] = "nowhere"
+    corrections = Finalize.heliocentric_corrections(heads)
+    assert np.allclose(corrections[0], corrections[1])
+    assert corrections[2] == (0, 58000.1)
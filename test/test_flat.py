@@ -5,8 +5,9 @@ import numpy as np
 import pytest
 from astropy.io import fits
 
-from pyreduce import instruments
+from pyreduce import instruments, util
 from pyreduce.combine_frames import combine_calibrate
+from pyreduce.steps import Flat
 
 
 def test_flat(instrument, mode, files, mask):
@@ -77,3 +78,25 @@ def test_simple(tempfiles):
     assert flat.shape[0] == 200
     assert flat.shape[1] == 100
     assert np.all(flat == 5 * n)
+
+
+@pytest.mark.parametrize("memmap", [False, True])
+@pytest.mark.parametrize("compress", [False, True])
+def test_save_load(make_step, monkeypatch, compress, memmap):
+    if memmap:
+        # The file is closed after loading, the mapped data must stay readable
+        monkeypatch.setattr(util, "memmap_threshold", 0)
+    step = make_step(Flat, "flat", compress=compress)
+
+    rng = np.random.default_rng(0)
+    flat = rng.poisson(5000, size=(128, 100)).astype(np.float32)
+    step.save(flat, fits.Header({"OBJECT": "flat"}))
+
+    mask = np.zeros(flat.shape, dtype=bool)
+    loaded, fhead = step.load(mask)
+    assert fhead["OBJECT"] == "flat"
+    if compress:
+        # Quantized well below the noise of about 70
+        assert np.allclose(loaded, flat, atol=10)
+    else:
+        assert np.array_equal(loaded, flat)
@@ -1,8 +1,11 @@
 # -*- coding: utf-8 -*-
+import os
 from glob import glob
 from os.path import basename, dirname, exists, join
 
+import numpy as np
 import pytest
+from astropy.io import fits
 
 from pyreduce.configuration import get_configuration_for_instrument
 from pyreduce.instruments import instrument, instrument_info
@@ -35,6 +38,26 @@ def test_load_common():
     assert isinstance(instr, instrument.COMMON)
 
 
+def test_load_instrument_ignores_case():
+    instr = instrument_info.load_instrument("uves")
+    assert instr is instrument_info.load_instrument("UVES")
+    assert instr.name == "uves"
+
+    with pytest.raises(ValueError):
+        instrument_info.load_instrument("not_an_instrument")
+
+
+@pytest.mark.parametrize("dtype", [np.float64, np.float32, "f4", None])
+def test_load_fits_dtype(tmp_path, dtype):
+    fname = tmp_path / "image.fits"
+    fits.writeto(fname, np.arange(12, dtype=np.uint16).reshape(3, 4))
+    instr = instrument_info.load_instrument(None)
+
+    data, _ = instr.load_fits(fname, "", extension=0, dtype=dtype)
+    assert data.dtype == (np.uint16 if dtype is None else np.dtype(dtype))
+    assert np.array_equal(data, np.arange(12).reshape(3, 4))
+
+
 def test_load_instrument(supported_instrument):
     instr = instrument_info.load_instrument(supported_instrument)
     assert isinstance(instr, instrument.Instrument)
@@ -96,3 +119,19 @@ def test_get_wavecal_name(supported_instrument, supported_modes):
         wname = instrument_info.get_wavecal_filename({}, supported_instrument, mode)
         assert isinstance(wname, str)
         assert exists(wname)
+
+
+def test_scan_dir_is_cached(tmp_path):
+    for name in ["a.fits", "b.fits"]:
+        fits.PrimaryHDU(header=fits.Header({"OBJECT": name})).writeto(tmp_path / name)
+
+    scan = instrument.Instrument.scan_dir(tmp_path)
+    assert sorted(f.name for f, _ in scan) == ["a.fits", "b.fits"]
+    assert all(h["OBJECT"] == f.name for f, h in scan)
+    assert instrument.Instrument.scan_dir(tmp_path) is scan
+
+    # New files in the directory invalidate the cached scan
+    fits.PrimaryHDU().writeto(tmp_path / "c.fits")
+    os.utime(tmp_path, ns=(0, 0))
+    scan = instrument.Instrument.scan_dir(tmp_path)
+    assert len(scan) == 3
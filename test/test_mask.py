@@ -6,6 +6,8 @@ import numpy as np
 import pytest
 
 from pyreduce import util
+from pyreduce.steps import Mask
+from pyreduce.steps import mask as mask_step
 
 
 @pytest.fixture
@@ -25,3 +27,34 @@ def test_load_mask(instr, mode, mask_dir):
 
     assert isinstance(mask, np.ndarray)
     assert not np.all(mask)
+
+
+def test_mask_step(make_step):
+    step = make_step(Mask, "mask")
+    mask = step.run()
+
+    expected, _ = step.instrument.load_fits(step.instrument.get_mask_filename(mode="middle"), "middle", extension=0)
+    assert mask.dtype == bool
+    assert np.array_equal(mask, ~expected.data.astype(bool))
+
+
+def test_mask_step_cached(make_step, monkeypatch):
+    mask_step._load_mask.cache_clear()
+    step = make_step(Mask, "mask")
+    instrument = step.instrument
+
+    loaded = []
+    load_fits = instrument.load_fits
+
+    def counting_load_fits(*args, **kwargs):
+        loaded.append(args)
+        return load_fits(*args, **kwargs)
+
+    monkeypatch.setattr(instrument, "load_fits", counting_load_fits)
+    first = step.run()
+    second = step.run()
+    assert len(loaded) == 1
+    # Each step gets its own copy
+    assert np.array_equal(first, second) and first is not second
+    first[:] = False
+    assert not np.array_equal(first, step.run())
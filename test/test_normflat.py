@@ -1,8 +1,10 @@
 # -*- coding: utf-8 -*-
+
 import numpy as np
 import pytest
 
 from pyreduce.extract import extract
+from pyreduce.steps import NormalizeFlatField, normalize_flatfield
 
 
 def test_normflat(flat, orders, settings, order_range, scatter, instrument):
@@ -50,3 +52,55 @@ def test_normflat(flat, orders, settings, order_range, scatter, instrument):
         cr = column_range[j]
         assert np.all(blaze[i, : cr[0]].mask == True)
         assert np.all(blaze[i, cr[1] :].mask == True)
+
+
+def test_save_load(make_step):
+    step = make_step(NormalizeFlatField, "norm_flat")
+    assert step.load() == (None, None)
+
+    rng = np.random.default_rng(0)
+    norm, blaze = rng.random((10, 12)), rng.random((3, 12))
+    step.save(norm, blaze)
+    norm2, blaze2 = step.load()
+    assert np.array_equal(norm2, norm) and np.array_equal(blaze2, blaze)
+
+
+def test_save_load_low_precision(make_step):
+    step = make_step(NormalizeFlatField, "norm_flat", low_precision_norm=True)
+
+    rng = np.random.default_rng(0)
+    norm, blaze = rng.uniform(0.5, 1.5, (10, 12)), rng.random((3, 12))
+    step.save(norm, blaze)
+    norm2, blaze2 = step.load()
+    assert norm2.dtype == np.float32
+    assert np.allclose(norm2, norm, rtol=1e-3, atol=0)
+    assert np.array_equal(blaze2, blaze)
+
+
+def test_run_fills_invalid(make_step, monkeypatch):
+    step = make_step(NormalizeFlatField, "norm_flat")
+    norm = np.array([[0.9, np.nan], [1.1, 1.0]])
+    blaze = np.ma.masked_array([[5.0, 6.0, 7.0]], mask=[[False, True, False]])
+    monkeypatch.setattr(normalize_flatfield, "extract", lambda *args, **kwargs: (norm, None, blaze, None))
+
+    flat = np.ones((2, 2)), {"e_gain": 1, "e_readn": 0, "e_drk": 0}
+    norm2, blaze2 = step.run(flat, (None, None), None, (None, None))
+    assert np.array_equal(norm2, [[0.9, 1.0], [1.1, 1.0]])
+    assert not np.ma.isMaskedArray(blaze2) and np.array_equal(blaze2, [[5.0, 0.0, 7.0]])
+    assert np.array_equal(step.load()[0], norm2)
+
+
+@pytest.mark.parametrize("threshold", [0.05, 0.6, 1])
+def test_run_threshold_percentile(make_step, monkeypatch, threshold):
+    step = make_step(NormalizeFlatField, "norm_flat", threshold=threshold)
+    used = {}
+
+    def fake_extract(img, orders, **kwargs):
+        used.update(kwargs)
+        return np.ones(img.shape), None, np.ones((1, img.shape[1])), None
+
+    monkeypatch.setattr(normalize_flatfield, "extract", fake_extract)
+    img = np.random.default_rng(0).random((30, 40))
+    flat = np.ma.masked_array(img, mask=img > 0.9), {"e_gain": 1, "e_readn": 0, "e_drk": 0}
+    step.run(flat, (None, None), None, (None, None))
+    assert np.isclose(used["threshold"], np.percentile(img, threshold * 100))
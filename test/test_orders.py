@@ -1,10 +1,12 @@
 # -*- coding: utf-8 -*-
+
 import numpy as np
 import pytest
 
 from pyreduce import util
+from pyreduce.steps import OrderTracing
 from pyreduce.combine_frames import combine_frames
-from pyreduce.trace_orders import mark_orders
+from pyreduce.trace_orders import calculate_mean_cluster_thickness, mark_orders
 
 
 def test_orders(instr, instrument, mode, files, settings, mask):
@@ -61,6 +63,18 @@ def test_simple():
     assert column_range[0, 1] == 100
 
 
+@pytest.mark.parametrize("scale", [1, 1e8])
+def test_simple_large_values(scale):
+    # Values beyond the range of 32 bit integers are traced as well
+    img = np.full((100, 100), 1.0 * scale)
+    img[45:56, :] = 100 * scale
+
+    orders, column_range = mark_orders(img, manual=False, opower=1, plot=False, border_width=0, noise=scale)
+
+    assert orders.shape[0] == 1
+    assert np.allclose(orders[0], [0, 50])
+
+
 def test_parameters():
     img = np.full((100, 100), 1)
     img[45:56, :] = 100
@@ -83,3 +97,50 @@ def test_parameters():
         mark_orders(img, opower="bla")
     with pytest.raises(ValueError):
         mark_orders(img, opower=-1)
+
+
+def test_save_load(make_step):
+    step = make_step(OrderTracing, "orders")
+    orders = np.random.default_rng(0).random((3, 4))
+    column_range = np.array([[0, 10], [2, 12], [1, 11]])
+    step.save(orders, column_range)
+    orders2, column_range2 = step.load()
+    assert np.array_equal(orders2, orders) and np.array_equal(column_range2, column_range)
+    assert orders2.dtype == np.float64 and column_range2.dtype == np.int32
+
+    # Lists are stored as numeric arrays too
+    step.save(orders.tolist(), column_range.tolist())
+    orders2, column_range2 = step.load()
+    assert np.array_equal(orders2, orders) and np.array_equal(column_range2, column_range)
+
+    with pytest.raises(ValueError):
+        step.save(orders, column_range[:2])
+
+
+def test_merge_split_orders():
+    img = np.full((200, 300), 1)
+    for center in (50, 100, 150):
+        img[center - 5:center + 6, :] = 100
+    # Split every order in two clusters, and add specks that are too small to be orders
+    img[:, 140:160] = 1
+    img[20:23, 30:33] = 100
+    img[180:182, 250:252] = 100
+
+    orders, column_range = mark_orders(img, manual=False, opower=1, plot=False, border_width=0, min_cluster=100,
+                                       filter_size=20, noise=10, min_width=0)
+
+    assert orders.shape == (3, 2)
+    assert np.allclose(orders[:, 0], 0) and np.allclose(orders[:, 1], [50, 100, 150])
+
+
+def test_mean_cluster_thickness():
+    rng = np.random.default_rng(0)
+    x = {i: rng.integers(0, 50, 200) for i in range(3)}
+    y = {i: rng.integers(0, 20, 200) for i in range(3)}
+
+    expected = 10
+    for i in x:
+        columns = np.unique(y[i])
+        expected += sum(np.ptp(x[i][y[i] == col]) for col in columns) / len(columns)
+    expected *= 1.5 / len(x)
+    assert np.isclose(calculate_mean_cluster_thickness(x, y), expected)
@@ -1,6 +1,18 @@
+import datetime
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
 import pytest
 
 from pyreduce import reduce
+from pyreduce.configuration import get_configuration_for_instrument
+from pyreduce.instruments.instrument import create_custom_instrument
+from pyreduce.instruments.instrument_info import load_instrument
+from pyreduce.reducer import Reducer, _prune
+from pyreduce.steps import Step
 
 
 def test_main(instrument, target, night, mode, input_dir, output_dir):
@@ -71,3 +83,322 @@ def test_step_abstract(step_args):
 
     with pytest.raises(NotImplementedError):
         step.save()
+
+
+def test_as_list():
+    night = datetime.date(2020, 1, 1)
+    assert reduce._as_list(None) == [None]
+    assert reduce._as_list("star") == ["star"]
+    assert reduce._as_list(["a", "b"]) == ["a", "b"]
+    assert reduce._as_list(("red", "blue")) == ["red", "blue"]
+    assert reduce._as_list(night, datetime.date) == [night]
+
+
+def test_main_rejects_invalid_nights():
+    with pytest.raises(TypeError):
+        reduce.main("UVES", "star", 20200101)
+    with pytest.raises(TypeError):
+        reduce.main("UVES", "star", ["2020-01-01"])
+
+
+def test_main_accepts_instrument(tmp_path):
+    # No input files, so nothing is reduced, but the instrument is not loaded by name again
+    output = reduce.main(load_instrument("UVES"), "star", datetime.date(2020, 1, 1), "middle",
+                         base_dir_template=str(tmp_path), steps=[])
+    assert output == []
+
+
+def test_main_num_workers(tmp_path, caplog):
+    nights = [datetime.date(2020, 1, 1), datetime.date(2020, 1, 2)]
+    # The workers load the instrument by name
+    output = reduce.main(load_instrument("UVES"), "star", nights, "middle", base_dir_template=str(tmp_path),
+                         steps=[], num_workers=2)
+    assert output == []
+
+    # Custom instruments can not be pickled or loaded by name, so they are reduced in this process
+    instrument = create_custom_instrument("custom")
+    output = reduce.main(instrument, "star", nights, "", base_dir_template=str(tmp_path), steps=[],
+                         configuration={"CUSTOM": get_configuration_for_instrument("UVES")}, num_workers=2)
+    assert output == []
+    assert "reducing in this process only" in caplog.text
+
+
+def test_existing_outputs(tmp_path):
+    instrument = load_instrument("UVES")
+    config = get_configuration_for_instrument("UVES")
+    config["finalize"]["filename"] = "{input}_{number}.final.ech"
+    night = datetime.date(2020, 1, 1)
+
+    (tmp_path / "target").mkdir()
+    (tmp_path / "target" / "first_0.final.ech").touch()
+
+    outputs = Reducer.existing_outputs([Path("raw/first.fits"), Path("raw/second.fits")], instrument, "middle",
+                                       "target", night, str(tmp_path / "{target}"), None, config)
+    assert outputs == [str(tmp_path / "target" / "first_0.final.ech"), None]
+
+    # Numbers can have more than one digit
+    (tmp_path / "target" / "second_12.final.ech").touch()
+    outputs = Reducer.existing_outputs([Path("raw/second.fits")], instrument, "middle",
+                                       "target", night, str(tmp_path / "{target}"), None, config)
+    assert outputs == [str(tmp_path / "target" / "second_12.final.ech")]
+
+    # Names that only start like the pattern do not match, of several matches the first in sorted order is used
+    (tmp_path / "target" / "second_x.final.ech").touch()
+    (tmp_path / "target" / "second_11.final.ech").touch()
+    outputs = Reducer.existing_outputs([Path("raw/second.fits")], instrument, "middle",
+                                       "target", night, str(tmp_path / "{target}"), None, config)
+    assert outputs == [str(tmp_path / "target" / "second_11.final.ech")]
+
+    # A missing output directory just means nothing exists yet
+    outputs = Reducer.existing_outputs([Path("raw/first.fits")], instrument, "middle",
+                                       "other", night, str(tmp_path / "{target}"), None, config)
+    assert outputs == [None]
+
+    # Templates without a number are looked up by their exact name
+    config["finalize"]["filename"] = "{input}.ech"
+    (tmp_path / "target" / "second.ech").touch()
+    outputs = Reducer.existing_outputs([Path("raw/first.fits"), Path("raw/second.fits")], instrument, "middle",
+                                       "target", night, str(tmp_path / "{target}"), None, config)
+    assert outputs == [None, str(tmp_path / "target" / "second.ech")]
+
+
+def test_output_dir(tmp_path):
+    template = str(tmp_path / "{instrument}" / "{night}" / "{mode}")
+    config = get_configuration_for_instrument("UVES")
+    reducer = Reducer({}, template, "target", load_instrument("UVES"), "middle", datetime.date(2020, 1, 1), config)
+    # The reducer prepares the same directory that the steps write to
+    assert reducer.output_dir == str(tmp_path / "UVES" / "2020-01-01" / "middle")
+    assert reducer.get_module("bias").output_dir == Path(reducer.output_dir)
+    with pytest.raises(AttributeError):
+        reducer.typo = True
+
+
+def test_prefix(tmp_path):
+    config = get_configuration_for_instrument("UVES")
+    reducer = Reducer({}, str(tmp_path), "target", load_instrument("UVES"), "MIDDLE", datetime.date(2020, 1, 1), config)
+    step = reducer.get_module("bias")
+    assert step.prefix == "uves_middle"
+    # The prefix follows the mode of the step
+    step.mode = ""
+    assert step.prefix == "uves"
+
+
+def test_depends_on_order(tmp_path):
+    config = get_configuration_for_instrument("UVES")
+    reducer = Reducer({}, str(tmp_path), "target", load_instrument("UVES"), "middle", datetime.date(2020, 1, 1), config)
+    step = reducer.get_module("science")
+    step._depends_on += ["curvature", "norm_flat"]
+    # Duplicates are dropped, the order stays the same on every run
+    assert step.depends_on == list(dict.fromkeys(step._depends_on))
+    assert step.depends_on[-3:] == ["norm_flat", "curvature", "scatter"]
+
+
+def test_steps_imported_lazily():
+    # A fresh interpreter, as other tests have imported the steps already
+    code = ("import sys, pyreduce.reducer; "
+            "print(sorted(m for m in sys.modules if m.startswith('pyreduce.steps.')))")
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                            cwd=Path(__file__).parent.parent)
+    assert result.stdout.strip() == "['pyreduce.steps.step']"
+
+
+def test_step_dependencies_imported_lazily():
+    # Loading results does not need the modules that compute them, or emcee
+    code = ("import sys; from pyreduce.steps import SlitCurvatureDetermination, WavelengthCalibrationFinalize, "
+            "WavelengthCalibrationInitialize; "
+            "print([m for m in ('emcee', 'corner', 'pyreduce.make_shear') if m in sys.modules])")
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                            cwd=Path(__file__).parent.parent)
+    assert result.stdout.strip() == "[]"
+
+
+def test_module_class():
+    # Step classes are given by name and only imported here
+    for step in Reducer.all_steps():
+        assert issubclass(Reducer.module_class(step), Step)
+
+
+class FakeStep:
+    """Records which steps were run or loaded, `depends` maps each step to its dependencies"""
+    depends = {}
+    load_depends = {}
+    calls = []
+    created = []
+    saved = set()
+    # Steps that report their missing intermediate files before load() is called
+    checked = set()
+
+    def __init__(self, instrument, mode, target, night, output_dir_template, order_range, **config):
+        self.created.append(self.step)
+        self.depends_on = self.depends[self.step]
+        self.load_depends_on = self.load_depends.get(self.step, self.depends_on)
+
+    def intermediate_exists(self):
+        return self.step in self.saved or self.step not in self.checked
+
+    def run(self, **kwargs):
+        self.calls.append(("run", self.step))
+        return self.step
+
+    def load(self, **kwargs):
+        if self.step not in self.saved:
+            raise FileNotFoundError
+        self.calls.append(("load", self.step))
+        return self.step
+
+
+def fake_reducer(depends, saved, tmp_path, load_depends=None, checked=()):
+    FakeStep.depends = depends
+    FakeStep.load_depends = load_depends or {}
+    FakeStep.saved = saved
+    FakeStep.checked = set(checked)
+    FakeStep.calls = []
+    FakeStep.created = []
+    modules = {step: type(step, (FakeStep,), {"step": step}) for step in depends}
+    step_order = {step: i for i, step in enumerate(depends)}
+    cls = type("FakeReducer", (Reducer,), {"modules": modules, "step_order": step_order,
+                                           "step_times_file": tmp_path / "step_times.json"})
+    return cls({}, str(tmp_path), "target", load_instrument("UVES"), "middle", datetime.date(2020, 1, 1), {})
+
+
+def test_run_module_dependencies(tmp_path):
+    depends = {"a": [], "b": ["a"], "c": ["a", "b"], "d": ["c", "a"]}
+    reducer = fake_reducer(depends, {"a", "c"}, tmp_path)
+    assert reducer.run_module("d") == "d"
+    # a and c are loaded once, b has no saved data and runs instead
+    assert FakeStep.calls == [("load", "a"), ("run", "b"), ("load", "c"), ("run", "d")]
+
+
+def test_run_module_loads_siblings(tmp_path):
+    depends = {"a": [], "b": [], "c": ["a", "b"]}
+    reducer = fake_reducer(depends, {"a", "b"}, tmp_path)
+    assert reducer.run_module("c") == "c"
+    # a and b are loaded together, in any order, before c runs
+    assert sorted(FakeStep.calls[:2]) == [("load", "a"), ("load", "b")]
+    assert FakeStep.calls[2:] == [("run", "c")]
+
+
+def test_run_module_skips_load_without_intermediate(tmp_path):
+    # b needs a only for loading, but there is nothing to load for b
+    reducer = fake_reducer({"a": [], "b": []}, set(), tmp_path, load_depends={"b": ["a"]}, checked={"b"})
+    assert reducer.run_module("b", load=True) == "b"
+    assert FakeStep.calls == [("run", "b")]
+    assert "a" not in reducer.data
+
+
+def test_run_steps_parallel(tmp_path):
+    depends = {"a": [], "b": [], "c": ["a", "b"], "d": ["a"]}
+    reducer = fake_reducer(depends, set(), tmp_path)
+    order, graph = reducer.step_graph(["a", "b", "c", "d"])
+    # d only waits for a, so it is ready before c
+    assert order == ["a", "b", "d", "c"]
+    assert graph == {"a": set(), "b": set(), "c": {"a", "b"}, "d": {"a"}}
+
+    reducer.parallel_steps = True
+    data = reducer.run_steps(["a", "b", "c", "d"])
+    assert all(data[step] == step for step in depends)
+    # Every step runs once, after its dependencies
+    assert sorted(FakeStep.calls) == [("run", step) for step in "abcd"]
+    assert FakeStep.calls.index(("run", "a")) < FakeStep.calls.index(("run", "d"))
+    assert FakeStep.calls.index(("run", "b")) < FakeStep.calls.index(("run", "c"))
+
+
+def test_run_parallel_through_other_steps(tmp_path):
+    # science needs flat only through norm_flat, which is not run itself and has nothing to load
+    depends = {"flat": [], "norm_flat": ["flat"], "science": ["norm_flat"]}
+    reducer = fake_reducer(depends, {"flat"}, tmp_path, checked={"norm_flat"})
+    order, graph = reducer.step_graph(["flat", "science"])
+    assert graph == {"flat": set(), "science": {"flat"}}
+
+    reducer.parallel_steps = True
+    reducer.run_steps(["flat", "science"])
+    # norm_flat is made from the new flat, not the saved one, as without threads
+    assert FakeStep.calls == [("run", "flat"), ("run", "norm_flat"), ("run", "science")]
+
+
+def test_run_parallel_critical_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(os, "cpu_count", lambda: 1)
+    depends = {"a": [], "b": [], "c": ["a"], "d": ["b"]}
+    reducer = fake_reducer(depends, set(), tmp_path)
+    reducer.run_parallel(["a", "b", "c", "d"])
+    # Without run times, a and b are equally important, so they start in step order
+    assert FakeStep.calls[0] == ("run", "a")
+    times = reducer.load_step_times()
+    assert sorted(times) == ["a", "b", "c", "d"]
+
+    # b starts the longer chain of steps
+    times.update(a=5, b=1, c=1, d=10)
+    reducer.step_times_file.write_text(json.dumps({reducer.inputs[0].name: times}))
+    reducer = fake_reducer(depends, set(), tmp_path)
+    reducer.run_parallel(["a", "b", "c", "d"])
+    assert FakeStep.calls[0] == ("run", "b")
+    # The new run times are averaged with the recorded ones
+    assert 5 <= 2 * reducer.load_step_times()["a"] < 5.5
+
+
+def test_step_graph_circular(tmp_path):
+    reducer = fake_reducer({"a": ["b"], "b": ["a"]}, set(), tmp_path)
+    with pytest.raises(ValueError):
+        reducer.step_graph(["a", "b"])
+
+
+def test_run_steps_order(tmp_path):
+    reducer = fake_reducer({"a": [], "b": ["a"]}, set(), tmp_path)
+    reducer.run_steps(["b", "a", "b"])
+    # Steps are run once each, in the step order
+    assert FakeStep.calls == [("run", "a"), ("run", "b")]
+    with pytest.raises(ValueError):
+        reducer.run_steps(["a", "z"])
+
+
+def test_run_module_memoize(tmp_path):
+    depends = {"a": [], "b": ["a"]}
+    reducer = fake_reducer(depends, set(), tmp_path)
+    reducer.memoize = True
+    assert reducer.run_module("b") == "b"
+    assert FakeStep.calls == [("run", "a"), ("run", "b")]
+
+    # The same inputs give the stored results, without running the steps again
+    reducer = fake_reducer(depends, set(), tmp_path)
+    reducer.memoize = True
+    assert reducer.run_module("b") == "b"
+    assert FakeStep.calls == []
+
+    # Other settings for a also change the key of b, which depends on it
+    reducer = fake_reducer(depends, set(), tmp_path)
+    reducer.memoize = True
+    reducer._step_configs["a"] = {"degree": 2}
+    assert reducer.run_module("b") == "b"
+    assert FakeStep.calls == [("run", "a"), ("run", "b")]
+
+
+def test_run_module_memoize_pruned(tmp_path, monkeypatch):
+    reducer = fake_reducer({"a": []}, set(), tmp_path)
+    reducer.memoize = True
+    memo_dir = Path(reducer.output_dir) / ".memo"
+    memo_dir.mkdir(parents=True)
+    # A file that was pruned while it was written is recalculated
+    (memo_dir / f"a.{reducer.step_key('a')}.pkl").touch()
+    assert reducer.run_module("a") == "a"
+    assert FakeStep.calls == [("run", "a")]
+
+    # Files removed by another thread while pruning are skipped
+    (memo_dir / "old.pkl").write_bytes(b"x" * 10)
+    listed = list(memo_dir.iterdir()) + [memo_dir / "gone.pkl"]
+    monkeypatch.setattr(Path, "iterdir", lambda self: iter(listed))
+    _prune(memo_dir, 0)
+    assert not any(file.exists() for file in listed)
+
+
+def test_run_module_creates_steps_once(tmp_path):
+    # b is needed by c and d, and first fails to load
+    depends = {"a": [], "b": ["a"], "c": ["b"], "d": ["b", "c"]}
+    reducer = fake_reducer(depends, {"a"}, tmp_path)
+    reducer.run_steps(["c", "d"])
+    assert sorted(FakeStep.created) == ["a", "b", "c", "d"]
+
+
+def test_run_module_circular(tmp_path):
+    reducer = fake_reducer({"a": ["b"], "b": ["a"]}, set(), tmp_path)
+    with pytest.raises(ValueError):
+        reducer.run_module("a")
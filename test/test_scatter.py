@@ -1,8 +1,10 @@
 # -*- coding: utf-8 -*-
+
 import numpy as np
 import pytest
 
 from pyreduce.estimate_background_scatter import estimate_background_scatter
+from pyreduce.steps import BackgroundScatter
 
 
 def test_scatter(flat, orders, settings):
@@ -68,3 +70,13 @@ def test_scatter_degree():
 
     with pytest.raises(ValueError):
         estimate_background_scatter(img, orders, scatter_degree=(2, -1))
+
+
+def test_save_load(make_step):
+    step = make_step(BackgroundScatter, "scatter")
+    assert step.load() is None
+
+    coeff = np.random.default_rng(0).normal(size=(5, 5))
+    step.save(coeff)
+    # Stored as a plain array, which loads without unpickling
+    assert np.array_equal(step.load(), coeff)
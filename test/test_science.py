@@ -1,10 +1,14 @@
 # -*- coding: utf-8 -*-
+import threading
+
 import numpy as np
 import pytest
+from astropy.io import fits
 
 from pyreduce import util
 from pyreduce.combine_frames import combine_calibrate
 from pyreduce.extract import extract
+from pyreduce.steps import ScienceExtraction
 
 
 def test_science(
@@ -77,3 +81,52 @@ def test_science(
     assert np.issubdtype(sigma.dtype, np.floating)
     assert not np.any(np.isnan(sigma))
     assert not np.all(np.all(sigma.mask, axis=0))
+
+
+class FakeScience(ScienceExtraction):
+    def __init__(self, *args, **config):
+        super().__init__(*args, **config)
+        self.extracting = threading.Lock()
+        self.saved = []
+
+    def calibrate(self, files, mask, bias=None, norm_flat=None):
+        return np.full((2, 3), float(files[0])), {"file": files[0]}
+
+    def extract(self, img, head, orders, curvature, scatter=None):
+        # Only one extraction may run at a time
+        assert self.extracting.acquire(blocking=False)
+        try:
+            return img * 2, img, None, head["file"]
+        finally:
+            self.extracting.release()
+
+    def save(self, fname, head, spec, sigma, column_range):
+        self.saved.append(fname)
+
+
+@pytest.mark.parametrize("plot", [False, True])
+def test_science_run_in_order(make_step, plot):
+    step = make_step(FakeScience, "science", plot=plot)
+    files = [str(i) for i in range(5)]
+    heads, specs, sigmas, columns = step.run(files, None, None, None, None, None, None)
+
+    assert [head["file"] for head in heads] == files
+    assert [spec[0, 0] for spec in specs] == [2 * i for i in range(5)]
+    assert columns == files
+    assert sorted(step.saved) == files
+
+
+def test_science_save_load(make_step, tmp_path):
+    step = make_step(ScienceExtraction, "science")
+    files = [str(tmp_path / f"obs{i}.fits") for i in range(4)]
+    for i, fname in enumerate(files):
+        spec = np.full((2, 5), float(i))
+        columns = np.array([[0, 5], [1, 4]])
+        step.save(fname, fits.Header({"OBSNUM": i}), spec, spec / 10, columns)
+
+    heads, specs, sigmas, columns = step.load({"science": files})
+    assert [head["OBSNUM"] for head in heads] == list(range(4))
+    for i in range(4):
+        assert np.allclose(specs[i][~specs[i].mask], i)
+        assert np.allclose(sigmas[i][~sigmas[i].mask], i / 10)
+        assert np.array_equal(columns[i], [[0, 5], [1, 4]])
@@ -1,10 +1,12 @@
 # -*- coding: utf-8 -*-
+
 import numpy as np
 import pytest
 
 from pyreduce.combine_frames import combine_frames
 from pyreduce.extract import extract
 from pyreduce.make_shear import Curvature as CurvatureModule
+from pyreduce.steps import SlitCurvatureDetermination
 
 
 @pytest.fixture
@@ -154,3 +156,14 @@ def test_shear_zero(original, extracted, orders, order_range):
         orders, column_range=column_range, plot=False, sigma_cutoff=0
     )
     tilt, shear = module.execute(extracted, original)
+
+
+def test_save_load(make_step):
+    step = make_step(SlitCurvatureDetermination, "curvature")
+    assert step.load() == (None, None)
+
+    rng = np.random.default_rng(0)
+    tilt, shear = rng.random((3, 10)), rng.random((3, 10))
+    step.save(tilt, shear)
+    tilt2, shear2 = step.load()
+    assert np.array_equal(tilt2, tilt) and np.array_equal(shear2, shear)
@@ -1,5 +1,238 @@
 # -*- coding: utf-8 -*-
+import logging
+import os
+import pprint
+
 import numpy as np
 import pytest
+from astropy.io import fits
 
 from pyreduce import util
+
+
+def test_read_header_fast(tmp_path):
+    fname = tmp_path / "test.fits"
+    header = fits.Header({"OBJECT": "star", "EXPTIME": 10.0})
+    header["HIERARCH ESO DPR TYPE"] = "FLAT"
+    fits.PrimaryHDU(header=header).writeto(fname)
+
+    full = util.read_header_fast(fname)
+    assert isinstance(full, fits.Header)
+    assert full["OBJECT"] == "star"
+
+    subset = util.read_header_fast(fname, ["OBJECT", "ESO DPR TYPE", "MISSING"])
+    assert subset == {"OBJECT": "star", "ESO DPR TYPE": "FLAT"}
+
+
+@pytest.mark.parametrize("suffix", [".fits", ".fits.gz"])
+def test_read_header_keywords_matches_astropy(tmp_path, suffix):
+    fname = tmp_path / f"test{suffix}"
+    header = fits.Header({"OBJECT": "HD 1234", "EXPTIME": 1.5, "NEXP": 3})
+    header["HIERARCH ESO DPR TYPE"] = "FLAT,LAMP"
+    # Push the last keyword into the second header block
+    for i in range(40):
+        header[f"KEY{i}"] = i
+    header["LAST"] = "last"
+    fits.PrimaryHDU(data=np.zeros((2, 2)), header=header).writeto(fname)
+
+    keys = ["OBJECT", "EXPTIME", "NEXP", "ESO DPR TYPE", "LAST", "MISSING"]
+    full = fits.getheader(fname)
+    expected = {key: full[key] for key in keys if key in full}
+    assert util._read_header_keywords(fname, keys) == expected
+
+
+def test_read_header_fast_long_string(tmp_path):
+    fname = tmp_path / "test.fits"
+    fits.PrimaryHDU(header=fits.Header({"LONGSTR": "x" * 100})).writeto(fname)
+
+    # Values continued over several cards are read with astropy instead
+    with pytest.raises(ValueError):
+        util._read_header_keywords(fname, ["LONGSTR"])
+    assert util.read_header_fast(fname, ["LONGSTR"]) == {"LONGSTR": "x" * 100}
+
+
+def test_lazy_pformat():
+    value = {"b": [1, 2], "a": {"c": None}}
+    assert str(util.LazyPformat(value)) == pprint.pformat(value)
+
+
+def test_logging_to(tmp_path):
+    logger = logging.getLogger("pyreduce.test")
+    handlers = list(logging.getLogger().handlers)
+    for name in ["first", "second"]:
+        with util.logging_to(tmp_path / "logs" / f"{name}.log"):
+            logger.info(f"Reducing {name}")
+    # Each file only has its own messages, and no handlers are left behind
+    assert "Reducing first" in (tmp_path / "logs" / "first.log").read_text()
+    assert "Reducing first" not in (tmp_path / "logs" / "second.log").read_text()
+    assert "Reducing second" in (tmp_path / "logs" / "second.log").read_text()
+    assert logging.getLogger().handlers == handlers
+
+
+def test_file_fingerprint(tmp_path):
+    fname = tmp_path / "file.fits"
+    fname.write_bytes(b"x" * 3000)
+    size, mtime_ns, digest = util.file_fingerprint(fname)
+    assert size == 3000
+    # Only the contents matter for the digest
+    os.utime(fname, ns=(mtime_ns + 10 ** 9, mtime_ns + 10 ** 9))
+    assert util.file_fingerprint(fname)[2] == digest
+    fname.write_bytes(b"y" * 3000)
+    assert util.file_fingerprint(fname)[2] != digest
+
+    (tmp_path / "empty.fits").touch()
+    assert util.file_fingerprint(tmp_path / "empty.fits")[0] == 0
+
+
+def test_open_fits(tmp_path, monkeypatch):
+    fname = tmp_path / "image.fits"
+    data = np.arange(100, dtype=np.float32).reshape(10, 10)
+    fits.writeto(fname, data)
+
+    with util.open_fits(fname) as hdu:
+        assert not hdu._file.memmap
+        assert np.array_equal(hdu[0].data, data)
+
+    monkeypatch.setattr(util, "memmap_threshold", 0)
+    with util.open_fits(fname) as hdu:
+        assert np.array_equal(hdu[0].data, data)
+        assert hdu._file.memmap
+
+    with pytest.raises(FileNotFoundError):
+        util.open_fits(tmp_path / "missing.fits")
+
+
+@pytest.mark.parametrize("lambda2", [-1, 1e3])
+def test_opt_filter_symmetric_solve(lambda2):
+    def not_positive_definite(*args):
+        raise util.LinAlgError()
+
+    rng = np.random.default_rng(0)
+    y = rng.normal(size=500)
+    for weight in [rng.random(500), rng.normal(size=500)]:
+        # Negative weights make the system indefinite, those use the general solver
+        expected = util.opt_filter(y, 10, weight=weight, lambda2=lambda2)
+        with pytest.MonkeyPatch.context() as mp:
+            mp.setattr(util, "solveh_banded", not_positive_definite)
+            fallback = util.opt_filter(y, 10, weight=weight, lambda2=lambda2)
+        assert np.allclose(expected, fallback, rtol=1e-6, atol=1e-9)
+
+
+@pytest.mark.parametrize("use_fitsio", [True, False])
+def test_write_fits(tmp_path, monkeypatch, use_fitsio):
+    if not use_fitsio:
+        monkeypatch.setattr(util, "fitsio", None)
+    elif util.fitsio is None:
+        pytest.skip("fitsio is not installed")
+
+    fname = tmp_path / "image.fits"
+    header = fits.Header({"OBJECT": "star", "EXPTIME": 10.0})
+    header["HIERARCH ESO DPR TYPE"] = "FLAT"
+    data = np.arange(12, dtype=np.float32).reshape(3, 4)
+    util.write_fits(fname, data, header, data * 2)
+
+    with fits.open(fname) as hdu:
+        assert len(hdu) == 2
+        assert np.array_equal(hdu[0].data, data) and np.array_equal(hdu[1].data, data * 2)
+        assert hdu[0].header["OBJECT"] == "star" and hdu[0].header["ESO DPR TYPE"] == "FLAT"
+
+    # Existing files are overwritten
+    util.write_fits(fname, data, header)
+    with fits.open(fname) as hdu:
+        assert len(hdu) == 1
+
+
+def test_verified_header(monkeypatch):
+    monkeypatch.setattr(util, "_verified_headers", {})
+    header = fits.Header({"OBJECT": "star"})
+    # A card with a lower case keyword is not valid FITS, it is fixed
+    header.append(fits.Card.fromstring("exptime = 10.0"))
+
+    verified = util.verified_header(header)
+    assert verified is not header and verified["EXPTIME"] == 10.0
+    # Each distinct header is only verified once
+    assert util.verified_header(header.copy()) is verified
+    header["OBJECT"] = "sun"
+    assert util.verified_header(header)["OBJECT"] == "sun"
+
+    # Only the most recent headers are remembered
+    monkeypatch.setattr(util, "_verified_headers_size", 2)
+    for i in range(3):
+        util.verified_header(fits.Header({"OBSNUM": i}))
+    assert len(util._verified_headers) == 2
+
+
+def test_load_npz(tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    arrays = {"norm": rng.random((20, 30)), "fortran": np.asfortranarray(rng.random((4, 5))),
+              "ints": np.arange(7), "empty": np.zeros((0, 3))}
+    np.savez(tmp_path / "plain.npz", **arrays)
+    np.savez_compressed(tmp_path / "compressed.npz", **arrays)
+
+    for threshold in [16 << 20, -1]:
+        monkeypatch.setattr(util, "memmap_threshold", threshold)
+        for fname in ["plain.npz", "compressed.npz"]:
+            loaded = util.load_npz(tmp_path / fname)
+            assert sorted(loaded) == sorted(arrays)
+            for name, array in arrays.items():
+                assert np.array_equal(loaded[name], array)
+                # Only uncompressed, large arrays are mapped
+                mapped = threshold < 0 and fname == "plain.npz"
+                assert isinstance(loaded[name], np.memmap) == mapped
+
+    # Changes to mapped arrays do not go back to the file
+    loaded["norm"][0, 0] = -1
+    assert util.load_npz(tmp_path / "plain.npz")["norm"][0, 0] == arrays["norm"][0, 0]
+
+    with pytest.raises(FileNotFoundError):
+        util.load_npz(tmp_path / "missing.npz")
+
+    # Object arrays need pickles, which have to be allowed explicitly
+    objects = np.array([(1.0, None)], dtype=[("wave", float), ("approx", object)])
+    np.savez(tmp_path / "objects.npz", objects=objects, norm=arrays["norm"])
+    with pytest.raises(ValueError):
+        util.load_npz(tmp_path / "objects.npz")
+    loaded = util.load_npz(tmp_path / "objects.npz", allow_pickle=True)
+    assert loaded["objects"]["wave"][0] == 1.0 and isinstance(loaded["norm"], np.memmap)
+
+
+def test_write_fits_staged(tmp_path, monkeypatch):
+    staging = tmp_path / "staging"
+    staging.mkdir()
+    monkeypatch.setenv("PYREDUCE_LOCALBUFF", str(staging))
+
+    fname = tmp_path / "image.fits"
+    data = np.ones((3, 4), dtype=np.float32)
+    util.write_fits(fname, data, fits.Header({"OBJECT": "star"}))
+    with fits.open(fname) as hdu:
+        assert np.array_equal(hdu[0].data, data) and hdu[0].header["OBJECT"] == "star"
+    # Nothing is left behind in the staging directory, also if the move fails
+    assert list(staging.iterdir()) == []
+    with pytest.raises(OSError):
+        util.write_fits(tmp_path / "missing" / "image.fits", data, fits.Header())
+    assert list(staging.iterdir()) == []
+
+
+def test_write_fits_compressed(tmp_path):
+    fname = tmp_path / "image.fits"
+    rng = np.random.default_rng(0)
+    data = rng.poisson(1000, size=(100, 50)).astype(np.float32)
+    util.write_fits(fname, data, fits.Header({"OBJECT": "star"}), data + 1, compress=True)
+
+    with fits.open(fname) as hdus:
+        assert isinstance(hdus[1], fits.CompImageHDU)
+        assert util.image_hdu(hdus).header["OBJECT"] == "star"
+        assert np.allclose(util.image_hdu(hdus).data, data, atol=5)
+        assert np.allclose(util.image_hdu(hdus, 1).data, data + 1, atol=5)
+
+    util.write_fits(fname, data, fits.Header())
+    with fits.open(fname) as hdus:
+        assert util.image_hdu(hdus) is hdus[0]
+
+
+def test_read_files(monkeypatch):
+    monkeypatch.setattr(util, "max_concurrent_reads", 2)
+    files = [f"file{i}" for i in range(5)]
+    # The results are in the order of the files, however many are read at the same time
+    assert util.read_files(str.upper, files) == [f.upper() for f in files]
+    assert util.read_files(str.upper, []) == []
@@ -1,10 +1,15 @@
 # -*- coding: utf-8 -*-
+from os.path import dirname, join
+
 import numpy as np
 import pytest
+from astropy.io import fits
 
 from pyreduce import instruments, util
 from pyreduce.extract import extract
-from pyreduce.wavelength_calibration import WavelengthCalibration
+from pyreduce.steps import (LaserFrequencyCombMaster, WavelengthCalibrationFinalize,
+                            WavelengthCalibrationMaster)
+from pyreduce.wavelength_calibration import LineList, WavelengthCalibration
 
 
 def test_wavecal(files, instr, instrument, mode, mask, orders, settings, order_range):
@@ -58,3 +63,58 @@ def test_wavecal(files, instr, instrument, mode, mask, orders, settings, order_r
     assert wave.shape[0] == order_range[1] - order_range[0]
     assert wave.shape[1] == orig.shape[1]
     assert np.issubdtype(wave.dtype, np.floating)
+
+
+def test_comb_master_save_load(make_step):
+    step = make_step(LaserFrequencyCombMaster, "freq_comb_master")
+    comb = np.random.default_rng(0).random((4, 50)) * 1e4
+    step.save(comb, fits.Header({"OBJECT": "comb"}))
+
+    loaded, chead = step.load()
+    assert chead["OBJECT"] == "comb"
+    assert loaded.dtype.kind == "f" and loaded.dtype.itemsize == 4
+    assert np.allclose(loaded, comb, rtol=1e-6)
+
+
+def test_wavecal_finalize_save_load(make_step):
+    step = make_step(WavelengthCalibrationFinalize, "wavecal")
+    linelist = LineList.load(join(dirname(instruments.__file__), "..", "wavecal", "uves_middle_580nm_2D.npz"))
+    wave, coef = np.random.default_rng(0).random((3, 50)), np.arange(6.0).reshape(2, 3)
+    step.save(wave, coef, linelist)
+
+    wave2, coef2, linelist2 = step.load()
+    assert np.array_equal(wave2, wave) and np.array_equal(coef2, coef)
+    assert np.array_equal(linelist2["wlc"], linelist["wlc"])
+
+
+def test_linelist_save_load(tmp_path):
+    linelist = LineList.load(join(dirname(instruments.__file__), "..", "wavecal", "uves_middle_580nm_2D.npz"))
+    linelist.save(tmp_path / "linelist.npz")
+
+    linelist2 = LineList.load(tmp_path / "linelist.npz")
+    assert len(linelist2) == len(linelist)
+    assert np.array_equal(linelist2["posm"], linelist["posm"]) and np.array_equal(linelist2["flag"], linelist["flag"])
+
+
+@pytest.mark.parametrize("dtype, saved", [(np.float64, np.float64), (np.float32, np.float32), (np.int32, np.float32)])
+def test_wavecal_master_save_load(make_step, dtype, saved):
+    step = make_step(WavelengthCalibrationMaster, "wavecal_master")
+    thar = (np.random.default_rng(0).random((3, 50)) * 1000).astype(dtype)
+    step.save(thar, fits.Header({"OBJECT": "thar"}))
+
+    thar2, thead = step.load()
+    assert thead["OBJECT"] == "thar"
+    assert thar2.dtype.kind == "f" and thar2.dtype.itemsize == np.dtype(saved).itemsize
+    assert np.array_equal(thar2, thar)
+
+
+def test_wavecal_master_load_memmap(make_step, monkeypatch):
+    # Memory map the file, the data must stay readable after it is closed
+    monkeypatch.setattr(util, "memmap_threshold", 0)
+    step = make_step(WavelengthCalibrationMaster, "wavecal_master")
+    thar = np.random.default_rng(0).random((3, 50))
+    step.save(thar, fits.Header({"OBJECT": "thar"}))
+
+    thar2, thead = step.load()
+    assert thead["OBJECT"] == "thar"
+    assert np.array_equal(thar2, thar)